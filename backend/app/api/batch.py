@@ -0,0 +1,166 @@
+"""
+Batch Chat Module
+
+This module provides /chat/batch for bulk jobs (such as the nightly
+"re-plan everyone's tomorrow" run) that would otherwise make thousands of
+individual /chat HTTP calls.
+
+Each item goes through the same pipeline as /chat (prompt building, rate
+limiting, caching, coalescing and suggestion parsing) and items run
+concurrently under a semaphore, behind interactive /chat traffic in the
+outbound scheduler. Results come back in request order with a
+per-item status code and error, or, with "stream": true, as NDJSON lines in
+completion order, each tagged with its index.
+
+Example Usage:
+    POST /chat/batch
+    {
+        "requests": [
+            {"message": "Plan my tomorrow", "context": {...}},
+            {"message": "Plan my tomorrow", "context": {...}}
+        ],
+        "concurrency": 4
+    }
+
+    Response:
+    {
+        "results": [
+            {"index": 0, "status_code": 200, "response": {...}, "error": null},
+            {"index": 1, "status_code": 429, "response": null, "error": "Rate limit exceeded..."}
+        ]
+    }
+
+Items are rate limited per item, but against the client's "batch" quota
+rather than its interactive one, so one batch can exceed the interactive
+request limit and does not lock the client out of /chat while it runs.
+
+Configuration:
+    - LLM_BATCH_CONCURRENCY: Default and maximum items in flight per batch (default 8)
+    - LLM_BATCH_MAX_ITEMS: Maximum items per batch (default 1000)
+    - LLM_BATCH_MAX_REQUESTS: Batch items per client per rate-limit window (default 1000)
+    - LLM_BATCH_MAX_TOKENS: Batch tokens per client per rate-limit window (default 1000000)
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from .llm import (
+    LLMRequest,
+    LLMResponse,
+    OpenAIConfig,
+    get_openai_config,
+    run_chat_pipeline
+)
+from .usage_tracking import RateLimit
+from ..core.conversations import SessionStore, get_session_store
+from ..core.llm_scheduler import BATCH
+from ..core.response_cache import ResponseCache, get_response_cache
+from ..core.singleflight import SingleFlight, get_singleflight
+from ..core.task_snapshot import TaskSnapshotStore, get_task_snapshots
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class LLMBatchRequest(BaseModel):
+    """Request model for batch chat interactions."""
+    requests: List[LLMRequest] = Field(..., min_length=1)
+    stream: bool = False  # Stream NDJSON results as items complete
+    concurrency: Optional[int] = Field(None, gt=0)  # Capped at LLM_BATCH_CONCURRENCY
+
+class LLMBatchItemResult(BaseModel):
+    """Result of a single batch item."""
+    index: int
+    status_code: int
+    response: Optional[LLMResponse] = None
+    error: Optional[str] = None
+
+class LLMBatchResponse(BaseModel):
+    """Response model for batch chat interactions."""
+    results: List[LLMBatchItemResult]
+
+async def _run_item(
+    index: int,
+    item: LLMRequest,
+    semaphore: asyncio.Semaphore,
+    client_id: str,
+    config: OpenAIConfig,
+    cache: ResponseCache,
+    flight: SingleFlight,
+    snapshots: TaskSnapshotStore,
+    sessions: SessionStore,
+    rate_limit: RateLimit
+) -> LLMBatchItemResult:
+    """Run one batch item, turning failures into a per-item error."""
+    async with semaphore:
+        try:
+            response = await run_chat_pipeline(
+                item, client_id, config, cache, flight, snapshots, sessions, {},
+                priority=BATCH, rate_limit=rate_limit
+            )
+        except HTTPException as e:
+            return LLMBatchItemResult(index=index, status_code=e.status_code, error=e.detail)
+        except Exception as e:
+            # One broken item must not fail the whole batch
+            logger.exception("Batch item %d failed", index)
+            return LLMBatchItemResult(index=index, status_code=500, error=f"Error processing LLM request: {e}")
+    return LLMBatchItemResult(index=index, status_code=200, response=response)
+
+async def _stream_results(tasks: List[asyncio.Task]) -> AsyncIterator[str]:
+    """Yield NDJSON lines as items complete, cancelling the rest on disconnect."""
+    try:
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            yield json.dumps(result.model_dump()) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@router.post("/chat/batch", response_model=LLMBatchResponse)
+async def chat_batch(
+    batch: LLMBatchRequest,
+    request_obj: Request,
+    config: OpenAIConfig = Depends(get_openai_config),
+    cache: ResponseCache = Depends(get_response_cache),
+    flight: SingleFlight = Depends(get_singleflight),
+    snapshots: TaskSnapshotStore = Depends(get_task_snapshots),
+    sessions: SessionStore = Depends(get_session_store)
+):
+    """Process a list of chat messages concurrently."""
+    max_items = int(os.getenv("LLM_BATCH_MAX_ITEMS", "1000"))
+    if len(batch.requests) > max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(batch.requests)} items (maximum {max_items})"
+        )
+
+    max_concurrency = int(os.getenv("LLM_BATCH_CONCURRENCY", "8"))
+    semaphore = asyncio.Semaphore(min(batch.concurrency or max_concurrency, max_concurrency))
+    client_id = request_obj.client.host
+    rate_limit = RateLimit(
+        int(os.getenv("LLM_BATCH_MAX_REQUESTS", "1000")),
+        int(os.getenv("LLM_BATCH_MAX_TOKENS", "1000000")),
+        quota="batch"
+    )
+
+    tasks = [
+        asyncio.create_task(_run_item(
+            index, item, semaphore, client_id, config, cache, flight, snapshots, sessions, rate_limit
+        ))
+        for index, item in enumerate(batch.requests)
+    ]
+
+    if batch.stream:
+        return StreamingResponse(_stream_results(tasks), media_type="application/x-ndjson")
+
+    try:
+        return LLMBatchResponse(results=await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,144 @@
+"""
+Background Chat Jobs Module
+
+This module provides /jobs for long-running chat requests, such as splitting
+a project over several weeks, that would otherwise hold an HTTP connection
+open long enough for mobile networks to drop it.
+
+Submitting a job returns a job id immediately. A worker pool runs the request
+through the same pipeline as /chat (task sync, sessions, fast path, routing,
+rate limiting, caching, coalescing), at batch priority in the outbound
+scheduler, and keeps the result in Redis with a TTL.
+Clients either poll GET /jobs/{job_id} or subscribe to
+GET /jobs/{job_id}/events, a Server-Sent Events stream that pushes each status
+change and ends with the final job record (or a `lost` event if the record
+expires or disappears first).
+
+Example Usage:
+    POST /jobs
+    {"message": "Spread this project over two weeks", "context": {...}}
+
+    Response (202):
+    {"job_id": "3f2b...", "status": "queued", ...}
+
+    GET /jobs/3f2b...
+    {"job_id": "3f2b...", "status": "succeeded", "status_code": 200, "response": {...}, ...}
+
+Configuration:
+    - LLM_JOB_WORKERS: Concurrent jobs per process (default 4)
+    - LLM_JOB_QUEUE_SIZE: Maximum queued jobs per process (default 1000)
+    - LLM_JOB_RESULT_TTL: Seconds job records are kept (default 3600)
+"""
+import asyncio
+import uuid
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from .llm import (
+    LLMRequest,
+    LLMResponse,
+    OpenAIConfig,
+    get_openai_config,
+    run_chat_pipeline,
+    sse_event
+)
+from ..core.conversations import SessionStore, get_session_store
+from ..core.jobs import TERMINAL_STATUSES, JobQueue, QueueFullError, get_job_queue
+from ..core.llm_scheduler import BATCH
+from ..core.response_cache import ResponseCache, get_response_cache
+from ..core.singleflight import SingleFlight, get_singleflight
+from ..core.task_snapshot import TaskSnapshotStore, get_task_snapshots
+
+router = APIRouter()
+
+EVENT_POLL_INTERVAL = 0.25
+
+class LLMJob(BaseModel):
+    """State of a background chat job."""
+    job_id: str
+    status: str  # queued, running, succeeded or failed
+    status_code: Optional[int] = None
+    response: Optional[LLMResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+@router.post("/jobs", response_model=LLMJob, status_code=202)
+async def create_chat_job(
+    request: LLMRequest,
+    request_obj: Request,
+    response_obj: Response,
+    config: OpenAIConfig = Depends(get_openai_config),
+    cache: ResponseCache = Depends(get_response_cache),
+    flight: SingleFlight = Depends(get_singleflight),
+    snapshots: TaskSnapshotStore = Depends(get_task_snapshots),
+    sessions: SessionStore = Depends(get_session_store),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """Queue a chat message for background processing and return its job id."""
+    client_id = request_obj.client.host
+
+    async def run():
+        try:
+            response = await run_chat_pipeline(
+                request, client_id, config, cache, flight, snapshots, sessions, {}, priority=BATCH
+            )
+        except HTTPException as e:
+            return e.status_code, None, e.detail
+        return 200, response.model_dump(), None
+
+    try:
+        job = await queue.submit(uuid.uuid4().hex, run)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many queued jobs. Please try again later.",
+            headers={"Retry-After": "5"}
+        )
+    response_obj.headers["Location"] = f"{request_obj.url.path}/{job['job_id']}"
+    return job
+
+async def _get_job_or_404(queue: JobQueue, job_id: str) -> dict:
+    job = await queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=LLMJob)
+async def get_chat_job(job_id: str, queue: JobQueue = Depends(get_job_queue)):
+    """Get the status, and once finished the result, of a background job."""
+    return await _get_job_or_404(queue, job_id)
+
+async def _job_events(queue: JobQueue, job: dict) -> AsyncIterator[str]:
+    """
+    Push a `status` frame on every status change and a final `done` frame,
+    or a final `lost` frame if the job record expires or disappears.
+    """
+    job_id = job["job_id"]
+    status = None
+    while True:
+        if job["status"] != status:
+            status = job["status"]
+            if status in TERMINAL_STATUSES:
+                yield sse_event("done", LLMJob(**job).model_dump())
+                return
+            yield sse_event("status", {"job_id": job_id, "status": status})
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+        job = await queue.store.get(job_id)
+        if job is None:
+            yield sse_event("lost", {"job_id": job_id, "detail": "Job not found or expired"})
+            return
+
+@router.get("/jobs/{job_id}/events")
+async def stream_chat_job(job_id: str, queue: JobQueue = Depends(get_job_queue)) -> StreamingResponse:
+    """Stream a background job's status changes and result as Server-Sent Events."""
+    job = await _get_job_or_404(queue, job_id)
+    return StreamingResponse(
+        _job_events(queue, job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
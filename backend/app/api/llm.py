@@ -7,10 +7,41 @@ appropriate actions.
 
 Key Features:
 - Single /chat endpoint for all LLM interactions
-- Structured response format for consistent task handling
+- /chat/stream Server-Sent Events variant that forwards tokens and suggestions as they arrive
+- Structured response format for consistent task handling: suggestions come back
+  through a typed `suggest_tasks` function call, with a tolerant text extractor
+  as fallback
 - Context-aware task suggestions
-- OpenAI GPT integration for natural language understanding
+- Context compaction that keeps only relevant tasks within a token budget
+- A free/busy summary of the user's schedule in place of in-window task
+  dates (disable with LLM_FREE_BUSY=false); suggestions that overlap existing
+  tasks are listed in metadata.conflicts
+- Repeating tasks: suggestions and tasks carry an RRULE `recurrence`, expanded
+  lazily over the scheduling horizon for free/busy and context compaction
+- Deterministic auto-scheduling: for work split over several days the model
+  calls schedule_work with the effort, deadline and working hours, and the
+  server places the sessions in free time
+- Server-side task snapshots: after one full `current_tasks` upload, clients
+  send only a `task_delta` against the returned X-Task-Version
+- Multi-turn sessions: send a `session_id` and earlier turns (with older ones
+  folded into a rolling summary) are included in the prompt
+- Complexity-based routing picks the model, max_tokens and temperature per
+  request (see app.services.model_routing; table overridable via LLM_ROUTES)
+- Local fast path that answers simple commands ("add dentist tomorrow at 3pm")
+  without calling OpenAI; disable with LLM_FAST_PATH=false
+- Two-tier (in-process LRU + Redis) cache for repeated prompts; send
+  `X-Cache-Bypass: 1` or `Cache-Control: no-cache` to skip it
+- Single-flight coalescing so identical concurrent prompts share one OpenAI call
+- OpenAI GPT integration for natural language understanding, with per-call
+  deadlines, jittered retries, a circuit breaker and an optional fallback model
 - Rate limiting and token tracking
+- A global outbound scheduler that keeps OpenAI calls within the
+  organisation's RPM/TPM quota, serving /chat before batch work and clients
+  round-robin; time spent queued is returned in X-Queue-Wait-Ms
+- Per-stage latency histograms (llm_stage_seconds{stage}: rate_limit, prompt,
+  openai, parse, usage), tokens in/out per model (llm_tokens_total) and 429s
+  by cause (llm_rate_limited_total{cause}: local or openai), served with the
+  other metrics at GET /metrics
 
 Example Usage:
     POST /chat
@@ -36,22 +67,64 @@ Example Usage:
 
 Dependencies:
     - OpenAI API key must be set in environment variables
+    - Connection pool tuned via OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+      OPENAI_KEEPALIVE_EXPIRY and OPENAI_TIMEOUT (optional)
+    - Retry and breaker policy tuned via the OPENAI_* settings in app.core.resilience (optional)
     - FastAPI for API routing
     - Pydantic for request/response validation
 """
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends, Request
-from pydantic import BaseModel
-from typing import Optional, List, Dict
-from openai import OpenAI, OpenAIError, AuthenticationError, RateLimitError
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Dict, Tuple, AsyncIterator, Awaitable, Callable
+from openai import (
+    APITimeoutError,
+    AsyncOpenAI,
+    AuthenticationError,
+    DefaultAsyncHttpxClient,
+    OpenAIError,
+    RateLimitError
+)
+import anyio
+import asyncio
+import math
+import httpx
+import logging
+import redis
 import os
+import time
 from functools import lru_cache
 import json
 from dotenv import load_dotenv
 import pathlib
 
 # Import usage tracking functionality
-from .usage_tracking import check_rate_limit, update_usage
+from .usage_tracking import DEFAULT_RATE_LIMIT, RateLimit, Reservation, check_rate_limit, reconcile_usage
+from ..core.conversations import SessionStore, get_session_store
+from ..core.llm_scheduler import INTERACTIVE, Grant, OutboundScheduler
+from ..core.metrics import metrics
+from ..core.resilience import CircuitOpenError, ResilientCaller
+from ..core.response_cache import ResponseCache, get_response_cache, make_cache_key
+from ..core.singleflight import SingleFlight, get_singleflight
+from ..core.suggestions import (
+    SCHEDULE_WORK_FUNCTION,
+    SCHEDULE_WORK_TOOL,
+    SUGGEST_TASKS_FUNCTION,
+    SUGGEST_TASKS_TOOL,
+    SUGGESTION_MARKER,
+    ScheduleWorkArguments,
+    SuggestionStreamParser,
+    extract_suggestions,
+    parse_tool_arguments
+)
+from ..core.task_snapshot import SnapshotVersionMismatch, TaskSnapshotStore, get_task_snapshots
+from ..core.tokens import count_message_tokens, count_tokens, estimate_request_tokens
+from ..services.auto_scheduler import schedule_from_arguments
+from ..services.context_compaction import compact_context, message_window
+from ..services.free_busy import BusyIndex, apply_schedule_summary, find_conflicts, schedule_horizon
+from ..services.model_routing import ModelRoute, ModelRouter
+from ..services.fast_path import confirmation_text, parse_command
 
 # Load environment variables from .env file in root directory
 root_dir = pathlib.Path(__file__).parents[3]  # Go up 3 levels: api -> app -> backend -> root
@@ -59,6 +132,7 @@ env_path = root_dir / '.env'
 load_dotenv(dotenv_path=env_path)
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # OpenAI Configuration
 class OpenAIConfig:
@@ -66,33 +140,75 @@ class OpenAIConfig:
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError(f"OPENAI_API_KEY not found in environment variables. Please check your .env file at {env_path}")
-        self.client = OpenAI(api_key=self.api_key)
+        # One pooled, keep-alive HTTP transport is shared by every request in the
+        # worker so hundreds of completions can be in flight without blocking
+        # the event loop or re-doing TLS handshakes.
+        self.max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "200"))
+        self.max_keepalive_connections = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "50"))
+        self.keepalive_expiry = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+        self.timeout = float(os.getenv("OPENAI_TIMEOUT", "60"))
+        self.http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=5.0)
+        )
+        # Retries are handled by ResilientCaller so they share one deadline and breaker
+        self.client = AsyncOpenAI(api_key=self.api_key, http_client=self.http_client, max_retries=0)
+        self.resilience = ResilientCaller()
+        self.scheduler = OutboundScheduler()
+        # Defaults for direct calls; chat requests take theirs from the router
         self.model = "gpt-3.5-turbo"
         self.max_tokens = 500
         self.temperature = 0.7
+        self.router = ModelRouter()
+        # Offer the typed suggest_tasks function instead of relying on SUGGESTION: text
+        self.structured_output = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"
 
 @lru_cache()
 def get_openai_config() -> OpenAIConfig:
     return OpenAIConfig()
 
+async def close_openai_client() -> None:
+    """Close the shared OpenAI HTTP transport, if one was created."""
+    if get_openai_config.cache_info().currsize:
+        await get_openai_config().client.close()
+        get_openai_config.cache_clear()
+
 class TaskSuggestion(BaseModel):
     """Model for structured task suggestions from LLM."""
     action: str  # create_task, update_task, delete_task, etc.
     parameters: Dict  # Task parameters like title, description, due_date
 
+class TaskDelta(BaseModel):
+    """Changes to the server-side task snapshot since base_version."""
+    base_version: int
+    upserts: List[dict] = []  # Added or changed tasks, matched by "id"
+    deletes: List[str] = []  # Ids of removed tasks
+
 class LLMRequest(BaseModel):
     """Request model for LLM interactions."""
     message: str
     context: Optional[dict] = None
+    task_delta: Optional[TaskDelta] = None  # Sent instead of context["current_tasks"]
+    session_id: Optional[str] = None  # Continue a server-side conversation
 
 class LLMResponse(BaseModel):
     """Response model for LLM interactions."""
     response: str
     suggested_actions: Optional[List[TaskSuggestion]] = None
     error: Optional[str] = None
+    metadata: Optional[Dict] = None  # Prompt token counts before/after context compaction
 
-def create_chat_prompt(message: str, context: Optional[dict] = None) -> List[Dict]:
-    """Create a structured prompt for the LLM."""
+def create_chat_prompt(
+    message: str,
+    context: Optional[dict] = None,
+    history: Optional[List[Dict]] = None,
+    summary: Optional[str] = None
+) -> List[Dict]:
+    """Create a structured prompt for the LLM, after any earlier conversation turns."""
     system_prompt = """You are Velo's AI assistant, helping users manage their tasks and schedule.
 Your role is to understand task-related requests and provide clear, actionable responses.
 When suggesting actions, use the following format:
@@ -113,9 +229,13 @@ SUGGESTION: [
 Guidelines:
 - For every scheduled task, always provide both start_date and end_date in ISO 8601 format.
 - If the user requests splitting work over multiple days, return multiple create_task actions, each with its own start_date and end_date.
+- For a repeating task, suggest one create_task with an RRULE "recurrence" (e.g. "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR") instead of one action per occurrence.
+- If the schedule_work function is available, call it for such requests with the total effort, deadline and working hours instead of placing the tasks yourself.
 - Do not use or mention 'due_date'.
 - Only include fields that are relevant for the user's request.
 - Always include title and description if possible.
+- If the suggest_tasks function is available, call it with your suggestions instead of writing SUGGESTION:.
+- If the context has a schedule, place new tasks only inside its free slots.
 
 Available actions:
 - create_task: Create a new task
@@ -124,22 +244,63 @@ Available actions:
 - reschedule_task: Reschedule an existing task
 """
     
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": message}
-    ]
+    messages = [{"role": "system", "content": system_prompt}]
+    if summary:
+        messages.append({"role": "system", "content": f"Earlier in this conversation:\n{summary}"})
+    messages.extend(history or [])
+    messages.append({"role": "user", "content": message})
     
     if context:
         context_str = f"\nContext: {json.dumps(context)}"
-        messages[1]["content"] += context_str
+        messages[-1]["content"] += context_str
     
     return messages
 
+def build_chat_prompt(
+    request: LLMRequest,
+    history: Optional[List[Dict]] = None,
+    summary: Optional[str] = None,
+    index: Optional[BusyIndex] = None
+) -> Tuple[List[Dict], Dict]:
+    """
+    Compact the request context and build the chat prompt.
+    
+    Args:
+        request: Chat request
+        history: Earlier verbatim conversation turns, oldest first
+        summary: Rolling summary of turns older than history
+        index: Busy index of the request's tasks; when given, in-window
+            task dates are replaced by a free/busy summary
+    
+    Returns:
+        Tuple[List[Dict], Dict]: (prompt messages, metadata with prompt token
+        counts before and after compaction)
+    """
+    context, stats = compact_context(request.message, request.context)
+    if index is not None and os.getenv("LLM_FREE_BUSY", "true").lower() == "true":
+        now = datetime.now()
+        context, replaced = apply_schedule_summary(
+            request.message, context, index, message_window(request.message, now), now
+        )
+        stats["tasks_after"] -= replaced
+        stats["context_tokens_after"] = count_tokens(json.dumps(context)) if context else 0
+    messages = create_chat_prompt(request.message, context, history, summary)
+    prompt_tokens_after = count_message_tokens(messages)
+    prompt_tokens_before = (
+        prompt_tokens_after - stats["context_tokens_after"] + stats["context_tokens_before"]
+    )
+    return messages, {
+        "prompt_tokens_before": prompt_tokens_before,
+        "prompt_tokens_after": prompt_tokens_after,
+        "context_tasks_before": stats["tasks_before"],
+        "context_tasks_after": stats["tasks_after"]
+    }
+
 @router.get("/test")
 async def test_openai_connection(config: OpenAIConfig = Depends(get_openai_config)) -> dict:
     """Test endpoint to verify OpenAI API key and connection."""
     try:
-        response = config.client.chat.completions.create(
+        response = await config.client.chat.completions.create(
             model=config.model,
             messages=[{"role": "user", "content": "Hello"}],
             max_tokens=10
@@ -160,61 +321,643 @@ async def test_openai_connection(config: OpenAIConfig = Depends(get_openai_confi
             detail=f"Error testing OpenAI connection: {str(e)}"
         )
 
-@router.post("/chat", response_model=LLMResponse)
-async def chat_with_llm(
-    request: LLMRequest,
-    request_obj: Request,
-    config: OpenAIConfig = Depends(get_openai_config)
-) -> LLMResponse:
-    """Process a chat message and return the LLM's response."""
-    client_id = request_obj.client.host
+def _to_task_suggestions(actions: List[dict]) -> List[TaskSuggestion]:
+    """Validate raw suggestion dicts, raising ValueError if any is malformed."""
+    return [TaskSuggestion(**action) for action in actions]
+
+def parse_suggestions(content: Optional[str], tool_calls=None) -> List[TaskSuggestion]:
+    """
+    Parse suggested actions from an assistant message.
     
-    # Check rate limits using the usage_tracking module
-    if not check_rate_limit(client_id, estimated_tokens=len(request.message.split()) * 2):
-        raise HTTPException(
-            status_code=429,
-            detail="Rate limit exceeded. Please try again later."
-        )
+    Structured suggest_tasks function calls are used when present; otherwise
+    (or if their arguments fail validation) the tolerant text extractor runs
+    over the message content. Parse outcome and time are recorded as metrics.
     
+    Args:
+        content: Assistant message text
+        tool_calls: Tool calls on the assistant message, if any
+        
+    Returns:
+        List[TaskSuggestion]: Parsed suggestions (empty if none or unparseable)
+    """
+    started = time.perf_counter()
+    calls = [
+        call for call in (tool_calls or [])
+        if getattr(call.function, "name", None) == SUGGEST_TASKS_FUNCTION
+    ]
+    method = "tool" if calls else "text"
     try:
-        messages = create_chat_prompt(request.message, request.context)
+        if calls:
+            try:
+                actions = [action for call in calls for action in parse_tool_arguments(call.function.arguments)]
+            except ValueError:
+                # Salvage what we can from malformed function arguments
+                method = "tool_fallback"
+                actions = [action for call in calls for action in extract_suggestions(call.function.arguments)]
+        else:
+            actions = extract_suggestions(content or "")
+        suggestions = _to_task_suggestions(actions)
+    except ValueError as e:
+        logger.warning("Failed to parse suggestions: %s", e)
+        suggestions, outcome = [], "failed"
+    else:
+        if suggestions:
+            outcome = "ok"
+        elif calls or SUGGESTION_MARKER in (content or ""):
+            # The model meant to suggest something but nothing usable came out
+            outcome = "failed"
+        else:
+            outcome = "none"
+    metrics.incr("llm_suggestion_parse_total", method=method, outcome=outcome)
+    metrics.observe("llm_suggestion_parse_seconds", time.perf_counter() - started, method=method)
+    return suggestions
+
+def _summarize_suggestions(suggestions: List[TaskSuggestion]) -> str:
+    """Build reply text for function-call responses that carry no message content."""
+    titles = [s.parameters.get("title") for s in suggestions if s.parameters.get("title")]
+    if not titles:
+        return "Here are my suggestions."
+    return f"Here are my suggestions: {', '.join(titles)}."
+
+def schedule_work_calls(tool_calls, index: BusyIndex) -> Tuple[List[TaskSuggestion], int]:
+    """
+    Run the auto-scheduler for each schedule_work function call.
+    
+    Args:
+        tool_calls: Tool calls on the assistant message, if any
+        index: Busy index of the user's tasks
         
-        response = config.client.chat.completions.create(
-            model=config.model,
+    Returns:
+        Tuple[List[TaskSuggestion], int]: (placed sessions, minutes that did
+        not fit before their deadlines)
+    """
+    suggestions, unscheduled = [], 0
+    for call in tool_calls or []:
+        if getattr(call.function, "name", None) != SCHEDULE_WORK_FUNCTION:
+            continue
+        started = time.perf_counter()
+        try:
+            arguments = ScheduleWorkArguments.model_validate_json(call.function.arguments)
+            actions, remaining = schedule_from_arguments(arguments, index, datetime.now())
+        except ValueError as e:
+            logger.warning("Failed to schedule work: %s", e)
+            metrics.incr("llm_auto_schedule_total", outcome="failed")
+            continue
+        metrics.observe("llm_auto_schedule_seconds", time.perf_counter() - started)
+        metrics.incr("llm_auto_schedule_total", outcome="partial" if remaining else "ok")
+        suggestions.extend(_to_task_suggestions(actions))
+        unscheduled += remaining
+    return suggestions, unscheduled
+
+async def _complete_chat(
+    config: OpenAIConfig,
+    messages: List[Dict],
+    route: ModelRoute,
+    index: Optional[BusyIndex] = None
+) -> Tuple[LLMResponse, int, str]:
+    """
+    Run a chat completion (with retries and fallback) and parse it into an LLMResponse.
+    
+    schedule_work calls are resolved by the auto-scheduler against `index`.
+    
+    Returns:
+        Tuple[LLMResponse, int, str]: (parsed response, total tokens used, model that answered)
+    """
+    structured = (
+        {"tools": [SUGGEST_TASKS_TOOL, SCHEDULE_WORK_TOOL], "tool_choice": "auto"}
+        if config.structured_output else {}
+    )
+    
+    async def create(model: str):
+        return await config.client.chat.completions.create(
+            model=model,
             messages=messages,
-            max_tokens=config.max_tokens,
-            temperature=config.temperature
+            max_tokens=route.max_tokens,
+            temperature=route.temperature,
+            **structured
         )
+    
+    with metrics.timer("llm_stage_seconds", stage="openai"):
+        response, model = await config.resilience.call(create, route.model)
+    metrics.incr("llm_tokens_total", response.usage.prompt_tokens, model=model, direction="in")
+    metrics.incr("llm_tokens_total", response.usage.completion_tokens, model=model, direction="out")
+    
+    # Extract the assistant's message
+    with metrics.timer("llm_stage_seconds", stage="parse"):
+        message = response.choices[0].message
+        tool_calls = getattr(message, "tool_calls", None)
+        suggested_actions = parse_suggestions(message.content, tool_calls)
+        scheduled, unscheduled = schedule_work_calls(tool_calls, index or BusyIndex([]))
+        suggested_actions.extend(scheduled)
+    
+    reply = message.content or _summarize_suggestions(suggested_actions)
+    metadata = None
+    if unscheduled:
+        reply += f" {unscheduled} minutes of work did not fit before the deadline."
+        metadata = {"unscheduled_minutes": unscheduled}
+    return LLMResponse(
+        response=reply,
+        suggested_actions=suggested_actions,
+        metadata=metadata
+    ), response.usage.total_tokens, model
+
+def try_fast_path(request: LLMRequest, headers: Dict[str, str]) -> Optional[LLMResponse]:
+    """
+    Answer simple scheduling commands locally, without calling the LLM.
+    
+    Sets the X-Fast-Path (HIT/MISS) and X-Fast-Path-Ms headers and records the
+    outcome and parse time as metrics.
+    
+    Returns:
+        Optional[LLMResponse]: The response, or None if the request needs the LLM
+    """
+    if os.getenv("LLM_FAST_PATH", "true").lower() != "true":
+        return None
+    started = time.perf_counter()
+    action = parse_command(request.message)
+    elapsed = time.perf_counter() - started
+    outcome = "hit" if action else "miss"
+    metrics.incr("llm_fast_path_total", outcome=outcome)
+    metrics.observe("llm_fast_path_seconds", elapsed, outcome=outcome)
+    headers["X-Fast-Path"] = outcome.upper()
+    headers["X-Fast-Path-Ms"] = f"{elapsed * 1000:.3f}"
+    if action is None:
+        return None
+    return LLMResponse(
+        response=confirmation_text(action["parameters"]),
+        suggested_actions=_to_task_suggestions([action]),
+        metadata={"fast_path": True}
+    )
+
+async def resolve_task_context(
+    request: LLMRequest,
+    client_id: str,
+    snapshots: TaskSnapshotStore,
+    headers: Dict[str, str]
+) -> Tuple[LLMRequest, Optional[int]]:
+    """
+    Sync the client's task snapshot and merge it into the request context.
+    
+    A full `current_tasks` list replaces the snapshot; a task_delta is applied
+    to it and the merged list becomes `current_tasks`. Requests with neither
+    leave the snapshot alone. Sets X-Task-Version when a version is known.
+    
+    Returns:
+        Tuple[LLMRequest, Optional[int]]: (request with the merged context,
+        snapshot version or None)
         
-        # Extract the assistant's message
-        assistant_message = response.choices[0].message.content
+    Raises:
+        HTTPException: 409 if the delta's base version is stale, asking the
+        client to resend its full task list; 400 for malformed deltas
+    """
+    context = dict(request.context or {})
+    version = None
+    if request.task_delta is not None:
+        delta = request.task_delta
+        try:
+            tasks, version = await snapshots.apply_delta(client_id, delta.base_version, delta.upserts, delta.deletes)
+        except SnapshotVersionMismatch as e:
+            raise HTTPException(
+                status_code=409,
+                detail="Task snapshot version mismatch. Please resend full current_tasks.",
+                headers={"X-Task-Version": str(e.current_version or 0)}
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid task delta: {str(e)}")
+        except redis.RedisError as e:
+            logger.warning("Task snapshot unavailable: %s", e)
+            raise HTTPException(
+                status_code=409,
+                detail="Task snapshot unavailable. Please resend full current_tasks."
+            )
+        context["current_tasks"] = tasks
+    elif isinstance(context.get("current_tasks"), list):
+        try:
+            version = await snapshots.replace(client_id, context["current_tasks"])
+        except redis.RedisError as e:
+            # The full list is in hand, so the request itself can still proceed
+            logger.warning("Failed to store task snapshot: %s", e)
+    else:
+        return request, None
+    
+    if version is not None:
+        headers["X-Task-Version"] = str(version)
+    return request.model_copy(update={"context": context, "task_delta": None}), version
+
+def route_request(request: LLMRequest, config: OpenAIConfig, headers: Dict[str, str]) -> ModelRoute:
+    """Pick completion settings for a request, recording the decision."""
+    route, reason = config.router.route(request.message, request.context)
+    metrics.incr("llm_route_decisions_total", route=route.name, reason=reason)
+    headers["X-LLM-Route"] = route.name
+    return route
+
+def _session_reply(llm_response: LLMResponse) -> str:
+    """Assistant turn as stored in the session, with suggestions in SUGGESTION: form."""
+    if not llm_response.suggested_actions or SUGGESTION_MARKER in llm_response.response:
+        return llm_response.response
+    actions = [action.model_dump() for action in llm_response.suggested_actions]
+    return f"{llm_response.response}\n{SUGGESTION_MARKER} {json.dumps(actions)}"
+
+def _rate_limited(cause: str) -> HTTPException:
+    """Count and build the 429 for a request refused locally ("local") or by OpenAI ("openai")."""
+    metrics.incr("llm_rate_limited_total", cause=cause)
+    return HTTPException(
+        status_code=429,
+        detail="Rate limit exceeded. Please try again later."
+    )
+
+def _cache_bypassed(request_obj: Request) -> bool:
+    """Check whether the client asked to skip the response cache."""
+    cache_control = request_obj.headers.get("cache-control", "").lower()
+    return request_obj.headers.get("x-cache-bypass") == "1" or "no-cache" in cache_control
+
+async def run_chat_pipeline(
+    request: LLMRequest,
+    client_id: str,
+    config: OpenAIConfig,
+    cache: ResponseCache,
+    flight: SingleFlight,
+    snapshots: TaskSnapshotStore,
+    sessions: SessionStore,
+    headers: Dict[str, str],
+    use_cache: bool = True,
+    priority: str = INTERACTIVE,
+    rate_limit: RateLimit = DEFAULT_RATE_LIMIT
+) -> LLMResponse:
+    """
+    Run one chat request through task sync, conversation history, the fast
+    path, admission, caching, coalescing, the outbound scheduler and the LLM.
+    
+    Shared by the single, batch and job endpoints so they behave identically.
+    
+    Args:
+        request: Chat request
+        client_id: Identifier used for rate limiting and usage tracking
+        config: OpenAI configuration
+        cache: Response cache
+        flight: Single-flight coalescer
+        snapshots: Server-side task snapshot store
+        sessions: Conversation session store
+        headers: Dict that receives diagnostic response headers (X-Cache, ...)
+        use_cache: False to skip the cache lookup (the result is still stored)
+        priority: Outbound scheduling priority (INTERACTIVE or BATCH)
+        rate_limit: Quota the request is charged to
+        
+    Returns:
+        LLMResponse: Parsed response
         
-        # Update usage statistics with actual token usage using the usage_tracking module
-        tokens_used = response.usage.total_tokens
-        update_usage(client_id, tokens_used)
+    Raises:
+        HTTPException: On stale task deltas, rate limiting or upstream failures
+    """
+    request, task_version = await resolve_task_context(request, client_id, snapshots, headers)
+    summary, history = "", []
+    if request.session_id:
+        summary, history = await sessions.load(client_id, request.session_id)
+        headers["X-Session-Id"] = request.session_id
+    horizon = schedule_horizon(datetime.now())
+    index = BusyIndex.from_tasks((request.context or {}).get("current_tasks"), horizon)
+    
+    # Simple commands cost no upstream tokens, so they skip admission entirely
+    llm_response = try_fast_path(request, headers)
+    if llm_response is None:
+        llm_response = await _answer_with_llm(
+            request, client_id, config, cache, flight, headers, use_cache, history, summary, priority, index,
+            rate_limit
+        )
+    
+    conflicts = find_conflicts(
+        [suggestion.model_dump() for suggestion in llm_response.suggested_actions or []], index, horizon
+    )
+    if conflicts:
+        metrics.incr("llm_suggestion_conflicts_total", len(conflicts))
+        llm_response.metadata = {**(llm_response.metadata or {}), "conflicts": conflicts}
+    if request.session_id:
+        await sessions.append(client_id, request.session_id, request.message, _session_reply(llm_response))
+    if task_version is not None:
+        llm_response.metadata = {**(llm_response.metadata or {}), "task_version": task_version}
+    return llm_response
+
+async def _settle_reservation(reservation: Reservation, tokens_used: int) -> None:
+    """Reconcile a rate-limit reservation, logging instead of failing if Redis is unavailable."""
+    try:
+        with metrics.timer("llm_stage_seconds", stage="usage"):
+            await reconcile_usage(reservation, tokens_used)
+    except redis.RedisError as e:
+        # The reservation stays charged until its window expires
+        logger.warning("Failed to reconcile usage: %s", e)
+
+async def _answer_with_llm(
+    request: LLMRequest,
+    client_id: str,
+    config: OpenAIConfig,
+    cache: ResponseCache,
+    flight: SingleFlight,
+    headers: Dict[str, str],
+    use_cache: bool,
+    history: List[Dict],
+    summary: str,
+    priority: str,
+    index: BusyIndex,
+    rate_limit: RateLimit
+) -> LLMResponse:
+    """Route and admit, then answer from the cache or a (coalesced) OpenAI call."""
+    route = route_request(request, config, headers)
+    with metrics.timer("llm_stage_seconds", stage="prompt"):
+        messages, prompt_metadata = build_chat_prompt(request, history, summary, index)
+    prompt_metadata["route"] = route.name
+    
+    # Check rate limits using the usage_tracking module, reserving the full
+    # prompt plus the completion allowance until the actual usage is known
+    estimated_tokens = estimate_request_tokens(messages, route.max_tokens)
+    with metrics.timer("llm_stage_seconds", stage="rate_limit"):
+        reservation = await check_rate_limit(client_id, estimated_tokens=estimated_tokens, rate_limit=rate_limit)
+    if not reservation:
+        raise _rate_limited("local")
+    
+    # Cache hits, shared results and failed calls used no tokens of their own
+    tokens_used = 0
+    try:
+        # Serve repeated prompts from the cache unless the client opted out
+        cache_key = make_cache_key(messages, route.model, route.temperature)
+        if not use_cache:
+            headers["X-Cache"] = "BYPASS"
+        else:
+            cached = await cache.get(cache_key)
+            if cached is not None:
+                headers["X-Cache"] = "HIT"
+                return LLMResponse(**cached)
+            headers["X-Cache"] = "MISS"
         
-        # Parse suggestions from the response
-        suggested_actions = []
-        if "SUGGESTION:" in assistant_message:
+        async def complete() -> dict:
+            # Wait for room in the organisation-wide OpenAI budget
+            grant = await config.scheduler.acquire(client_id, estimated_tokens, priority)
+            headers["X-Queue-Wait-Ms"] = f"{grant.wait_seconds * 1000:.1f}"
+            started = time.perf_counter()
+            tokens_used = None
             try:
-                suggestion_part = assistant_message.split("SUGGESTION:")[1].strip()
-                action_data = json.loads(suggestion_part)
-                if isinstance(action_data, list):
-                    suggested_actions = [TaskSuggestion(**action) for action in action_data]
-                else:
-                    suggested_actions = [TaskSuggestion(**action_data)]
-            except (json.JSONDecodeError, ValueError) as e:
-                print(f"Failed to parse suggestions: {e}")
+                llm_response, tokens_used, model = await _complete_chat(config, messages, route, index)
+            finally:
+                grant.release(tokens_used)
+            metrics.observe("llm_route_latency_seconds", time.perf_counter() - started, route=route.name)
+            metrics.incr("llm_route_tokens_total", tokens_used, route=route.name, model=model)
+            llm_response.metadata = {**prompt_metadata, **(llm_response.metadata or {}), "model": model}
+            return {"response": llm_response.model_dump(), "tokens_used": tokens_used}
+        
+        # Identical prompts already in flight (retries, double taps) share one call
+        result, shared = await flight.do(cache_key, complete)
+        headers["X-Singleflight"] = "SHARED" if shared else "LEADER"
+        llm_response = LLMResponse(**result["response"])
         
-        return LLMResponse(
-            response=assistant_message,
-            suggested_actions=suggested_actions
+        # Only the caller that made the upstream call is billed and fills the cache
+        if not shared:
+            tokens_used = result["tokens_used"]
+            await cache.set(cache_key, result["response"])
+        return llm_response
+        
+    except RateLimitError:
+        raise _rate_limited("openai")
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="LLM service temporarily unavailable. Please try again later.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    except (asyncio.TimeoutError, APITimeoutError):
+        raise HTTPException(
+            status_code=504,
+            detail="LLM request timed out. Please try again later."
         )
+    except AuthenticationError:
+        raise HTTPException(
+            status_code=401,
+            detail="OpenAI API authentication failed"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing LLM request: {str(e)}"
+        )
+    finally:
+        # Settle the reservation with the actual usage
+        await _settle_reservation(reservation, tokens_used)
+
+@router.post("/chat", response_model=LLMResponse)
+async def chat_with_llm(
+    request: LLMRequest,
+    request_obj: Request,
+    response_obj: Response,
+    config: OpenAIConfig = Depends(get_openai_config),
+    cache: ResponseCache = Depends(get_response_cache),
+    flight: SingleFlight = Depends(get_singleflight),
+    snapshots: TaskSnapshotStore = Depends(get_task_snapshots),
+    sessions: SessionStore = Depends(get_session_store)
+) -> LLMResponse:
+    """Process a chat message and return the LLM's response."""
+    headers: Dict[str, str] = {}
+    try:
+        return await run_chat_pipeline(
+            request,
+            request_obj.client.host,
+            config,
+            cache,
+            flight,
+            snapshots,
+            sessions,
+            headers,
+            use_cache=not _cache_bypassed(request_obj)
+        )
+    finally:
+        response_obj.headers.update(headers)
+
+@router.get("/stats")
+async def get_llm_stats() -> dict:
+    """Get in-process counters for the LLM pipeline (cache hits, coalesced calls, ...)."""
+    return metrics.snapshot()
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a single Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _estimate_stream_tokens(messages: List[Dict], completion: str) -> Tuple[int, int]:
+    """Local (prompt, completion) token counts for streams that end before OpenAI reports usage."""
+    return count_message_tokens(messages), count_tokens(completion)
+
+class _ChatStream:
+    """An open upstream chat stream and what it holds until it is settled."""
+    def __init__(
+        self,
+        stream,
+        reservation: Reservation,
+        messages: List[Dict],
+        metadata: Dict,
+        grant: Optional[Grant] = None
+    ):
+        self.stream = stream
+        self.reservation = reservation
+        self.messages = messages
+        self.metadata = metadata
+        self.grant = grant
+        self.parts: List[str] = []
+        self.usage = None
+        self.started = time.perf_counter()
+        self._settled = False
+
+    async def settle(self) -> None:
+        """
+        Release the scheduler grant, settle the rate-limit reservation with
+        the actual usage and close the upstream stream. Only the first call
+        does anything.
+        """
+        if self._settled:
+            return
+        self._settled = True
+        if self.usage is not None:
+            prompt_tokens, completion_tokens = self.usage.prompt_tokens, self.usage.completion_tokens
+        else:
+            prompt_tokens, completion_tokens = _estimate_stream_tokens(self.messages, "".join(self.parts))
+        tokens_used = prompt_tokens + completion_tokens
+        # Release before the first await: a disconnecting client cancels the
+        # awaits below, and the slot must not leak with them
+        if self.grant is not None:
+            self.grant.release(tokens_used)
+        # Shielded so usage is still accounted for when the client disconnects
+        with anyio.CancelScope(shield=True):
+            await _settle_reservation(self.reservation, tokens_used)
+            await self.stream.close()
+        metadata = self.metadata
+        if "route" in metadata:
+            metrics.observe("llm_route_latency_seconds", time.perf_counter() - self.started, route=metadata["route"])
+            metrics.incr("llm_route_tokens_total", tokens_used, route=metadata["route"], model=metadata["model"])
+        if "model" in metadata:
+            metrics.incr("llm_tokens_total", prompt_tokens, model=metadata["model"], direction="in")
+            metrics.incr("llm_tokens_total", completion_tokens, model=metadata["model"], direction="out")
+
+class _ChatStreamResponse(StreamingResponse):
+    """
+    Streams a chat as SSE frames and settles it when the response ends,
+    including when the client disconnects before the body starts.
+    """
+    def __init__(self, chat: _ChatStream, on_done: Optional[Callable[[str], Awaitable[None]]] = None, **kwargs):
+        super().__init__(_stream_chat_events(chat, on_done), media_type="text/event-stream", **kwargs)
+        self.chat = chat
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.chat.settle()
+
+async def _stream_chat_events(
+    chat: _ChatStream,
+    on_done: Optional[Callable[[str], Awaitable[None]]] = None
+) -> AsyncIterator[str]:
+    """
+    Relay a streamed completion as SSE frames.
+    
+    Emits `token` frames for each content delta, a `suggestion` frame as soon as
+    each suggestion object closes, and a final `done` frame with the full text
+    and prompt metadata.
+    The chat is settled (scheduler grant, upstream stream, rate-limit
+    reservation) when the stream finishes, fails or is cancelled by the client.
+    `on_done` receives the full text once the stream completes successfully.
+    """
+    parser = SuggestionStreamParser()
+    try:
+        async for chunk in chat.stream:
+            if chunk.usage:
+                chat.usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            chat.parts.append(delta)
+            yield sse_event("token", {"content": delta})
+            for action in parser.feed(delta):
+                try:
+                    suggestion = TaskSuggestion(**action)
+                except ValidationError:
+                    continue
+                yield sse_event("suggestion", suggestion.model_dump())
+        if on_done is not None:
+            await on_done("".join(chat.parts))
+        yield sse_event("done", {"response": "".join(chat.parts), "metadata": chat.metadata})
+    except OpenAIError as e:
+        yield sse_event("error", {"detail": f"Error processing LLM request: {str(e)}"})
+    finally:
+        await chat.settle()
+
+@router.post("/chat/stream")
+async def chat_with_llm_stream(
+    request: LLMRequest,
+    request_obj: Request,
+    config: OpenAIConfig = Depends(get_openai_config),
+    snapshots: TaskSnapshotStore = Depends(get_task_snapshots),
+    sessions: SessionStore = Depends(get_session_store)
+) -> StreamingResponse:
+    """Process a chat message and stream the LLM's response as Server-Sent Events."""
+    client_id = request_obj.client.host
+    headers: Dict[str, str] = {}
+    request, task_version = await resolve_task_context(request, client_id, snapshots, headers)
+    summary, history = "", []
+    if request.session_id:
+        summary, history = await sessions.load(client_id, request.session_id)
+        headers["X-Session-Id"] = request.session_id
+    
+    async def save_turn(text: str) -> None:
+        await sessions.append(client_id, request.session_id, request.message, text)
+    route = route_request(request, config, headers)
+    index = BusyIndex.from_tasks((request.context or {}).get("current_tasks"), schedule_horizon(datetime.now()))
+    with metrics.timer("llm_stage_seconds", stage="prompt"):
+        messages, prompt_metadata = build_chat_prompt(request, history, summary, index)
+    prompt_metadata["route"] = route.name
+    if task_version is not None:
+        prompt_metadata["task_version"] = task_version
+    
+    estimated_tokens = estimate_request_tokens(messages, route.max_tokens)
+    with metrics.timer("llm_stage_seconds", stage="rate_limit"):
+        reservation = await check_rate_limit(client_id, estimated_tokens=estimated_tokens)
+    if not reservation:
+        raise _rate_limited("local")
+    
+    grant = None
+    try:
+        # Open the upstream stream before responding so connection and auth
+        # failures still surface as proper HTTP status codes
+        async def open_stream(model: str):
+            return await config.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=route.max_tokens,
+                temperature=route.temperature,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
         
+        try:
+            grant = await config.scheduler.acquire(client_id, estimated_tokens, INTERACTIVE)
+            headers["X-Queue-Wait-Ms"] = f"{grant.wait_seconds * 1000:.1f}"
+            with metrics.timer("llm_stage_seconds", stage="openai"):
+                stream, prompt_metadata["model"] = await config.resilience.call(open_stream, route.model)
+        except BaseException:
+            # Nothing was streamed; free the slot and refund the whole reservation
+            if grant is not None:
+                grant.release()
+            with anyio.CancelScope(shield=True):
+                await _settle_reservation(reservation, 0)
+            raise
     except RateLimitError:
+        raise _rate_limited("openai")
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="LLM service temporarily unavailable. Please try again later.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    except (asyncio.TimeoutError, APITimeoutError):
         raise HTTPException(
-            status_code=429,
-            detail="Rate limit exceeded. Please try again later."
+            status_code=504,
+            detail="LLM request timed out. Please try again later."
         )
     except AuthenticationError:
         raise HTTPException(
@@ -225,4 +968,10 @@ async def chat_with_llm(
         raise HTTPException(
             status_code=500,
             detail=f"Error processing LLM request: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+    
+    return _ChatStreamResponse(
+        _ChatStream(stream, reservation, messages, prompt_metadata, grant),
+        save_turn if request.session_id else None,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **headers}
+    )
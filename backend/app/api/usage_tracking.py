@@ -2,112 +2,452 @@
 Usage Tracking Module
 
 This module handles rate limiting and token usage tracking for the LLM API.
+
+Limits are enforced over a sliding window using the sliding-window counter
+algorithm: usage is counted per fixed window of RATE_LIMIT_WINDOW seconds,
+and a request is admitted if the current window's count plus the previous
+window's count, weighted by how much of it still overlaps the sliding
+window, stays within the limit. This smooths out the burst a fixed window
+allows at its boundary while needing only two counters per limit.
+
+The check-and-consume step runs in Redis as one Lua script, invoked with
+EVALSHA, so it costs a single round trip and is atomic: concurrent requests
+cannot all read the same count and slip past the limit together. All calls
+go through the shared asyncio client, so a rate-limit check never blocks the
+event loop.
+
+Most checks need no Redis call at all. Each worker keeps an in-process bucket
+per client (LeaseLimiter) and leases quota from Redis in chunks: the script
+charges a whole chunk to the client's counters and the worker spends it
+locally. When the bucket cannot cover a request, its remainder is returned
+and a fresh chunk leased in the same script call. Leases not spent within
+RATE_LIMIT_LEASE_SECONDS are returned by a periodic reconcile (and all of
+them on shutdown), so an idle worker does not hold quota.
+
+Tokens are reserved, then reconciled. A request is admitted against its
+worst case (the prompt plus the completion allowance) and that estimate is
+charged at once, so concurrent calls cannot overrun the token limit while
+they are in flight. When the call completes or fails, reconcile_usage
+settles the reservation with the tokens actually used in one atomic script
+call: the unused part is refunded to the window it was charged to, and any
+excess is charged to the current window. While the client holds a live
+lease on that window, the difference is settled against the lease instead
+(a refund tops it up to at most one chunk), so most requests make no Redis
+call to settle either.
+
+Because quota is charged before it is spent, leasing never over-admits. The
+error is under-admission: quota leased by one worker but not yet spent is
+unavailable to the others. Chunks are sized so all workers together hold at
+most RATE_LIMIT_LEASE_ERROR (a fraction of each limit, default 0.05) per
+client; set RATE_LIMIT_WORKERS to the number of worker processes sharing
+Redis. RATE_LIMIT_LEASE_ERROR=0 leases exactly one request at a time, which
+checks every request against Redis.
+
+A client's traffic is limited per quota (RateLimit). Interactive requests
+share the default quota; bulk traffic such as /chat/batch is charged to a
+separate named quota with its own limits, so a batch does not exhaust the
+client's interactive allowance (or get refused after MAX_REQUESTS_PER_WINDOW
+items). Each quota is counted, leased and reconciled on its own.
+
 Uses Redis for persistent storage of usage data with the following structure:
 
 Keys:
-- {client_id}:requests - Number of requests in current window
-- {client_id}:tokens - Total tokens used
-- {client_id}:window_start - Start timestamp of current window
+- llm_usage:{client_id}:{window} - Hash of one client's usage in fixed window
+  number `window`, with fields:
+  - requests: Requests charged (admitted or leased)
+  - tokens: Tokens charged
+  It expires USAGE_KEY_TTL (two windows: it is still read as the previous
+  window) after it was last written, so clients that stop calling cost no
+  memory. Keys of the older layouts are converted or removed by
+  scripts/migrate_usage_keys.py.
+- llm_usage:{client_id}:{quota}:{window} - The same, for a named quota
+
+Metrics:
+- rate_limit_lease_checks_total{result} - Checks served from the local bucket
+  ("hit"), by a lease from Redis ("lease") or refused ("refused")
+- rate_limit_lease_drift{resource} - Quota this worker has leased but not
+  spent, over all clients ("requests", "tokens")
+- rate_limit_lease_returned_total{resource} - Unspent quota returned to Redis
+- rate_limit_reconciled_tokens_total{direction} - Tokens refunded ("refund")
+  or charged beyond the reservation ("overrun") when requests complete
+- rate_limit_reconcile_total{result} - Reservations settled against the
+  local lease ("local") or with a Redis script call ("redis")
 """
-from datetime import datetime, timedelta
-import json
-from typing import Tuple
-from ..core.redis_client import get_redis_client
+import asyncio
+import math
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+from redis.commands.core import AsyncScript
+from ..core.metrics import metrics
+from ..core.redis_client import get_async_redis_client
 
 # Rate limiting configuration
 RATE_LIMIT_WINDOW = 3600  # 1 hour in seconds
 MAX_REQUESTS_PER_WINDOW = 100  # Maximum requests per hour
 MAX_TOKENS_PER_WINDOW = 100000  # Maximum tokens per hour
+USAGE_KEY_PREFIX = "llm_usage"
+USAGE_KEY_TTL = 2 * RATE_LIMIT_WINDOW
+
+# Gives back unspent quota; clamped so a counter never goes negative
+RETURN_LEASE_LUA = """
+local held = redis.call('HMGET', KEYS[LEASE_KEY], 'requests', 'tokens')
+for i, field in ipairs({'requests', 'tokens'}) do
+    local returned = math.min(tonumber(ARGV[LEASE_ARG + i]), tonumber(held[i] or '0'))
+    if returned > 0 then
+        redis.call('HINCRBY', KEYS[LEASE_KEY], field, -returned)
+    end
+end
+"""
+
+# KEYS: current window, previous window, window the returned lease was taken in
+# ARGV: max requests, max tokens, tokens this request needs, previous window
+#       weight, key TTL, request chunk, token chunk, requests and tokens returned
+# Returns {requests, tokens} leased and charged (covering this request), or
+# {0, 0} if the request was refused
+RATE_LIMIT_SCRIPT = "local LEASE_KEY, LEASE_ARG = 3, 7" + RETURN_LEASE_LUA + """
+local current = redis.call('HMGET', KEYS[1], 'requests', 'tokens')
+local previous = redis.call('HMGET', KEYS[2], 'requests', 'tokens')
+local weight = tonumber(ARGV[4])
+local room_requests = tonumber(ARGV[1]) - tonumber(current[1] or '0') - tonumber(previous[1] or '0') * weight
+local room_tokens = tonumber(ARGV[2]) - tonumber(current[2] or '0') - tonumber(previous[2] or '0') * weight
+local cost = tonumber(ARGV[3])
+if room_requests < 1 or room_tokens < cost then
+    return {0, 0}
+end
+local requests = math.min(tonumber(ARGV[6]), math.floor(room_requests))
+local tokens = math.min(math.floor(room_tokens), math.max(tonumber(ARGV[7]), cost))
+redis.call('HINCRBY', KEYS[1], 'requests', requests)
+redis.call('HINCRBY', KEYS[1], 'tokens', tokens)
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return {requests, tokens}
+"""
+
+# KEYS: window the lease was taken in
+# ARGV: requests and tokens returned
+RETURN_LEASE_SCRIPT = "local LEASE_KEY, LEASE_ARG = 1, 0" + RETURN_LEASE_LUA + "return 1\n"
+
+# KEYS: window the reservation was charged to, current window
+# ARGV: tokens used minus tokens reserved, key TTL
+RECONCILE_SCRIPT = """
+local delta = tonumber(ARGV[1])
+if delta < 0 then
+    local refund = math.min(-delta, tonumber(redis.call('HGET', KEYS[1], 'tokens') or '0'))
+    if refund > 0 then
+        redis.call('HINCRBY', KEYS[1], 'tokens', -refund)
+    end
+elseif delta > 0 then
+    redis.call('HINCRBY', KEYS[2], 'tokens', delta)
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+return 1
+"""
 
-def _get_usage_data(client_id: str) -> Tuple[int, int, float]:
+class RateLimit(NamedTuple):
+    """Requests and tokens a client may charge to one quota per sliding window."""
+    requests: int
+    tokens: int
+    quota: Optional[str] = None  # Name keeping this quota's usage apart; None for the default
+
+    def bucket(self, client_id: str) -> str:
+        """Get the id this quota's usage is counted and leased under."""
+        return client_id if self.quota is None else f"{client_id}:{self.quota}"
+
+DEFAULT_RATE_LIMIT = RateLimit(MAX_REQUESTS_PER_WINDOW, MAX_TOKENS_PER_WINDOW)
+
+class Reservation(NamedTuple):
+    """Tokens charged for an admitted request until its actual usage is known."""
+    client_id: str  # Bucket the request was charged to (see RateLimit.bucket)
+    window: int  # Window the tokens were charged to
+    tokens: int
+
+def _get_rate_limit_script() -> AsyncScript:
+    """Get the rate limit script; calls use EVALSHA and load it on first use."""
+    return get_async_redis_client().register_script(RATE_LIMIT_SCRIPT)
+
+def _get_return_lease_script() -> AsyncScript:
+    """Get the script that returns unspent leased quota."""
+    return get_async_redis_client().register_script(RETURN_LEASE_SCRIPT)
+
+def _get_reconcile_script() -> AsyncScript:
+    """Get the script that settles a reservation."""
+    return get_async_redis_client().register_script(RECONCILE_SCRIPT)
+
+def _window_position(now: float) -> Tuple[int, float]:
+    """
+    Locate a moment in the fixed windows.
+    
+    Returns:
+        Tuple[int, float]: (current window number, weight of the previous
+        window: the fraction of it still inside the sliding window)
+    """
+    window, offset = divmod(now, RATE_LIMIT_WINDOW)
+    return int(window), 1 - offset / RATE_LIMIT_WINDOW
+
+def usage_key(client_id: str, window: int) -> str:
+    """Get the key of a client's usage hash for a fixed window."""
+    return f"{USAGE_KEY_PREFIX}:{client_id}:{window}"
+
+async def _get_usage_data(client_id: str) -> Tuple[float, float, float]:
     """
     Get current usage data for a client from Redis.
     
     Args:
         client_id: Unique identifier for the client
-        
+    
     Returns:
-        Tuple[int, int, float]: (request_count, token_count, window_start)
+        Tuple[float, float, float]: (request_count, token_count, window_start)
+        where the counts are sliding-window estimates
     """
-    redis_client = get_redis_client()
-    pipe = redis_client.pipeline()
+    window, weight = _window_position(datetime.now().timestamp())
+    async with get_async_redis_client().pipeline(transaction=False) as pipe:
+        pipe.hmget(usage_key(client_id, window), "requests", "tokens")
+        pipe.hmget(usage_key(client_id, window - 1), "requests", "tokens")
+        current, previous = await pipe.execute()
+    requests, tokens, previous_requests, previous_tokens = (int(count or 0) for count in current + previous)
     
-    # Get all relevant keys in a single pipeline
-    pipe.get(f"{client_id}:requests")
-    pipe.get(f"{client_id}:tokens")
-    pipe.get(f"{client_id}:window_start")
+    request_count = requests + previous_requests * weight
+    token_count = tokens + previous_tokens * weight
+    window_start = float(window * RATE_LIMIT_WINDOW)
     
-    results = pipe.execute()
+    return request_count, token_count, window_start
+
+class _Lease:
+    """Quota leased from Redis for one client and not spent yet."""
+    __slots__ = ("limit", "window", "requests", "tokens", "expires", "lock")
     
-    request_count = int(results[0]) if results[0] else 0
-    token_count = int(results[1]) if results[1] else 0
-    window_start = float(results[2]) if results[2] else datetime.now().timestamp()
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.window: Optional[int] = None
+        self.requests = 0
+        self.tokens = 0
+        self.expires = 0.0
+        self.lock = asyncio.Lock()
     
-    return request_count, token_count, window_start
+    def covers(self, tokens: int, now: float) -> bool:
+        return self.expires > now and self.requests >= 1 and self.tokens >= tokens
 
-def check_rate_limit(client_id: str, estimated_tokens: int = 0) -> bool:
-    """
-    Check if the client has exceeded their rate limit.
+class LeaseLimiter:
+    """Per-worker token buckets that lease their quota from Redis in chunks."""
+    def __init__(self):
+        # Largest fraction of each limit all workers together may hold unspent
+        self.error_bound = float(os.getenv("RATE_LIMIT_LEASE_ERROR", "0.05"))
+        self.workers = max(1, int(os.getenv("RATE_LIMIT_WORKERS", "1")))
+        self.lease_seconds = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "5"))
+        self.leases: Dict[str, _Lease] = {}
+        self.held_requests = 0
+        self.held_tokens = 0
+        self.next_reconcile = time.monotonic() + self.lease_seconds
     
-    Args:
-        client_id: Unique identifier for the client
-        estimated_tokens: Estimated number of tokens for the request
-        
-    Returns:
-        bool: True if within limits, False if exceeded
-    """
-    redis_client = get_redis_client()
-    now = datetime.now().timestamp()
+    def chunk(self, limit: RateLimit = DEFAULT_RATE_LIMIT) -> Tuple[int, int]:
+        """Get the (requests, tokens) leased at a time under `limit`."""
+        share = self.error_bound / self.workers
+        return max(1, math.floor(limit.requests * share)), math.floor(limit.tokens * share)
     
-    request_count, token_count, window_start = _get_usage_data(client_id)
+    def _hold(self, requests: int, tokens: int) -> None:
+        """Track quota held locally; negative amounts release it."""
+        self.held_requests += requests
+        self.held_tokens += tokens
+        metrics.set("rate_limit_lease_drift", self.held_requests, resource="requests")
+        metrics.set("rate_limit_lease_drift", self.held_tokens, resource="tokens")
     
-    # Check if we need to reset the window
-    if now - window_start > RATE_LIMIT_WINDOW:
-        pipe = redis_client.pipeline()
-        pipe.set(f"{client_id}:requests", 1)
-        pipe.set(f"{client_id}:tokens", estimated_tokens)
-        pipe.set(f"{client_id}:window_start", now)
-        pipe.execute()
-        return True
+    def _take(self, client_id: str, lease: _Lease, tokens: int) -> Reservation:
+        lease.requests -= 1
+        lease.tokens -= tokens
+        self._hold(-1, -tokens)
+        return Reservation(client_id, lease.window, tokens)
     
-    # Check if adding this request would exceed limits
-    if (request_count + 1 > MAX_REQUESTS_PER_WINDOW or 
-        token_count + estimated_tokens > MAX_TOKENS_PER_WINDOW):
-        return False
+    async def check(self, client_id: str, tokens: int = 0,
+                    limit: RateLimit = DEFAULT_RATE_LIMIT) -> Optional[Reservation]:
+        """
+        Admit and charge a request from the local bucket, leasing more quota if needed.
+        
+        Args:
+            client_id: Bucket to charge (see RateLimit.bucket)
+            tokens: Estimated number of tokens for the request
+            limit: Limits of the bucket's quota
+        
+        Returns:
+            Optional[Reservation]: The request's reservation, or None if the
+            limit is exceeded
+        """
+        now = time.monotonic()
+        if now >= self.next_reconcile:
+            await self.reconcile(now)
+        lease = self.leases.get(client_id)
+        if lease is None:
+            lease = self.leases[client_id] = _Lease(limit)
+        if lease.covers(tokens, now):
+            metrics.incr("rate_limit_lease_checks_total", result="hit")
+            return self._take(client_id, lease, tokens)
+        
+        # One lease per client at a time, so concurrent misses cannot stack up
+        # more unspent quota than the error bound allows
+        async with lease.lock:
+            now = time.monotonic()
+            if lease.covers(tokens, now):
+                metrics.incr("rate_limit_lease_checks_total", result="hit")
+                return self._take(client_id, lease, tokens)
+            
+            window, weight = _window_position(datetime.now().timestamp())
+            request_chunk, token_chunk = self.chunk(limit)
+            lease_window = window if lease.window is None else lease.window
+            # The script takes back whatever is left of the old lease. Empty it
+            # before awaiting, so checks served meanwhile cannot spend quota
+            # that is being returned
+            returned_requests, returned_tokens = lease.requests, lease.tokens
+            self._returned(lease)
+            granted = await _get_rate_limit_script()(
+                keys=[usage_key(client_id, window), usage_key(client_id, window - 1), usage_key(client_id, lease_window)],
+                args=[
+                    limit.requests, limit.tokens, tokens, weight, USAGE_KEY_TTL,
+                    request_chunk, token_chunk, returned_requests, returned_tokens
+                ]
+            )
+            requests, leased_tokens = (int(amount) for amount in granted)
+            if not requests:
+                metrics.incr("rate_limit_lease_checks_total", result="refused")
+                return None
+            lease.limit = limit
+            lease.window = window
+            lease.requests = requests
+            lease.tokens = leased_tokens
+            lease.expires = now + self.lease_seconds
+            self._hold(requests, leased_tokens)
+            metrics.incr("rate_limit_lease_checks_total", result="lease")
+            return self._take(client_id, lease, tokens)
     
-    # Update counters
-    pipe = redis_client.pipeline()
-    pipe.incr(f"{client_id}:requests")
-    pipe.incrby(f"{client_id}:tokens", estimated_tokens)
-    pipe.execute()
+    def _returned(self, lease: _Lease) -> None:
+        if lease.requests:
+            metrics.incr("rate_limit_lease_returned_total", lease.requests, resource="requests")
+        if lease.tokens:
+            metrics.incr("rate_limit_lease_returned_total", lease.tokens, resource="tokens")
+        self._hold(-lease.requests, -lease.tokens)
+        lease.requests = lease.tokens = 0
     
-    return True
+    def settle(self, reservation: Reservation, delta: int, window: int) -> int:
+        """
+        Settle what a live lease can of a reservation's difference from actual usage.
+        
+        A refund is credited to the client's lease when the reservation was
+        charged to the lease's window, up to a full token chunk; it was
+        charged to Redis, so it stays charged there until spent or returned
+        with the lease. An overrun is spent from a lease on the current window.
+        
+        Args:
+            reservation: Reservation being settled
+            delta: Tokens used minus tokens reserved
+            window: Current window number
+        
+        Returns:
+            int: The part of `delta` still to be settled in Redis
+        """
+        lease = self.leases.get(reservation.client_id)
+        if lease is None or lease.lock.locked() or lease.expires <= time.monotonic():
+            return delta
+        if delta < 0 and lease.window == reservation.window:
+            credit = min(-delta, max(0, self.chunk(lease.limit)[1] - lease.tokens))
+            lease.tokens += credit
+            self._hold(0, credit)
+            return delta + credit
+        if delta > 0 and lease.window == window:
+            spent = min(delta, lease.tokens)
+            lease.tokens -= spent
+            self._hold(0, -spent)
+            return delta - spent
+        return delta
+    
+    async def reconcile(self, now: Optional[float] = None) -> None:
+        """
+        Return the unspent quota of expired leases to Redis and forget idle clients.
+        
+        Args:
+            now: Leases that expired by this time are returned; None returns all of them
+        """
+        now = math.inf if now is None else now
+        self.next_reconcile = time.monotonic() + self.lease_seconds
+        returns = []
+        for client_id, lease in list(self.leases.items()):
+            if lease.lock.locked() or lease.expires > now:
+                continue
+            if lease.requests or lease.tokens:
+                returns.append(([usage_key(client_id, lease.window)], [lease.requests, lease.tokens]))
+                self._returned(lease)
+            del self.leases[client_id]
+        if not returns:
+            return
+        script = _get_return_lease_script()
+        async with get_async_redis_client().pipeline(transaction=False) as pipe:
+            for keys, args in returns:
+                await script(keys=keys, args=args, client=pipe)
+            await pipe.execute()
+
+@lru_cache()
+def get_lease_limiter() -> LeaseLimiter:
+    return LeaseLimiter()
 
-def update_usage(client_id: str, tokens_used: int) -> None:
+async def close_lease_limiter() -> None:
+    """Return every unspent lease to Redis, if a limiter was created."""
+    if get_lease_limiter.cache_info().currsize:
+        await get_lease_limiter().reconcile()
+        get_lease_limiter.cache_clear()
+
+async def check_rate_limit(client_id: str, estimated_tokens: int = 0,
+                           rate_limit: RateLimit = DEFAULT_RATE_LIMIT) -> Optional[Reservation]:
     """
-    Update the actual token usage for a request.
+    Check if the client has exceeded their rate limit, and if not, reserve the request's tokens.
+    
+    Usually answered from this worker's leased quota without calling Redis.
     
     Args:
         client_id: Unique identifier for the client
-        tokens_used: Actual number of tokens used
+        estimated_tokens: Most tokens the request can use (prompt plus
+            completion allowance)
+        rate_limit: Quota to charge the request to
+    
+    Returns:
+        Optional[Reservation]: Reservation to settle with reconcile_usage once
+        the call ends, or None if the limit is exceeded
+    """
+    return await get_lease_limiter().check(rate_limit.bucket(client_id), estimated_tokens, rate_limit)
+
+async def reconcile_usage(reservation: Reservation, tokens_used: int) -> None:
     """
-    redis_client = get_redis_client()
+    Settle a reservation with the tokens the request actually used.
     
-    # Get current token count and update it directly
-    # No need to calculate differences since we're setting the absolute value
-    redis_client.set(f"{client_id}:tokens", tokens_used)
+    Args:
+        reservation: Reservation returned by check_rate_limit
+        tokens_used: Actual number of tokens used (0 if the call failed or
+            was answered without an upstream call)
+    """
+    delta = tokens_used - reservation.tokens
+    if delta == 0:
+        return
+    metrics.incr("rate_limit_reconciled_tokens_total", abs(delta), direction="refund" if delta < 0 else "overrun")
+    window, _ = _window_position(datetime.now().timestamp())
+    delta = get_lease_limiter().settle(reservation, delta, window)
+    if delta == 0:
+        metrics.incr("rate_limit_reconcile_total", result="local")
+        return
+    metrics.incr("rate_limit_reconcile_total", result="redis")
+    await _get_reconcile_script()(
+        keys=[usage_key(reservation.client_id, reservation.window), usage_key(reservation.client_id, window)],
+        args=[delta, USAGE_KEY_TTL]
+    )
 
-def get_usage_stats(client_id: str) -> dict:
+async def get_usage_stats(client_id: str) -> dict:
     """
     Get current usage statistics for a client.
     
     Args:
         client_id: Unique identifier for the client
-        
+    
     Returns:
         dict: Usage statistics including requests, tokens, and time remaining
     """
-    request_count, token_count, window_start = _get_usage_data(client_id)
+    request_count, token_count, window_start = await _get_usage_data(client_id)
     now = datetime.now().timestamp()
     
     time_remaining = max(0, RATE_LIMIT_WINDOW - (now - window_start))
@@ -127,4 +467,4 @@ def get_usage_stats(client_id: str) -> dict:
             "start": datetime.fromtimestamp(window_start).isoformat(),
             "time_remaining_seconds": time_remaining
         }
-    } 
\ No newline at end of file
+    }
@@ -0,0 +1,187 @@
+"""
+Conversation Sessions
+
+This module keeps multi-turn chat history server-side, so follow-ups like
+"move that to Friday" can refer to earlier turns without the client resending
+them.
+
+Sessions are keyed by the client and a client-chosen session id. Each session
+holds the recent turns verbatim plus a rolling summary of older ones:
+- Once the verbatim turns pass LLM_SESSION_TOKEN_BUDGET tokens, the oldest
+  turns are folded into the summary, so prompt size stays flat however long
+  the conversation runs. Folding is done locally (first sentence of each turn,
+  suggested actions by name and time) rather than with an extra LLM call.
+- The summary itself is capped at LLM_SESSION_SUMMARY_TOKENS; the oldest
+  summary lines are dropped first
+- The stored session is capped at LLM_SESSION_MAX_BYTES
+- Sessions expire after LLM_SESSION_TTL seconds of inactivity, and at most
+  LLM_SESSION_MAX_SESSIONS are kept; the least recently used are evicted first
+
+Concurrent requests in the same session are last-writer-wins; a chat session
+is normally one user waiting for each reply.
+
+Redis keys:
+- llm_session:{client_id}:{session_id} - JSON {"summary", "turns"}
+- llm_sessions - Sorted set of session keys scored by last use, for LRU eviction
+"""
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import redis
+
+from .metrics import metrics
+from .redis_client import get_async_redis_client
+from .suggestions import SUGGESTION_MARKER, extract_suggestions
+from .tokens import MESSAGE_OVERHEAD_TOKENS, count_tokens
+
+SESSION_KEY_PREFIX = "llm_session"
+SESSION_INDEX_KEY = "llm_sessions"
+MIN_VERBATIM_TURNS = 2  # Always keep the last exchange verbatim
+SUMMARY_LINE_CHARS = 160
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+def session_key(client_id: str, session_id: str) -> str:
+    return f"{SESSION_KEY_PREFIX}:{client_id}:{session_id}"
+
+def _turn_tokens(turn: Dict) -> int:
+    return count_tokens(turn["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+def summarize_turn(turn: Dict) -> str:
+    """
+    Reduce a turn to one summary line.
+
+    Assistant turns with suggestions are summarized by their actions, since
+    those are what follow-ups usually refer to.
+    """
+    content = turn["content"]
+    if turn["role"] == "assistant" and SUGGESTION_MARKER in content:
+        actions = [
+            " ".join(str(part) for part in (
+                action.get("action"),
+                action.get("parameters", {}).get("title"),
+                action.get("parameters", {}).get("start_date")
+            ) if part)
+            for action in extract_suggestions(content)
+        ]
+        if actions:
+            return f"Assistant suggested: {'; '.join(actions)}"[:SUMMARY_LINE_CHARS]
+        content = content.split(SUGGESTION_MARKER, 1)[0]
+    first = _SENTENCE_END.split(" ".join(content.split()), 1)[0]
+    return f"{turn['role'].capitalize()}: {first}"[:SUMMARY_LINE_CHARS]
+
+def fold_history(summary: str, turns: List[Dict], token_budget: int,
+                 summary_budget: int) -> Tuple[str, List[Dict], int]:
+    """
+    Fold the oldest turns into the summary until the rest fit the budget.
+
+    Args:
+        summary: Current rolling summary (newline-separated lines)
+        turns: Verbatim turns, oldest first
+        token_budget: Maximum tokens for the verbatim turns
+        summary_budget: Maximum tokens for the summary
+
+    Returns:
+        Tuple[str, List[Dict], int]: (summary, remaining turns, turns folded)
+    """
+    total = sum(_turn_tokens(turn) for turn in turns)
+    lines = summary.splitlines() if summary else []
+    folded = 0
+    while total > token_budget and len(turns) - folded > MIN_VERBATIM_TURNS:
+        turn = turns[folded]
+        total -= _turn_tokens(turn)
+        lines.append(summarize_turn(turn))
+        folded += 1
+
+    while lines and count_tokens("\n".join(lines)) > summary_budget:
+        lines.pop(0)
+    return "\n".join(lines), turns[folded:], folded
+
+class SessionStore:
+    """Redis-backed store of conversation sessions."""
+    def __init__(self):
+        self.ttl = int(os.getenv("LLM_SESSION_TTL", "1800"))
+        self.token_budget = int(os.getenv("LLM_SESSION_TOKEN_BUDGET", "1000"))
+        self.summary_budget = int(os.getenv("LLM_SESSION_SUMMARY_TOKENS", "300"))
+        self.max_bytes = int(os.getenv("LLM_SESSION_MAX_BYTES", "32768"))
+        self.max_sessions = int(os.getenv("LLM_SESSION_MAX_SESSIONS", "10000"))
+
+    async def load(self, client_id: str, session_id: str) -> Tuple[str, List[Dict]]:
+        """
+        Get a session's summary and verbatim turns.
+
+        Returns:
+            Tuple[str, List[Dict]]: (summary, turns); empty for new, expired or
+            unreadable sessions
+        """
+        try:
+            raw = await get_async_redis_client().get(session_key(client_id, session_id))
+        except redis.RedisError:
+            metrics.incr("llm_session_errors_total", operation="load")
+            return "", []
+        if not raw:
+            return "", []
+        session = json.loads(raw)
+        return session["summary"], session["turns"]
+
+    async def append(self, client_id: str, session_id: str, user_message: str, assistant_message: str) -> None:
+        """
+        Record an exchange, folding and trimming the session to its limits.
+
+        Args:
+            client_id: Client the session belongs to
+            session_id: Client-chosen session id
+            user_message: User message text
+            assistant_message: Assistant reply as it should appear in later prompts
+        """
+        key = session_key(client_id, session_id)
+        try:
+            redis_client = get_async_redis_client()
+            raw = await redis_client.get(key)
+            session = json.loads(raw) if raw else {"summary": "", "turns": []}
+            turns = session["turns"] + [
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": assistant_message}
+            ]
+            summary, turns, folded = fold_history(
+                session["summary"], turns, self.token_budget, self.summary_budget
+            )
+            if folded:
+                metrics.incr("llm_session_folded_turns_total", folded)
+
+            data = json.dumps({"summary": summary, "turns": turns})
+            while len(data.encode()) > self.max_bytes and (turns or summary):
+                if turns:
+                    turns = turns[1:]
+                else:
+                    summary = "\n".join(summary.splitlines()[1:])
+                data = json.dumps({"summary": summary, "turns": turns})
+                metrics.incr("llm_session_truncations_total")
+
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(key, self.ttl, data)
+                pipe.zadd(SESSION_INDEX_KEY, {key: time.time()})
+                # Forget index entries whose sessions have already expired
+                pipe.zremrangebyscore(SESSION_INDEX_KEY, 0, time.time() - self.ttl)
+                pipe.zcard(SESSION_INDEX_KEY)
+                session_count = (await pipe.execute())[-1]
+            if session_count > self.max_sessions:
+                await self._evict(redis_client, session_count - self.max_sessions)
+        except redis.RedisError:
+            # Losing a turn only costs context on the next follow-up
+            metrics.incr("llm_session_errors_total", operation="append")
+
+    async def _evict(self, redis_client, count: int) -> None:
+        """Delete the least recently used sessions."""
+        evicted = [key for key, _ in await redis_client.zpopmin(SESSION_INDEX_KEY, count)]
+        if evicted:
+            await redis_client.delete(*evicted)
+            metrics.incr("llm_session_evictions_total", len(evicted))
+
+@lru_cache()
+def get_session_store() -> SessionStore:
+    return SessionStore()
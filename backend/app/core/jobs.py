@@ -0,0 +1,215 @@
+"""
+Background LLM Jobs
+
+Long planning requests ("spread this project over two weeks") can take 15+
+seconds, which mobile connections often do not survive. This module runs such
+requests as background jobs: the caller gets a job id immediately and polls
+for, or subscribes to, the result.
+
+- JobQueue: a bounded in-process queue drained by a pool of asyncio workers.
+  Workers start on first use in the running event loop and are stopped by the
+  app lifespan on shutdown, which marks jobs still queued or running as
+  failed so pollers do not wait on them until the record expires.
+- JobStore: job records in Redis with a TTL so any worker process can answer
+  a poll, plus a bounded in-process copy so same-process polls and pushes skip
+  the Redis round trip (and still work if Redis is unavailable). Local copies
+  expire with the Redis record, so neither tier outlives LLM_JOB_RESULT_TTL.
+
+A job record is {"job_id", "status", "status_code", "response", "error",
+"created_at", "started_at", "finished_at"}, with status one of queued,
+running, succeeded or failed.
+
+Redis keys:
+- llm_job:{job_id} - JSON job record, expires after LLM_JOB_RESULT_TTL
+
+Metrics:
+- llm_job_queue_depth - Jobs waiting for a worker
+- llm_job_wait_seconds / llm_job_run_seconds - Time queued / time running
+- llm_jobs_total{status} - Jobs finished (succeeded, failed) or rejected
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis
+
+from .metrics import metrics
+from .redis_client import get_async_redis_client
+
+JOB_KEY_PREFIX = "llm_job"
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job."""
+
+class JobStore:
+    """Job records in Redis with a bounded in-process copy."""
+    def __init__(self):
+        self.ttl = int(os.getenv("LLM_JOB_RESULT_TTL", "3600"))
+        self.max_local = int(os.getenv("LLM_JOB_MAX_LOCAL", "1024"))
+        # job_id -> (monotonic expiry, record), oldest save first
+        self._local: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    async def save(self, job: dict) -> None:
+        """Store a job record in both tiers."""
+        now = time.monotonic()
+        self._local[job["job_id"]] = (now + self.ttl, job)
+        self._local.move_to_end(job["job_id"])
+        # Every save uses the same TTL, so expired copies are always the oldest
+        while self._local and (
+            len(self._local) > self.max_local or next(iter(self._local.values()))[0] <= now
+        ):
+            self._local.popitem(last=False)
+        try:
+            await get_async_redis_client().setex(f"{JOB_KEY_PREFIX}:{job['job_id']}", self.ttl, json.dumps(job))
+        except redis.RedisError:
+            # This process can still answer polls for the job
+            pass
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        """
+        Get a job record, checking this process before Redis.
+
+        Returns:
+            Optional[dict]: The job record, or None if unknown or expired
+        """
+        entry = self._local.get(job_id)
+        if entry is not None:
+            expires, job = entry
+            if expires > time.monotonic():
+                return job
+            del self._local[job_id]
+        try:
+            raw = await get_async_redis_client().get(f"{JOB_KEY_PREFIX}:{job_id}")
+        except redis.RedisError:
+            return None
+        return json.loads(raw) if raw else None
+
+class JobQueue:
+    """Bounded queue of background jobs drained by a pool of asyncio workers."""
+    def __init__(self, store: JobStore):
+        self.store = store
+        self.workers = int(os.getenv("LLM_JOB_WORKERS", "4"))
+        self.max_queued = int(os.getenv("LLM_JOB_QUEUE_SIZE", "1000"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, dict] = {}
+        self._submitting = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_started(self) -> None:
+        """Start the workers in the running event loop if they are not already."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._loop = loop
+
+    async def submit(self, job_id: str, fn: Callable[[], Awaitable[Tuple[int, Optional[dict], Optional[str]]]]) -> dict:
+        """
+        Queue a job.
+
+        Args:
+            job_id: Unique job id
+            fn: Coroutine function running the job and returning
+                (status_code, response, error)
+
+        Returns:
+            dict: The queued job record
+
+        Raises:
+            QueueFullError: If LLM_JOB_QUEUE_SIZE jobs are already waiting
+        """
+        self._ensure_started()
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "status_code": None,
+            "response": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None
+        }
+        # Room is held while the record is saved, so the worker cannot record
+        # the job as running before it is recorded as queued
+        if self._queue.qsize() + self._submitting >= self.max_queued:
+            metrics.incr("llm_jobs_total", status="rejected")
+            raise QueueFullError("Too many queued jobs")
+        self._submitting += 1
+        try:
+            await self.store.save(job)
+        finally:
+            self._submitting -= 1
+        self._queue.put_nowait((job, time.monotonic(), fn))
+        metrics.set("llm_job_queue_depth", self._queue.qsize())
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job, enqueued, fn = await self._queue.get()
+            metrics.set("llm_job_queue_depth", self._queue.qsize())
+            started = time.monotonic()
+            metrics.observe("llm_job_wait_seconds", started - enqueued)
+            job = {**job, "status": "running", "started_at": time.time()}
+            self._running[job["job_id"]] = job
+            await self.store.save(job)
+            try:
+                status_code, response, error = await fn()
+            except Exception as e:
+                logger.exception("Background job %s failed", job["job_id"])
+                status_code, response, error = 500, None, f"Error processing LLM request: {str(e)}"
+            finally:
+                self._queue.task_done()
+            # Left in place on cancellation so stop() can record the job as failed
+            self._running.pop(job["job_id"], None)
+            status = "succeeded" if status_code == 200 else "failed"
+            await self.store.save({
+                **job,
+                "status": status,
+                "status_code": status_code,
+                "response": response,
+                "error": error,
+                "finished_at": time.time()
+            })
+            metrics.observe("llm_job_run_seconds", time.monotonic() - started)
+            metrics.incr("llm_jobs_total", status=status)
+
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def stop(self) -> None:
+        """Cancel the workers and mark jobs still queued or running as failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        unfinished = list(self._running.values())
+        while self._queue is not None and not self._queue.empty():
+            job, _, _ = self._queue.get_nowait()
+            unfinished.append(job)
+        for job in unfinished:
+            await self.store.save({
+                **job,
+                "status": "failed",
+                "status_code": 503,
+                "error": "Job interrupted by server shutdown. Please resubmit.",
+                "finished_at": time.time()
+            })
+            metrics.incr("llm_jobs_total", status="failed")
+        self._running = {}
+        self._tasks = []
+        self._loop = None
+        metrics.set("llm_job_queue_depth", 0)
+
+@lru_cache()
+def get_job_queue() -> JobQueue:
+    return JobQueue(JobStore())
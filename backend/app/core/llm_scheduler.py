@@ -0,0 +1,203 @@
+"""
+Outbound LLM Scheduler
+
+This module bounds the OpenAI calls we make so a burst from a few heavy
+clients cannot exhaust the organisation's quota and make everyone's calls
+fail with RateLimitError.
+
+Every completion call first acquires a grant from the scheduler:
+- Budget: a global requests-per-minute and tokens-per-minute budget
+  (LLM_GLOBAL_RPM, LLM_GLOBAL_TPM) refilled continuously as token buckets,
+  plus a cap on calls in flight (LLM_GLOBAL_CONCURRENCY). A call reserves its
+  estimated tokens up front; the difference from actual usage is settled when
+  the grant is released.
+- Priority: interactive requests (/chat, /chat/stream) are always served
+  before batch work (/chat/batch, /jobs)
+- Fairness: within a priority, waiting clients are served round-robin, one
+  call per client per turn, so a client with hundreds of queued calls cannot
+  starve one with a single call
+- Timeout: a call waiting longer than LLM_SCHEDULER_TIMEOUT seconds for a
+  grant gives up with asyncio.TimeoutError instead of queueing forever
+
+The budget is per worker process; set the limits to the organisation quota
+divided by the number of worker processes.
+
+Metrics:
+- llm_scheduler_wait_seconds{priority} - Time from acquire to grant
+- llm_scheduler_queue_depth{priority} - Calls waiting for a grant
+- llm_scheduler_in_flight - Granted calls not yet released
+- llm_scheduler_timeouts_total{priority} - Calls that gave up waiting for a grant
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+
+from .metrics import metrics
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+class TokenBucket:
+    """Continuously refilled budget of `rate_per_minute` units."""
+    def __init__(self, rate_per_minute: float):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60
+        self.level = rate_per_minute
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it already is)."""
+        # Requests larger than the whole bucket wait for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+class Grant:
+    """Permission to make one upstream call; release it when the call ends."""
+    def __init__(self, scheduler: "OutboundScheduler", reserved_tokens: int, wait_seconds: float):
+        self.scheduler = scheduler
+        self.reserved_tokens = reserved_tokens
+        self.wait_seconds = wait_seconds
+        self._released = False
+
+    def release(self, actual_tokens: Optional[int] = None) -> None:
+        """
+        Return the concurrency slot and settle the token reservation.
+
+        Args:
+            actual_tokens: Tokens the call actually used; None keeps the reservation
+        """
+        if self._released:
+            return
+        self._released = True
+        self.scheduler._release(self.reserved_tokens, actual_tokens)
+
+class _Waiter:
+    def __init__(self, tokens: int, future: asyncio.Future):
+        self.tokens = tokens
+        self.future = future
+        self.enqueued = time.monotonic()
+
+class OutboundScheduler:
+    """Global request/token budget with priority classes and per-client round-robin."""
+    def __init__(self):
+        self.requests = TokenBucket(float(os.getenv("LLM_GLOBAL_RPM", "3500")))
+        self.tokens = TokenBucket(float(os.getenv("LLM_GLOBAL_TPM", "90000")))
+        self.max_in_flight = int(os.getenv("LLM_GLOBAL_CONCURRENCY", "64"))
+        self.acquire_timeout = float(os.getenv("LLM_SCHEDULER_TIMEOUT", "30"))
+        self.in_flight = 0
+        # priority -> client_id -> waiters, in round-robin order of clients
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def queue_depth(self, priority: str) -> int:
+        """Number of calls of a priority waiting for a grant."""
+        return sum(len(waiters) for waiters in self._queues[priority].values())
+
+    async def acquire(self, client_id: str, tokens: int, priority: str = INTERACTIVE) -> Grant:
+        """
+        Wait for budget to make one upstream call.
+
+        Args:
+            client_id: Client the call is made for (the fairness key)
+            tokens: Estimated tokens the call will use
+            priority: INTERACTIVE or BATCH
+
+        Returns:
+            Grant: Release it with the actual token usage when the call ends
+
+        Raises:
+            asyncio.TimeoutError: If no grant came within LLM_SCHEDULER_TIMEOUT seconds
+        """
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(tokens, future)
+        self._queues[priority].setdefault(client_id, deque()).append(waiter)
+        metrics.set("llm_scheduler_queue_depth", self.queue_depth(priority), priority=priority)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, self.acquire_timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller gave up; hand the slot back
+                self._release(tokens, 0)
+            else:
+                self._remove(priority, client_id, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr("llm_scheduler_timeouts_total", priority=priority)
+            raise
+        wait = time.monotonic() - waiter.enqueued
+        metrics.observe("llm_scheduler_wait_seconds", wait, priority=priority)
+        return Grant(self, tokens, wait)
+
+    def _remove(self, priority: str, client_id: str, waiter: _Waiter) -> None:
+        waiters = self._queues[priority].get(client_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._queues[priority][client_id]
+        metrics.set("llm_scheduler_queue_depth", self.queue_depth(priority), priority=priority)
+
+    def _next_waiter(self):
+        """Get the next waiter by priority, then round-robin across clients."""
+        for priority in PRIORITIES:
+            clients = self._queues[priority]
+            if clients:
+                client_id, waiters = next(iter(clients.items()))
+                return priority, client_id, waiters
+        return None
+
+    def _dispatch(self) -> None:
+        """Grant waiting calls while the budget allows."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.requests.refill()
+        self.tokens.refill()
+        while self.in_flight < self.max_in_flight:
+            head = self._next_waiter()
+            if head is None:
+                return
+            priority, client_id, waiters = head
+            waiter = waiters[0]
+            delay = max(self.requests.time_until(1), self.tokens.time_until(waiter.tokens))
+            if delay > 0:
+                # Try again once the buckets have refilled enough for the head waiter
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            waiters.popleft()
+            clients = self._queues[priority]
+            del clients[client_id]
+            if waiters:
+                # Back of the line for this client's next call
+                clients[client_id] = waiters
+            metrics.set("llm_scheduler_queue_depth", self.queue_depth(priority), priority=priority)
+            if waiter.future.done():
+                continue
+            self.requests.level -= 1
+            self.tokens.level -= waiter.tokens
+            self.in_flight += 1
+            metrics.set("llm_scheduler_in_flight", self.in_flight)
+            waiter.future.set_result(None)
+
+    def _release(self, reserved_tokens: int, actual_tokens: Optional[int]) -> None:
+        self.in_flight -= 1
+        metrics.set("llm_scheduler_in_flight", self.in_flight)
+        if actual_tokens is not None:
+            # Refund an overestimate (or charge an underestimate) against the budget
+            self.tokens.refill()
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + reserved_tokens - actual_tokens)
+        try:
+            self._dispatch()
+        except RuntimeError:
+            # Released outside an event loop (e.g. during shutdown); nothing is waiting
+            pass
@@ -0,0 +1,162 @@
+"""
+Metrics Registry
+
+This module keeps lightweight in-process counters for the LLM pipeline
+(cache hits, saved upstream calls, parse failures, ...). Counters are plain
+numbers keyed by name and label values, so recording one is a dict update
+and adds no measurable cost to the request path. Observations (durations)
+are kept as a `_count` and `_sum` counter pair plus a histogram of
+LATENCY_BUCKETS, found with a bisect, so percentiles can be computed by the
+scraper.
+
+render_prometheus() serves everything in the Prometheus text exposition
+format (GET /metrics): observations as histograms, set() values as gauges and
+everything else as counters. Rendering happens only at scrape time.
+
+Usage:
+    from app.core.metrics import metrics
+
+    metrics.incr("llm_cache_hits_total", tier="local")
+    metrics.observe("llm_suggestion_parse_seconds", 0.0002, method="tool")
+    metrics.set("llm_circuit_state", 1, model="gpt-3.5-turbo")
+    with metrics.timer("llm_stage_seconds", stage="prompt"):
+        ...
+    metrics.snapshot()
+"""
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Upper bounds in seconds, from sub-millisecond local work to slow completions
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+class MetricsRegistry:
+    """In-process registry of labelled counters."""
+    def __init__(self):
+        self._counters: Dict[str, Dict[Tuple, float]] = defaultdict(lambda: defaultdict(float))
+        # name -> labels -> per-bucket (not cumulative) counts, the last one for +Inf
+        self._buckets: Dict[str, Dict[Tuple, List[int]]] = defaultdict(dict)
+        self._gauges = set()
+
+    def incr(self, name: str, amount: float = 1, **labels: str) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name: Counter name
+            amount: Value to add
+            **labels: Label values identifying the series
+        """
+        self._counters[name][tuple(sorted(labels.items()))] += amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Record an observation such as a duration.
+
+        Args:
+            name: Observation name; stored as `{name}_count` and `{name}_sum`
+            value: Observed value
+            **labels: Label values identifying the series
+        """
+        key = tuple(sorted(labels.items()))
+        self._counters[f"{name}_count"][key] += 1
+        self._counters[f"{name}_sum"][key] += value
+        series = self._buckets[name]
+        counts = series.get(key)
+        if counts is None:
+            counts = series[key] = [0] * (len(LATENCY_BUCKETS) + 1)
+        counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+
+    def timer(self, name: str, **labels: str) -> "_Timer":
+        """Observe how long a `with` block takes, in seconds, even if it raises."""
+        return _Timer(self, name, labels)
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """
+        Set a gauge to its current value.
+
+        Args:
+            name: Gauge name
+            value: Current value
+            **labels: Label values identifying the series
+        """
+        self._counters[name][tuple(sorted(labels.items()))] = value
+        self._gauges.add(name)
+
+    def get(self, name: str, **labels: str) -> float:
+        """Get the current value of a single counter series."""
+        return self._counters[name].get(tuple(sorted(labels.items())), 0)
+
+    def snapshot(self) -> dict:
+        """
+        Get all counters as a JSON-serializable dict.
+
+        Returns:
+            dict: Mapping of counter name to a list of {labels, value} series
+        """
+        return {
+            name: [{"labels": dict(labels), "value": value} for labels, value in series.items()]
+            for name, series in self._counters.items()
+        }
+
+    def render_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text, one sample per line
+        """
+        lines = []
+        histogram_parts = {f"{name}{suffix}" for name in self._buckets for suffix in ("_count", "_sum")}
+        for name, series in sorted(self._counters.items()):
+            if name in histogram_parts:
+                continue
+            lines.append(f"# TYPE {name} {'gauge' if name in self._gauges else 'counter'}")
+            lines.extend(f"{name}{_format_labels(labels)} {value:g}" for labels, value in series.items())
+        for name, series in sorted(self._buckets.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for labels, counts in series.items():
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+                    cumulative += count
+                    bucket_labels = labels + (("le", bound if bound == "+Inf" else f"{bound:g}"),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {self._counters[f'{name}_sum'][labels]:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Clear all counters."""
+        self._counters.clear()
+        self._buckets.clear()
+        self._gauges.clear()
+
+class _Timer:
+    """Context manager behind MetricsRegistry.timer, kept small for the hot path."""
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry: MetricsRegistry, name: str, labels: dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+# Create a global metrics registry
+metrics = MetricsRegistry()
@@ -3,20 +3,57 @@ Redis Client Configuration
 
 This module provides a Redis client for persistent storage of rate limiting data.
 Uses connection pooling for better performance and includes error handling.
+
+Two clients share one configuration:
+- get_async_redis_client: an asyncio client for everything running on the
+  event loop (usage tracking and the LLM stores), so Redis calls never block
+  other requests. It is created in the app lifespan and closed on shutdown.
+  Its pool blocks for up to REDIS_POOL_TIMEOUT when every connection is busy
+  instead of failing.
+- get_redis_client: the synchronous client for scripts and benchmarks that
+  run outside the app.
+
+Pooling is configured from the environment:
+- REDIS_MAX_CONNECTIONS: Connections per pool (default 50)
+- REDIS_POOL_TIMEOUT: Seconds to wait for a free connection (default 5)
+- REDIS_SOCKET_TIMEOUT: Seconds to wait for a reply (default 5)
+- REDIS_SOCKET_CONNECT_TIMEOUT: Seconds to wait for a connection (default 2)
+- REDIS_HEALTH_CHECK_INTERVAL: Seconds idle before a connection is checked
+  with PING before reuse (default 30)
+
+Every round trip to Redis (a single command, or a whole pipeline) is counted
+as redis_round_trips_total by the pool's connection class, so the cost of a
+code path in Redis calls shows up on GET /metrics.
 """
 from typing import Optional
 import redis
-from redis.connection import ConnectionPool
+import redis.asyncio
+from redis.asyncio.connection import BlockingConnectionPool, Connection as AsyncConnection
+from redis.connection import Connection, ConnectionPool
 from functools import lru_cache
 import os
 from dotenv import load_dotenv
 import pathlib
 
+from .metrics import metrics
+
 # Load environment variables
 root_dir = pathlib.Path(__file__).parents[3]  # Go up 3 levels: core -> app -> backend -> root
 env_path = root_dir / '.env'
 load_dotenv(dotenv_path=env_path)
 
+class InstrumentedConnection(Connection):
+    """Connection that counts each packet sent to Redis as one round trip."""
+    def send_packed_command(self, command, check_health=True):
+        super().send_packed_command(command, check_health)
+        metrics.incr("redis_round_trips_total")
+
+class InstrumentedAsyncConnection(AsyncConnection):
+    """Asyncio connection that counts each packet sent to Redis as one round trip."""
+    async def send_packed_command(self, command, check_health=True):
+        await super().send_packed_command(command, check_health)
+        metrics.incr("redis_round_trips_total")
+
 class RedisConfig:
     """Redis configuration with connection pooling."""
     def __init__(self):
@@ -24,15 +61,36 @@ class RedisConfig:
         self.port = int(os.getenv("REDIS_PORT", "6379"))
         self.db = int(os.getenv("REDIS_DB", "0"))
         self.password = os.getenv("REDIS_PASSWORD")
-        
-        # Create a connection pool
-        self.pool = ConnectionPool(
-            host=self.host,
-            port=self.port,
-            db=self.db,
-            password=self.password,
-            decode_responses=True,  # Automatically decode responses to strings
-            max_connections=10  # Limit maximum connections
+        self.max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+        self.pool_timeout = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+        self.socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+        self.socket_connect_timeout = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "2"))
+        self.health_check_interval = float(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+    
+    def connection_kwargs(self) -> dict:
+        """Connection settings shared by the sync and asyncio pools."""
+        return {
+            "host": self.host,
+            "port": self.port,
+            "db": self.db,
+            "password": self.password,
+            "socket_timeout": self.socket_timeout,
+            "socket_connect_timeout": self.socket_connect_timeout,
+            "health_check_interval": self.health_check_interval,
+            "decode_responses": True,  # Automatically decode responses to strings
+            "max_connections": self.max_connections
+        }
+    
+    def sync_pool(self) -> ConnectionPool:
+        """Create a connection pool for the synchronous client."""
+        return ConnectionPool(connection_class=InstrumentedConnection, **self.connection_kwargs())
+    
+    def async_pool(self) -> BlockingConnectionPool:
+        """Create a connection pool for the asyncio client."""
+        return BlockingConnectionPool(
+            connection_class=InstrumentedAsyncConnection,
+            timeout=self.pool_timeout,
+            **self.connection_kwargs()
         )
 
 @lru_cache()
@@ -48,12 +106,31 @@ def get_redis_client() -> redis.Redis:
         redis.ConnectionError: If connection to Redis fails
     """
     try:
-        config = RedisConfig()
-        client = redis.Redis(connection_pool=config.pool)
+        client = redis.Redis(connection_pool=RedisConfig().sync_pool())
         # Test the connection
         client.ping()
         return client
     except redis.ConnectionError as e:
         raise redis.ConnectionError(f"Failed to connect to Redis: {str(e)}")
     except Exception as e:
-        raise Exception(f"Error initializing Redis client: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Error initializing Redis client: {str(e)}") 
+
+@lru_cache()
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """
+    Get the shared asyncio Redis client.
+    
+    The app lifespan creates it at startup; anything running without the
+    lifespan (scripts, benchmarks) gets it created on first use. Connections
+    are opened lazily by the pool, so this does not touch the network.
+    
+    Returns:
+        redis.asyncio.Redis: Configured asyncio Redis client instance
+    """
+    return redis.asyncio.Redis(connection_pool=RedisConfig().async_pool())
+
+async def close_async_redis_client() -> None:
+    """Close the shared asyncio Redis client and its pool, if one was created."""
+    if get_async_redis_client.cache_info().currsize:
+        await get_async_redis_client().aclose(close_connection_pool=True)
+        get_async_redis_client.cache_clear()
@@ -0,0 +1,215 @@
+"""
+Resilient OpenAI Calls
+
+This module wraps upstream completion calls so a degraded OpenAI cannot pile
+up hung requests in our workers:
+- Deadlines: each attempt is bounded by OPENAI_CALL_TIMEOUT and the whole
+  call, retries included, by OPENAI_DEADLINE
+- Retries: rate limits, timeouts, connection errors and 5xx responses are
+  retried up to OPENAI_MAX_RETRIES times with full-jitter exponential backoff
+  (OPENAI_RETRY_BASE_DELAY doubling up to OPENAI_RETRY_MAX_DELAY). A
+  Retry-After header from OpenAI takes precedence over the computed delay.
+- Circuit breaker: after OPENAI_BREAKER_FAILURES consecutive failures a
+  model's breaker opens and calls fail fast for OPENAI_BREAKER_RESET seconds,
+  then a single probe call decides whether it closes again
+- Fallback: if OPENAI_FALLBACK_MODEL is set, it is tried once the primary
+  model has failed or its breaker is open
+
+Client errors (bad requests, authentication) are raised immediately and do
+not count against the breaker.
+
+Metrics:
+- llm_circuit_state{model} - 0 closed, 1 open, 2 half-open
+- llm_circuit_transitions_total{model,state}
+- llm_circuit_rejections_total{model}
+- llm_retries_total{model,reason}
+- llm_fallbacks_total{model}
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError
+)
+
+from .metrics import metrics
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError, asyncio.TimeoutError)
+
+class CircuitOpenError(Exception):
+    """Raised when every model's circuit breaker is open."""
+    def __init__(self, retry_after: float):
+        super().__init__("OpenAI is unavailable (circuit breaker open)")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one model."""
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        metrics.set("llm_circuit_state", STATE_VALUES[CLOSED], model=name)
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        metrics.set("llm_circuit_state", STATE_VALUES[state], model=self.name)
+        metrics.incr("llm_circuit_transitions_total", model=self.name, state=state)
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a probe through."""
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """Check whether a call may go through, admitting one probe when half-open."""
+        if self.state == OPEN and self.retry_after() == 0:
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+        return self.state == CLOSED
+
+    def release(self) -> None:
+        """Let another probe through after a call that neither failed nor succeeded."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            if self.state != OPEN:
+                self._transition(OPEN)
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read a Retry-After (or retry-after-ms) header from an OpenAI error, if any."""
+    if not isinstance(error, APIStatusError):
+        return None
+    headers = error.response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        # HTTP-date form; fall back to computed backoff
+        return None
+    return None
+
+def _reason(error: Exception) -> str:
+    if isinstance(error, RateLimitError):
+        return "rate_limit"
+    if isinstance(error, (asyncio.TimeoutError, APITimeoutError)):
+        return "timeout"
+    if isinstance(error, APIConnectionError):
+        return "connection"
+    return "server_error"
+
+class ResilientCaller:
+    """Runs upstream calls with deadlines, retries, circuit breaking and fallback."""
+    def __init__(self):
+        self.call_timeout = float(os.getenv("OPENAI_CALL_TIMEOUT", "20"))
+        self.deadline = float(os.getenv("OPENAI_DEADLINE", "45"))
+        self.max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+        self.base_delay = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+        self.max_delay = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "8"))
+        self.fallback_model = os.getenv("OPENAI_FALLBACK_MODEL") or None
+        self.failure_threshold = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))
+        self.reset_timeout = float(os.getenv("OPENAI_BREAKER_RESET", "30"))
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        """Get the circuit breaker for a model."""
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(model, self.failure_threshold, self.reset_timeout)
+        return self._breakers[model]
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, fn: Callable[[str], Awaitable[T]], model: str) -> Tuple[T, str]:
+        """
+        Call `fn(model)`, retrying and falling back as configured.
+
+        Args:
+            fn: Coroutine function taking the model name and making one upstream call
+            model: Primary model
+
+        Returns:
+            Tuple[T, str]: (result, model that produced it)
+
+        Raises:
+            CircuitOpenError: If every model's breaker is open
+            asyncio.TimeoutError: If the overall deadline passes
+            Exception: The last upstream error once retries are exhausted, or
+                any non-retryable error immediately
+        """
+        started = time.monotonic()
+        models = [model]
+        if self.fallback_model and self.fallback_model != model:
+            models.append(self.fallback_model)
+
+        last_error: Exception = CircuitOpenError(0.0)
+        for index, current in enumerate(models):
+            if index:
+                metrics.incr("llm_fallbacks_total", model=current)
+            breaker = self.breaker(current)
+            for attempt in range(self.max_retries + 1):
+                # Checked before allow(), which may admit this call as the half-open probe
+                remaining = self.deadline - (time.monotonic() - started)
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("OpenAI call deadline exceeded")
+                if not breaker.allow():
+                    metrics.incr("llm_circuit_rejections_total", model=current)
+                    if not isinstance(last_error, RETRYABLE_ERRORS):
+                        last_error = CircuitOpenError(breaker.retry_after())
+                    break
+                try:
+                    result = await asyncio.wait_for(fn(current), timeout=min(self.call_timeout, remaining))
+                except RETRYABLE_ERRORS as e:
+                    breaker.record_failure()
+                    last_error = e
+                except BaseException:
+                    # Client errors and cancellation say nothing about upstream health
+                    breaker.release()
+                    raise
+                else:
+                    breaker.record_success()
+                    return result, current
+
+                if attempt == self.max_retries:
+                    break
+                delay = retry_after_seconds(last_error)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                if delay >= self.deadline - (time.monotonic() - started):
+                    # Waiting would blow the deadline; try the fallback instead
+                    break
+                metrics.incr("llm_retries_total", model=current, reason=_reason(last_error))
+                await asyncio.sleep(delay)
+        raise last_error
@@ -0,0 +1,141 @@
+"""
+LLM Response Cache
+
+This module caches parsed chat responses so repeated prompts skip the OpenAI
+round trip. It has two tiers:
+- Local: an in-process LRU with a maximum size and per-entry TTL
+- Shared: Redis (via the asyncio client), so all workers benefit from a hit
+
+Keys are a SHA-256 of the normalized prompt messages plus model and
+temperature. Normalization collapses whitespace so trivially different
+spacing of the same prompt shares an entry. Case is kept: the prompt carries
+the task context, whose titles and ids are case-sensitive.
+
+Redis keys:
+- llm_cache:{hash} - JSON-encoded LLMResponse, expires after LLM_CACHE_REDIS_TTL
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+from .metrics import metrics
+from .redis_client import get_async_redis_client
+
+CACHE_KEY_PREFIX = "llm_cache"
+
+def make_cache_key(messages: List[Dict], model: str, temperature: float) -> str:
+    """
+    Build a cache key from a chat prompt.
+
+    Args:
+        messages: Prompt messages as produced by create_chat_prompt
+        model: Model name the completion is requested from
+        temperature: Sampling temperature
+
+    Returns:
+        str: Hex digest identifying the prompt
+    """
+    normalized = [
+        (message["role"], " ".join(message["content"].split()))
+        for message in messages
+    ]
+    payload = json.dumps([normalized, model, temperature], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class LocalLRUCache:
+    """In-process LRU cache with size and TTL eviction."""
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            metrics.incr("llm_cache_evictions_total", reason="ttl")
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.incr("llm_cache_evictions_total", reason="size")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class ResponseCache:
+    """Two-tier (local LRU + Redis) cache for parsed chat responses."""
+    def __init__(self):
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.redis_ttl = int(os.getenv("LLM_CACHE_REDIS_TTL", "3600"))
+        self.local = LocalLRUCache(
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+            ttl=float(os.getenv("LLM_CACHE_TTL", "300"))
+        )
+
+    async def get(self, key: str) -> Optional[dict]:
+        """
+        Look up a cached response, checking the local tier before Redis.
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            Optional[dict]: Cached response data, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        value = self.local.get(key)
+        if value is not None:
+            metrics.incr("llm_cache_hits_total", tier="local")
+            return value
+
+        try:
+            raw = await get_async_redis_client().get(f"{CACHE_KEY_PREFIX}:{key}")
+        except redis.RedisError:
+            raw = None
+        if raw is not None:
+            value = json.loads(raw)
+            self.local.set(key, value)
+            metrics.incr("llm_cache_hits_total", tier="redis")
+            return value
+
+        metrics.incr("llm_cache_misses_total")
+        return None
+
+    async def set(self, key: str, value: dict) -> None:
+        """
+        Store a response in both tiers.
+
+        Args:
+            key: Cache key from make_cache_key
+            value: JSON-serializable response data
+        """
+        if not self.enabled:
+            return
+
+        self.local.set(key, value)
+        try:
+            await get_async_redis_client().setex(f"{CACHE_KEY_PREFIX}:{key}", self.redis_ttl, json.dumps(value))
+        except redis.RedisError:
+            # The local tier still serves this worker if Redis is unavailable
+            pass
+
+@lru_cache()
+def get_response_cache() -> ResponseCache:
+    return ResponseCache()
@@ -0,0 +1,142 @@
+"""
+Single-Flight Request Coalescing
+
+This module makes concurrent callers with the same key share one execution of
+an expensive coroutine (an OpenAI completion). The first caller for a key runs
+it; everyone arriving while it is in flight awaits the same result.
+
+Two scopes are supported:
+- Local (default): coalesces within one worker process
+- Redis (LLM_SINGLEFLIGHT_REDIS=true): additionally coalesces across workers.
+  The first worker takes a short-lived lock and publishes the result; other
+  workers poll for it and fall back to running the call themselves if the
+  lock holder fails.
+
+Redis keys:
+- llm_singleflight:{key}:lock - Lock held by the worker running the call. It
+  expires after LLM_SINGLEFLIGHT_LOCK_TTL, by default the longest a call can
+  take (the scheduler wait plus the OpenAI client timeout), and the holder
+  deletes it with a compare-and-delete script so it never removes a lock
+  another worker took after its own expired.
+- llm_singleflight:{key}:result - JSON-encoded result, kept briefly for followers
+
+Results must be JSON-serializable when Redis mode is enabled.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+import redis
+
+from .metrics import metrics
+from .redis_client import get_async_redis_client
+
+KEY_PREFIX = "llm_singleflight"
+
+# KEYS: lock; ARGV: the holder's token. Deletes the lock only if still held by it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key."""
+    def __init__(self):
+        self.redis_mode = os.getenv("LLM_SINGLEFLIGHT_REDIS", "false").lower() == "true"
+        # Outlive the leader's call so followers do not stampede while it is still running
+        call_timeout = float(os.getenv("LLM_SCHEDULER_TIMEOUT", "30")) + float(os.getenv("OPENAI_TIMEOUT", "60"))
+        self.lock_ttl = float(os.getenv("LLM_SINGLEFLIGHT_LOCK_TTL", call_timeout))
+        self.result_ttl = int(os.getenv("LLM_SINGLEFLIGHT_RESULT_TTL", "10"))
+        self.poll_interval = float(os.getenv("LLM_SINGLEFLIGHT_POLL_INTERVAL", "0.05"))
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run `fn` once for all concurrent callers with the same key.
+
+        The shared call runs in its own task, so a caller disconnecting does
+        not cancel the call for everyone else waiting on it.
+
+        Args:
+            key: Fingerprint identifying identical calls
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            Tuple[Any, bool]: (result, shared) where shared is True if this
+            caller reused another caller's execution
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.incr("llm_singleflight_saved_total", scope="local")
+            result, _ = await asyncio.shield(task)
+            return result, True
+
+        task = asyncio.ensure_future(self._run(key, fn))
+        self._inflight[key] = task
+        task.add_done_callback(lambda finished: self._forget(key, finished))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        if not self.redis_mode:
+            return await fn(), False
+
+        redis_client = get_async_redis_client()
+        lock_key = f"{KEY_PREFIX}:{key}:lock"
+        result_key = f"{KEY_PREFIX}:{key}:result"
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = await redis_client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except redis.RedisError:
+            # Without Redis we still coalesce within this worker
+            return await fn(), False
+
+        if acquired:
+            try:
+                result = await fn()
+                try:
+                    await redis_client.setex(result_key, self.result_ttl, json.dumps(result))
+                except redis.RedisError:
+                    pass
+                return result, False
+            finally:
+                try:
+                    await redis_client.register_script(RELEASE_LOCK_SCRIPT)(keys=[lock_key], args=[token])
+                except redis.RedisError:
+                    pass
+
+        # Another worker holds the lock: wait for its result
+        deadline = time.monotonic() + self.lock_ttl
+        try:
+            while time.monotonic() < deadline:
+                # Check the lock before the result: the holder writes the result
+                # before releasing, so a released lock with no result means it failed
+                lock_held = await redis_client.exists(lock_key)
+                raw = await redis_client.get(result_key)
+                if raw is not None:
+                    metrics.incr("llm_singleflight_saved_total", scope="redis")
+                    return json.loads(raw), True
+                if not lock_held:
+                    break
+                await asyncio.sleep(self.poll_interval)
+        except redis.RedisError:
+            pass
+
+        # The lock holder failed or timed out, so make the call ourselves
+        return await fn(), False
+
+@lru_cache()
+def get_singleflight() -> SingleFlight:
+    return SingleFlight()
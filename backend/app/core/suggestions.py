@@ -0,0 +1,193 @@
+"""
+Suggestion Parsing
+
+This module extracts structured task suggestions from LLM output.
+
+The chat endpoint offers the model a `suggest_tasks` function whose arguments
+follow a typed schema, so suggestions normally arrive as validated JSON
+(parse_tool_arguments). When the model answers in text instead, suggestions
+are expected after a `SUGGESTION:` marker as a JSON array of objects, and
+extract_suggestions recovers them in a single pass even when they are wrapped
+in prose or code fences.
+
+For work split over several days the model can instead call
+`schedule_work` with just the effort, deadline and working hours
+(ScheduleWorkArguments); the auto-scheduler then places the chunks.
+
+The incremental parser consumes streamed text chunk by chunk and yields each
+suggestion object as soon as its closing brace arrives, so clients can render
+suggestions while the rest of the completion is still being generated.
+"""
+import json
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+SUGGESTION_MARKER = "SUGGESTION:"
+SUGGEST_TASKS_FUNCTION = "suggest_tasks"
+SCHEDULE_WORK_FUNCTION = "schedule_work"
+
+class TaskParameters(BaseModel):
+    """Typed parameters of a suggested task action."""
+    model_config = ConfigDict(extra="allow")
+
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_date: Optional[str] = None  # ISO 8601
+    end_date: Optional[str] = None  # ISO 8601
+    recurrence: Optional[str] = None  # RRULE, e.g. FREQ=WEEKLY;BYDAY=MO,WE
+
+class StructuredSuggestion(BaseModel):
+    """A single suggested action as returned through the suggest_tasks function."""
+    action: Literal["create_task", "update_task", "delete_task", "reschedule_task"]
+    parameters: TaskParameters
+
+class SuggestTasksArguments(BaseModel):
+    """Arguments of the suggest_tasks function."""
+    suggestions: List[StructuredSuggestion]
+
+SUGGEST_TASKS_TOOL = {
+    "type": "function",
+    "function": {
+        "name": SUGGEST_TASKS_FUNCTION,
+        "description": "Suggest task actions for the user to accept or reject.",
+        "parameters": SuggestTasksArguments.model_json_schema()
+    }
+}
+
+class ScheduleWorkArguments(BaseModel):
+    """Arguments of the schedule_work function."""
+    title: str
+    description: Optional[str] = None
+    total_minutes: int = Field(gt=0, description="Total effort in minutes")
+    deadline: str = Field(description="ISO 8601 time by which the work must be done")
+    chunk_minutes: Optional[int] = Field(default=None, gt=0, description="Longest single work session")
+    workday_start: Optional[str] = Field(default=None, description="Start of working hours, HH:MM")
+    workday_end: Optional[str] = Field(default=None, description="End of working hours, HH:MM")
+    weekdays_only: bool = False
+
+SCHEDULE_WORK_TOOL = {
+    "type": "function",
+    "function": {
+        "name": SCHEDULE_WORK_FUNCTION,
+        "description": (
+            "Split work over several days: the server places sessions in the user's free time "
+            "before the deadline and suggests them as tasks."
+        ),
+        "parameters": ScheduleWorkArguments.model_json_schema()
+    }
+}
+
+class SuggestionStreamParser:
+    """
+    Incremental parser for suggestion objects in streamed assistant text.
+
+    Text before the `SUGGESTION:` marker is ignored unless `require_marker`
+    is False. After the marker, the parser tracks brace depth (skipping braces
+    inside JSON strings) and decodes each top-level object once it closes.
+    Array brackets and separators between objects are skipped, so a partially
+    streamed array never needs to be valid JSON as a whole.
+    """
+    def __init__(self, require_marker: bool = True):
+        self._pending = ""  # Unscanned text that may contain the marker
+        self._in_suggestions = not require_marker
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._current: List[str] = []
+
+    def feed(self, chunk: str) -> List[dict]:
+        """
+        Consume a chunk of streamed text.
+
+        Args:
+            chunk: Next piece of assistant text
+
+        Returns:
+            List[dict]: Suggestion objects completed by this chunk
+        """
+        if not self._in_suggestions:
+            self._pending += chunk
+            index = self._pending.find(SUGGESTION_MARKER)
+            if index == -1:
+                # Keep just enough of the tail to match a marker split across chunks
+                self._pending = self._pending[-(len(SUGGESTION_MARKER) - 1):]
+                return []
+            chunk = self._pending[index + len(SUGGESTION_MARKER):]
+            self._pending = ""
+            self._in_suggestions = True
+
+        completed = []
+        for char in chunk:
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._current = [char]
+                continue
+
+            self._current.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        action = json.loads("".join(self._current))
+                    except json.JSONDecodeError:
+                        action = None
+                    if isinstance(action, dict):
+                        completed.append(action)
+                    self._current = []
+        return completed
+
+def parse_tool_arguments(arguments: str) -> List[dict]:
+    """
+    Validate the arguments of a suggest_tasks function call.
+
+    Args:
+        arguments: JSON-encoded function arguments from the model
+
+    Returns:
+        List[dict]: Suggestions as {"action", "parameters"} dicts
+
+    Raises:
+        ValueError: If the arguments do not match the schema
+    """
+    parsed = SuggestTasksArguments.model_validate_json(arguments)
+    return [
+        {"action": item.action, "parameters": item.parameters.model_dump(exclude_none=True)}
+        for item in parsed.suggestions
+    ]
+
+def extract_suggestions(text: str) -> List[dict]:
+    """
+    Tolerantly extract suggestion objects from assistant text in one pass.
+
+    Accepts a JSON array or object after `SUGGESTION:`, with or without code
+    fences and surrounding prose. Without the marker, any JSON object in the
+    text that has an "action" key is taken as a suggestion. A wrapping
+    {"suggestions": [...]} object is unwrapped.
+
+    Args:
+        text: Assistant message content
+
+    Returns:
+        List[dict]: Suggestion objects found (possibly empty)
+    """
+    parser = SuggestionStreamParser(require_marker=SUGGESTION_MARKER in text)
+    suggestions = []
+    for item in parser.feed(text):
+        if isinstance(item.get("suggestions"), list):
+            suggestions.extend(entry for entry in item["suggestions"] if isinstance(entry, dict))
+        elif "action" in item:
+            suggestions.append(item)
+    return suggestions
@@ -0,0 +1,160 @@
+"""
+Task Snapshots
+
+The mobile client used to upload its full `current_tasks` list with every
+chat request. This module keeps a per-client copy of that list in Redis so the
+client can send only what changed since the last version it saw.
+
+Protocol:
+- A request with `context.current_tasks` replaces the snapshot and bumps its
+  version
+- A request with a `task_delta` ({"base_version", "upserts", "deletes"}) is
+  applied to the stored snapshot if base_version matches the stored version.
+  Upserted tasks must carry an "id"; they replace the task with the same id
+  or are appended. Deletes are task ids.
+- On a version mismatch (including an expired or missing snapshot) the client
+  must resend the full list
+
+Versions only ever increase while the snapshot exists, and updates use
+optimistic WATCH/MULTI transactions so concurrent writers cannot silently
+overwrite each other.
+
+Redis keys:
+- task_snapshot:{client_id} - JSON {"version", "tasks"}, expires after
+  LLM_TASK_SNAPSHOT_TTL seconds (default 7 days)
+"""
+import json
+import os
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import redis
+
+from .metrics import metrics
+from .redis_client import get_async_redis_client
+
+MAX_WRITE_ATTEMPTS = 3
+
+class SnapshotVersionMismatch(Exception):
+    """Raised when a delta's base version does not match the stored snapshot."""
+    def __init__(self, current_version: Optional[int]):
+        super().__init__(f"Task snapshot is at version {current_version}")
+        self.current_version = current_version
+
+def snapshot_key(client_id: str) -> str:
+    return f"task_snapshot:{client_id}"
+
+def merge_tasks(tasks: List[dict], upserts: List[dict], deletes: List[str]) -> List[dict]:
+    """
+    Apply a delta to a task list, keeping the original order.
+
+    Args:
+        tasks: Current tasks
+        upserts: Tasks to add or replace, matched by "id"
+        deletes: Ids of tasks to remove
+
+    Returns:
+        List[dict]: Merged task list
+
+    Raises:
+        ValueError: If an upserted task has no id
+    """
+    merged = {}
+    for index, task in enumerate(tasks):
+        task_id = task.get("id") if isinstance(task, dict) else None
+        # Tasks without ids stay in place but cannot be targeted by later deltas
+        merged[str(task_id) if task_id is not None else ("", index)] = task
+    for task in upserts:
+        if task.get("id") is None:
+            raise ValueError("Upserted tasks must have an id")
+        merged[str(task["id"])] = task
+    for task_id in deletes:
+        merged.pop(str(task_id), None)
+    return list(merged.values())
+
+class TaskSnapshotStore:
+    """Redis-backed store of each client's current task list."""
+    def __init__(self):
+        self.ttl = int(os.getenv("LLM_TASK_SNAPSHOT_TTL", str(7 * 24 * 3600)))
+
+    async def replace(self, client_id: str, tasks: List[dict]) -> int:
+        """
+        Store a full task list as the client's new snapshot.
+
+        Args:
+            client_id: Client the snapshot belongs to
+            tasks: Full task list
+
+        Returns:
+            int: New snapshot version
+
+        Raises:
+            redis.RedisError: If Redis is unavailable or contended
+        """
+        version, _ = await self._update(client_id, lambda current: tasks)
+        metrics.incr("llm_task_snapshot_updates_total", kind="full")
+        return version
+
+    async def apply_delta(self, client_id: str, base_version: int, upserts: List[dict],
+                    deletes: List[str]) -> Tuple[List[dict], int]:
+        """
+        Apply a delta to the client's snapshot.
+
+        Args:
+            client_id: Client the snapshot belongs to
+            base_version: Version the delta was computed against
+            upserts: Tasks to add or replace
+            deletes: Ids of tasks to remove
+
+        Returns:
+            Tuple[List[dict], int]: (merged tasks, new version); an empty delta
+            returns the stored snapshot without bumping the version
+
+        Raises:
+            SnapshotVersionMismatch: If base_version is not the stored version
+            ValueError: If an upserted task has no id
+            redis.RedisError: If Redis is unavailable or contended
+        """
+        def merge(current: Optional[dict]) -> Optional[List[dict]]:
+            version = current["version"] if current else None
+            if version != base_version:
+                metrics.incr("llm_task_snapshot_mismatches_total")
+                raise SnapshotVersionMismatch(version)
+            if not upserts and not deletes:
+                return None
+            return merge_tasks(current["tasks"], upserts, deletes)
+
+        version, tasks = await self._update(client_id, merge)
+        metrics.incr("llm_task_snapshot_updates_total", kind="delta")
+        return tasks, version
+
+    async def _update(self, client_id: str, change) -> Tuple[int, List[dict]]:
+        """
+        Run a read-modify-write of the snapshot under WATCH.
+
+        `change` gets the stored {"version", "tasks"} (or None) and returns the
+        new task list, or None to leave the snapshot untouched.
+        """
+        key = snapshot_key(client_id)
+        async with get_async_redis_client().pipeline() as pipe:
+            for _ in range(MAX_WRITE_ATTEMPTS):
+                try:
+                    await pipe.watch(key)
+                    raw = await pipe.get(key)
+                    current = json.loads(raw) if raw else None
+                    tasks = change(current)
+                    if tasks is None:
+                        await pipe.unwatch()
+                        return current["version"], current["tasks"]
+                    version = (current["version"] if current else 0) + 1
+                    pipe.multi()
+                    pipe.setex(key, self.ttl, json.dumps({"version": version, "tasks": tasks}))
+                    await pipe.execute()
+                    return version, tasks
+                except redis.WatchError:
+                    continue
+        raise redis.RedisError(f"Task snapshot for {client_id} is being updated concurrently")
+
+@lru_cache()
+def get_task_snapshots() -> TaskSnapshotStore:
+    return TaskSnapshotStore()
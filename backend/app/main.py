@@ -3,9 +3,15 @@ Main application module for the Velo backend API.
 This module initializes the FastAPI application and sets up the API routes.
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import llm
+from fastapi.responses import PlainTextResponse
+from app.api import batch, jobs, llm
+from app.api.usage_tracking import close_lease_limiter
+from app.core.jobs import get_job_queue
+from app.core.metrics import metrics
+from app.core.redis_client import close_async_redis_client, get_async_redis_client
 from dotenv import load_dotenv
 import os
 import pathlib
@@ -20,10 +26,30 @@ load_dotenv(dotenv_path=env_path)
 if not os.getenv("OPENAI_API_KEY"):
     raise ValueError(f"OPENAI_API_KEY not found in environment variables. Please check your .env file at {env_path}")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Manage resources shared across requests for the lifetime of the app.
+    
+    The asyncio Redis client is created at startup. The pooled OpenAI HTTP
+    transport, the background job workers and the rate limiter's leases are
+    created lazily on first use. All of them are stopped here on shutdown so
+    connections are released cleanly, jobs that cannot finish are marked
+    failed and unspent leased quota goes back to Redis.
+    """
+    get_async_redis_client()
+    yield
+    if get_job_queue.cache_info().currsize:
+        await get_job_queue().stop()
+    await llm.close_openai_client()
+    await close_lease_limiter()
+    await close_async_redis_client()
+
 app = FastAPI(
     title="Velo API",
     description="Backend API for Velo",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -37,6 +63,8 @@ app.add_middleware(
 
 # Include routers
 app.include_router(llm.router, prefix="/api/llm", tags=["llm"])
+app.include_router(batch.router, prefix="/api/llm", tags=["llm"])
+app.include_router(jobs.router, prefix="/api/llm", tags=["llm"])
 
 @app.get("/health")
 async def health_check():
@@ -46,4 +74,14 @@ async def health_check():
     Returns:
         dict: Status message indicating API health
     """
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> PlainTextResponse:
+    """
+    Prometheus scrape endpoint.
+    
+    Returns:
+        PlainTextResponse: All in-process metrics in the text exposition format
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
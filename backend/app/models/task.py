@@ -29,6 +29,7 @@ class Task(Base):
         scheduled_time (datetime, optional): When the task is scheduled for
         created_at (datetime): When the task was created
         duration (int): Duration of the task in minutes
+        recurrence (str, optional): RRULE the task repeats by, starting at scheduled_time
         updated_at (datetime): When the task was last updated
     """
     __tablename__ = "tasks"
@@ -41,6 +42,7 @@ class Task(Base):
     scheduled_time = Column(DateTime, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     duration = Column(Integer, nullable=False)
+    recurrence = Column(String, nullable=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
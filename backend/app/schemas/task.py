@@ -5,13 +5,26 @@ from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field, conint
+from pydantic import BaseModel, Field, conint, field_validator
+
+from app.services.recurrence import parse_rrule
+
+def _validate_recurrence(value: Optional[str]) -> Optional[str]:
+    """Reject recurrence rules the recurrence engine cannot expand."""
+    if value:
+        parse_rrule(value)
+    return value or None
 
 class TaskBase(BaseModel):
     """Base schema for task data."""
     title: str = Field(..., min_length=1, max_length=255)
     duration: conint(gt=0) = Field(..., description="Task duration in minutes")
     is_completed: bool = Field(default=False)
+    recurrence: Optional[str] = Field(
+        None, max_length=255, description="RRULE, e.g. FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"
+    )
+
+    _check_recurrence = field_validator("recurrence")(_validate_recurrence)
 
 class TaskCreate(TaskBase):
     """Schema for creating a new task."""
@@ -22,6 +35,9 @@ class TaskUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=255)
     duration: Optional[conint(gt=0)] = Field(None, description="Task duration in minutes")
     is_completed: Optional[bool] = None
+    recurrence: Optional[str] = Field(None, max_length=255, description="RRULE; empty string removes it")
+
+    _check_recurrence = field_validator("recurrence")(_validate_recurrence)
 
 class TaskInDB(TaskBase):
     """Schema for task as stored in database."""
@@ -0,0 +1,213 @@
+"""
+Auto-Scheduler
+
+Splitting work over several days ("I need 10 hours for the thesis before
+Friday") used to be left to the model, which was slow and often placed chunks
+on top of existing tasks or outside working hours. With the schedule_work
+function the model only extracts the parameters (total effort, deadline,
+working hours) and this module places the chunks deterministically.
+
+The horizon from now to the deadline is held as a per-minute NumPy
+availability bitmap:
+- Minutes outside working hours (and on weekends, if asked) are masked out
+  in one vectorized pass over minute-of-day and day-of-week arrays
+- Existing tasks are cleared from the bitmap using the busy blocks of the
+  request's BusyIndex
+- Free runs are found with a single np.diff over the bitmap
+
+Chunks are placed in two passes. The first spreads the work evenly, capping
+each day at the total effort divided by the days that have room; the second
+fills whatever is left into the earliest remaining free time. Chunks are at
+most chunk_minutes long, separated by BREAK_MINUTES and start on
+ALIGN_MINUTES boundaries, so a month-long horizon solves in a few
+milliseconds and always gives the same plan for the same input.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..core.suggestions import ScheduleWorkArguments
+from .context_compaction import parse_date
+from .free_busy import WORKDAY_END_HOUR, WORKDAY_START_HOUR, BusyIndex
+
+MINUTES_PER_DAY = 24 * 60
+ALIGN_MINUTES = 15
+DEFAULT_CHUNK_MINUTES = 60
+MIN_CHUNK_MINUTES = 30
+BREAK_MINUTES = 15
+MAX_HORIZON_DAYS = 92
+
+def availability(start: datetime, end: datetime, index: BusyIndex,
+                 workday: Tuple[int, int], weekdays_only: bool = False) -> np.ndarray:
+    """
+    Build the per-minute availability bitmap of a horizon.
+
+    Args:
+        start: First minute of the horizon
+        end: End of the horizon (exclusive)
+        index: Busy index of the user's existing tasks
+        workday: (start, end) of working hours as minutes after midnight
+        weekdays_only: Whether Saturdays and Sundays are unavailable
+
+    Returns:
+        np.ndarray: Boolean array, True where the minute is free
+    """
+    minutes = max(0, int((end - start).total_seconds() // 60))
+    offset = start.hour * 60 + start.minute
+    absolute = np.arange(offset, offset + minutes)
+    minute_of_day = absolute % MINUTES_PER_DAY
+    free = (minute_of_day >= workday[0]) & (minute_of_day < workday[1])
+    if weekdays_only:
+        free &= (start.weekday() + absolute // MINUTES_PER_DAY) % 7 < 5
+    for busy_start, busy_end in index.busy_blocks(start, end):
+        first = int((busy_start - start).total_seconds() // 60)
+        last = math.ceil((busy_end - start).total_seconds() / 60)
+        free[first:last] = False
+    return free
+
+def _free_runs(free: np.ndarray) -> List[Tuple[int, int]]:
+    """Get the [start, end) minute ranges of consecutive free minutes."""
+    edges = np.diff(np.concatenate(([0], free.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+
+def _place(free: np.ndarray, offset: int, remaining: int, chunk_minutes: int,
+           min_chunk: int, daily_cap: Optional[int], used: dict) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    Greedily place chunks into the free runs of a bitmap, earliest first.
+
+    Placed minutes are cleared from `free` and added to `used` (per day).
+
+    Returns:
+        Tuple[List[Tuple[int, int]], int]: (placed [start, end) minute ranges,
+        minutes still to place)
+    """
+    placed = []
+    for run_start, run_end in _free_runs(free):
+        # Align to the wall clock, not to the start of the horizon
+        cursor = run_start + (-(offset + run_start)) % ALIGN_MINUTES
+        while remaining > 0 and cursor < run_end:
+            day = (offset + cursor) // MINUTES_PER_DAY
+            room = run_end - cursor
+            if daily_cap is not None:
+                room = min(room, daily_cap - used.get(day, 0))
+            length = min(chunk_minutes, remaining, room)
+            if length < min(min_chunk, remaining):
+                if daily_cap is not None and used.get(day, 0) >= daily_cap:
+                    # Day is full; skip ahead to the next one
+                    cursor = (day + 1) * MINUTES_PER_DAY - offset
+                    cursor += (-(offset + cursor)) % ALIGN_MINUTES
+                    continue
+                break
+            placed.append((cursor, cursor + length))
+            free[cursor:cursor + length] = False
+            used[day] = used.get(day, 0) + length
+            remaining -= length
+            # Leave a break before the next chunk in the same free run
+            cursor += length + BREAK_MINUTES
+            cursor += (-(offset + cursor)) % ALIGN_MINUTES
+        if remaining == 0:
+            break
+    return placed, remaining
+
+def schedule_work(
+    title: str,
+    total_minutes: int,
+    deadline: datetime,
+    index: BusyIndex,
+    now: datetime,
+    description: Optional[str] = None,
+    chunk_minutes: int = DEFAULT_CHUNK_MINUTES,
+    workday: Tuple[int, int] = (WORKDAY_START_HOUR * 60, WORKDAY_END_HOUR * 60),
+    weekdays_only: bool = False
+) -> Tuple[List[dict], int]:
+    """
+    Split work into chunks placed in free time before a deadline.
+
+    Args:
+        title: Title of the work; chunks are titled "{title} (i/n)"
+        total_minutes: Total effort
+        deadline: Time by which all chunks should end
+        index: Busy index of the user's existing tasks
+        now: Current time; nothing is placed earlier
+        description: Description copied to every chunk
+        chunk_minutes: Longest single chunk
+        workday: (start, end) of working hours as minutes after midnight
+        weekdays_only: Whether to leave weekends free
+
+    Returns:
+        Tuple[List[dict], int]: (create_task suggestions in time order,
+        minutes that did not fit before the deadline)
+    """
+    start = now.replace(second=0, microsecond=0)
+    end = min(deadline, start + timedelta(days=MAX_HORIZON_DAYS))
+    if total_minutes <= 0 or end <= start:
+        return [], max(0, total_minutes)
+    free = availability(start, end, index, workday, weekdays_only)
+    offset = start.hour * 60 + start.minute
+    chunk_minutes = max(ALIGN_MINUTES, chunk_minutes)
+    min_chunk = min(MIN_CHUNK_MINUTES, chunk_minutes)
+
+    # Spread evenly over the days that have room for at least one chunk
+    days = (offset + np.arange(len(free))) // MINUTES_PER_DAY
+    free_per_day = np.bincount(days, weights=free, minlength=int(days[-1]) + 1 if len(days) else 0)
+    usable_days = int(np.count_nonzero(free_per_day >= min_chunk))
+    used: dict = {}
+    placed, remaining = [], total_minutes
+    if usable_days:
+        daily_cap = math.ceil(total_minutes / usable_days / ALIGN_MINUTES) * ALIGN_MINUTES
+        placed, remaining = _place(free, offset, remaining, chunk_minutes, min_chunk, daily_cap, used)
+    if remaining:
+        more, remaining = _place(free, offset, remaining, chunk_minutes, min_chunk, None, used)
+        placed = sorted(placed + more)
+
+    suggestions = []
+    for number, (first, last) in enumerate(placed, start=1):
+        parameters = {
+            "title": f"{title} ({number}/{len(placed)})" if len(placed) > 1 else title,
+            "start_date": (start + timedelta(minutes=first)).isoformat(),
+            "end_date": (start + timedelta(minutes=last)).isoformat()
+        }
+        if description:
+            parameters["description"] = description
+        suggestions.append({"action": "create_task", "parameters": parameters})
+    return suggestions, remaining
+
+def _clock_minutes(value: Optional[str], default_hour: int) -> int:
+    """Parse "HH:MM" to minutes after midnight, falling back to `default_hour`."""
+    try:
+        hours, minutes = (int(part) for part in (value or "").split(":")[:2])
+    except ValueError:
+        return default_hour * 60
+    return min(MINUTES_PER_DAY, max(0, hours * 60 + minutes))
+
+def schedule_from_arguments(arguments: ScheduleWorkArguments, index: BusyIndex,
+                            now: datetime) -> Tuple[List[dict], int]:
+    """
+    Run schedule_work with the arguments of a schedule_work function call.
+
+    A date-only deadline means the end of that day.
+
+    Raises:
+        ValueError: If the deadline is not an ISO 8601 date or time
+    """
+    deadline = parse_date(arguments.deadline)
+    if deadline is None:
+        raise ValueError(f"Invalid deadline: {arguments.deadline!r}")
+    if len(arguments.deadline) == len("2024-03-20"):
+        deadline += timedelta(days=1)
+    return schedule_work(
+        arguments.title,
+        arguments.total_minutes,
+        deadline,
+        index,
+        now,
+        description=arguments.description,
+        chunk_minutes=arguments.chunk_minutes or DEFAULT_CHUNK_MINUTES,
+        workday=(
+            _clock_minutes(arguments.workday_start, WORKDAY_START_HOUR),
+            _clock_minutes(arguments.workday_end, WORKDAY_END_HOUR)
+        ),
+        weekdays_only=arguments.weekdays_only
+    )
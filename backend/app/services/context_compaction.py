@@ -0,0 +1,220 @@
+"""
+Context Compaction
+
+The mobile client sends every task the user has ever had as
+`context["current_tasks"]`. This module trims that list down to the tasks
+relevant to the current message before the prompt is built, so prompt size
+stays within a token budget regardless of how long the user's history is.
+
+Tasks are ranked by:
+- Date window: tasks dated inside the window the message refers to
+  ("today", "tomorrow", "this week", ...) rank higher, tasks far outside it
+  are dropped. Repeating tasks are dated by their next occurrence from the
+  window's start, expanded lazily from their recurrence rule
+- Completion state: completed tasks are dropped unless the message asks
+  about finished work or mentions them by name
+- Keyword overlap: tasks sharing words with the message rank highest
+
+Null and empty fields are removed, and tasks are added in rank order until
+the token budget is reached.
+"""
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+
+from ..core.tokens import count_tokens
+from .recurrence import occurrences, recurrence_rule
+
+DEFAULT_WINDOW_DAYS = 14
+
+DATE_FIELDS = ("start_date", "due_date", "end_date", "scheduled_time")
+COMPLETED_HINTS = {"done", "completed", "complete", "finished", "did", "accomplished"}
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "into", "about", "what",
+    "when", "where", "which", "have", "has", "are", "was", "were", "will", "can",
+    "could", "should", "would", "please", "add", "task", "tasks", "schedule",
+    "plan", "make", "put", "move", "my", "me", "our", "your", "you", "all",
+    "today", "tomorrow", "week", "next", "day", "days", "time"
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+def keyword_set(text: str) -> Set[str]:
+    """Get the significant words of a text for keyword matching."""
+    return {
+        word for word in WORD_PATTERN.findall(text.lower())
+        if len(word) > 2 and word not in STOPWORDS
+    }
+
+def _strip_empty(value):
+    """Recursively drop None, empty strings and empty containers."""
+    if isinstance(value, dict):
+        cleaned = {key: _strip_empty(item) for key, item in value.items()}
+        return {key: item for key, item in cleaned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        cleaned = [_strip_empty(item) for item in value]
+        return [item for item in cleaned if item not in (None, "", [], {})]
+    return value
+
+def parse_date(value) -> Optional[datetime]:
+    """Parse an ISO 8601 string to a naive local datetime, or None if it is not one."""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def task_date(task: dict) -> Optional[datetime]:
+    """Get the first parseable date on a task, if any."""
+    for field in DATE_FIELDS:
+        parsed = parse_date(task.get(field))
+        if parsed is not None:
+            return parsed
+    return None
+
+def task_date_in_window(task: dict, window: Tuple[datetime, datetime]) -> Optional[datetime]:
+    """
+    Get a task's date relative to a window.
+
+    For a repeating task this is its first occurrence from the window's start
+    (looking up to DEFAULT_WINDOW_DAYS past the window's end), falling back to
+    its own date; for other tasks it is task_date.
+    """
+    when = task_date(task)
+    rule = recurrence_rule(task)
+    if when is None or rule is None:
+        return when
+    upcoming = occurrences(rule, when, window[0], window[1] + timedelta(days=DEFAULT_WINDOW_DAYS))
+    return next(upcoming, when)
+
+def message_window(message: str, now: datetime) -> Tuple[datetime, datetime]:
+    """
+    Work out the date range a message is asking about.
+
+    Args:
+        message: User message
+        now: Current time
+
+    Returns:
+        Tuple[datetime, datetime]: (start, end) of the relevant window
+    """
+    text = message.lower()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if "today" in text or "tonight" in text:
+        return today, today + timedelta(days=1)
+    if "tomorrow" in text:
+        return today + timedelta(days=1), today + timedelta(days=2)
+    for index, name in enumerate(WEEKDAYS):
+        if name in text:
+            start = today + timedelta(days=(index - today.weekday()) % 7 or 7)
+            return start, start + timedelta(days=1)
+    if "next week" in text:
+        start = today + timedelta(days=7 - today.weekday())
+        return start, start + timedelta(days=7)
+    if "week" in text:
+        return today, today + timedelta(days=7)
+    if "month" in text:
+        return today, today + timedelta(days=31)
+    return today - timedelta(days=1), today + timedelta(days=DEFAULT_WINDOW_DAYS)
+
+def _score_task(task: dict, keywords: Set[str], window: Tuple[datetime, datetime],
+                wants_completed: bool) -> Optional[float]:
+    """Score a task's relevance to the message, or None if it should be dropped."""
+    overlap = len(keywords & keyword_set(f"{task.get('title', '')} {task.get('description', '')}"))
+    score = 3.0 * overlap
+
+    completed = bool(task.get("completed") or task.get("is_completed"))
+    if completed and not (wants_completed or overlap):
+        return None
+    if completed:
+        score -= 0.5
+
+    when = task_date_in_window(task, window)
+    if when is not None:
+        start, end = window
+        if start <= when < end:
+            score += 2.0
+        elif not overlap:
+            # Keep nearby tasks as lower-priority scheduling context
+            distance = min(abs((when - start).days), abs((when - end).days))
+            if distance > DEFAULT_WINDOW_DAYS:
+                return None
+            score += 1.0 / (1 + distance)
+    return score
+
+def compact_context(
+    message: str,
+    context: Optional[dict],
+    token_budget: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> Tuple[Optional[dict], dict]:
+    """
+    Reduce a chat context to the parts relevant to the message.
+
+    Args:
+        message: User message the context accompanies
+        context: Context dict sent by the client
+        token_budget: Maximum estimated tokens for the serialized context
+            (defaults to LLM_CONTEXT_TOKEN_BUDGET, or 1500)
+        now: Current time (defaults to datetime.now())
+
+    Returns:
+        Tuple[Optional[dict], dict]: (compacted context, stats) where stats has
+        the task counts and context token estimates before and after
+    """
+    if not context:
+        return context, {"tasks_before": 0, "tasks_after": 0, "context_tokens_before": 0,
+                         "context_tokens_after": 0}
+
+    if token_budget is None:
+        token_budget = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "1500"))
+    context_tokens_before = count_tokens(json.dumps(context))
+    compacted = _strip_empty({key: value for key, value in context.items() if key != "current_tasks"})
+    tasks = context.get("current_tasks") or []
+    if not isinstance(tasks, list):
+        tasks = []
+
+    now = now or datetime.now()
+    keywords = keyword_set(message)
+    wants_completed = bool(COMPLETED_HINTS & set(WORD_PATTERN.findall(message.lower())))
+    window = message_window(message, now)
+
+    ranked: List[Tuple[float, int, dict]] = []
+    for index, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            continue
+        cleaned = _strip_empty(task)
+        score = _score_task(cleaned, keywords, window, wants_completed)
+        if score is not None:
+            ranked.append((score, index, cleaned))
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+
+    budget = token_budget - count_tokens(json.dumps(compacted))
+    selected = []
+    for _, index, task in ranked:
+        cost = count_tokens(json.dumps(task)) + 1
+        if cost > budget:
+            continue
+        budget -= cost
+        selected.append((index, task))
+
+    # Present the kept tasks in the client's original order
+    selected.sort(key=lambda item: item[0])
+    if "current_tasks" in context:
+        compacted["current_tasks"] = [task for _, task in selected]
+    omitted = len(tasks) - len(selected)
+    if omitted:
+        compacted["omitted_tasks"] = omitted
+
+    return compacted, {
+        "tasks_before": len(tasks),
+        "tasks_after": len(selected),
+        "context_tokens_before": context_tokens_before,
+        "context_tokens_after": count_tokens(json.dumps(compacted))
+    }
@@ -0,0 +1,250 @@
+"""
+Fast-Path Command Parser
+
+Most chat traffic is short, unambiguous commands such as
+"add dentist tomorrow at 3pm for an hour". This module parses those locally
+into a single create_task suggestion, so they are answered without an OpenAI
+round trip.
+
+The parser is deliberately conservative. A message is only accepted when it:
+- Starts with a scheduling verb (add, schedule, create, book, put, plan, set up)
+- Names exactly one day (today, tonight, tomorrow, a weekday, a month and day
+  or an ISO date) and exactly one unambiguous start time (with am/pm, a
+  24-hour hh:mm, noon or midnight)
+- Leaves a short title once the verb, date, time and optional duration or end
+  time are removed, with no leftover numbers, questions or words that hint at
+  recurrence, multiple tasks, relative placement or rescheduling
+
+Anything else returns None and falls through to the LLM. Tasks without a
+duration or end time default to DEFAULT_DURATION_MINUTES.
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from .context_compaction import WEEKDAYS
+
+DEFAULT_DURATION_MINUTES = 60
+MAX_TITLE_WORDS = 8
+
+MONTHS = [
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december"
+]
+# Words that make a command ambiguous enough to leave to the LLM
+AMBIGUOUS_WORDS = {
+    "and", "or", "then", "also", "every", "each", "daily", "weekly", "monthly",
+    "weekdays", "weekends", "split", "over", "between", "before", "after", "around",
+    "about", "by", "until", "till", "from", "to", "at", "on", "in", "next", "this",
+    "sometime", "maybe", "later", "soon", "week", "month", "morning", "afternoon",
+    "evening", "night", "reschedule", "move", "cancel", "delete", "remove", "update",
+    "change", "free", "slot", "not", "don't", "if", "when", "what", "which"
+}
+
+_VERB = re.compile(r"^\s*(?:please\s+)?(?:add|schedule|create|book|put|plan|set\s+up)\b", re.IGNORECASE)
+_LEADING_ARTICLE = re.compile(r"^(?:(?:a|an|the|my)\s+)+", re.IGNORECASE)
+_TIME = r"(?:(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?|(noon|midnight))"
+_TIME_RANGE = re.compile(
+    rf"\b(?:from\s+|at\s+)?{_TIME}\s*(?:-|to|until|till)\s*{_TIME}(?!\w)", re.IGNORECASE
+)
+_TIME_AT = re.compile(rf"(?:\bat\s+)?(?<![\w:]){_TIME}(?!\w)", re.IGNORECASE)
+_DURATION = re.compile(
+    r"\bfor\s+(half\s+an|an|a|one|two|three|\d+(?:\.\d+)?)\s*(hours?|hrs?|h|minutes?|mins?)\b",
+    re.IGNORECASE
+)
+_RELATIVE_DAY = re.compile(r"\b(today|tonight|tomorrow)\b", re.IGNORECASE)
+_WEEKDAY = re.compile(rf"\b(?:on\s+)?({'|'.join(WEEKDAYS)})\b", re.IGNORECASE)
+_MONTH_DAY = re.compile(
+    rf"\b(?:on\s+)?(?:({'|'.join(MONTHS)})\s+(\d{{1,2}})(?:st|nd|rd|th)?"
+    rf"|(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({'|'.join(MONTHS)}))\b",
+    re.IGNORECASE
+)
+_ISO_DATE = re.compile(r"\b(?:on\s+)?(\d{4})-(\d{2})-(\d{2})\b")
+_AMOUNTS = {"half an": 0.5, "an": 1, "a": 1, "one": 1, "two": 2, "three": 3}
+
+def _single(pattern: re.Pattern, text: str) -> Tuple[Optional[re.Match], bool]:
+    """Find a pattern's only match; the flag is False if it matches more than once."""
+    matches = list(pattern.finditer(text))
+    if len(matches) > 1:
+        return None, False
+    return (matches[0] if matches else None), True
+
+def _blank(text: str, match: re.Match) -> str:
+    """Replace a match with spaces so other spans keep their offsets."""
+    return text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+
+def _clock(hour: Optional[str], minute: Optional[str], meridiem: Optional[str], word: Optional[str],
+           default_meridiem: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """Convert parsed time groups to (hour, minute), or None if ambiguous or invalid."""
+    if word:
+        return (12, 0) if word.lower() == "noon" else (0, 0)
+    meridiem = (meridiem or default_meridiem or "").replace(".", "").lower()
+    hours, minutes = int(hour), int(minute or 0)
+    if minutes > 59:
+        return None
+    if meridiem:
+        if not 1 <= hours <= 12:
+            return None
+        return (hours % 12 + (12 if meridiem == "pm" else 0), minutes)
+    # Without am/pm only a 24-hour hh:mm time is unambiguous
+    if minute is None or hours > 23:
+        return None
+    return hours, minutes
+
+def _parse_day(text: str, now: datetime) -> Tuple[Optional[datetime], Optional[str]]:
+    """
+    Find the single day a command refers to.
+
+    Returns:
+        Tuple[Optional[datetime], Optional[str]]: (midnight of the day, text with
+        the date phrase blanked out), or (None, None) if there is not exactly
+        one date
+    """
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    found = []
+    for pattern in (_RELATIVE_DAY, _WEEKDAY, _MONTH_DAY, _ISO_DATE):
+        match, unique = _single(pattern, text)
+        if not unique:
+            return None, None
+        if match:
+            found.append((pattern, match))
+    if len(found) != 1:
+        return None, None
+
+    pattern, match = found[0]
+    try:
+        if pattern is _RELATIVE_DAY:
+            day = today + timedelta(days=1 if match.group(1).lower() == "tomorrow" else 0)
+        elif pattern is _WEEKDAY:
+            # Same convention as context compaction: the next such day, never today
+            index = WEEKDAYS.index(match.group(1).lower())
+            day = today + timedelta(days=(index - today.weekday()) % 7 or 7)
+        elif pattern is _MONTH_DAY:
+            month = MONTHS.index((match.group(1) or match.group(4)).lower()) + 1
+            day = today.replace(month=month, day=int(match.group(2) or match.group(3)))
+            if day < today:
+                day = day.replace(year=today.year + 1)
+        else:
+            day = datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        # February 30th and friends
+        return None, None
+    return day, _blank(text, match)
+
+def _parse_times(text: str, day: datetime) -> Tuple[Optional[datetime], Optional[datetime], Optional[str]]:
+    """
+    Find the start and end time of a command on the given day.
+
+    Returns:
+        Tuple: (start, end or None, text with the time phrases blanked out), or
+        (None, None, None) if the times are missing or ambiguous
+    """
+    # Blank the duration first so its number is not mistaken for a time
+    minutes = None
+    match, unique = _single(_DURATION, text)
+    if not unique:
+        return None, None, None
+    if match:
+        amount = re.sub(r"\s+", " ", match.group(1).lower())
+        amount = _AMOUNTS[amount] if amount in _AMOUNTS else float(amount)
+        minutes = amount if match.group(2).lower().startswith("m") else amount * 60
+        if not 0 < minutes <= 24 * 60:
+            return None, None, None
+        text = _blank(text, match)
+
+    match, unique = _single(_TIME_RANGE, text)
+    if not unique:
+        return None, None, None
+    if match:
+        groups = match.groups()
+        # "3-4pm": the start inherits the end's am/pm
+        end_clock = _clock(*groups[4:])
+        start_clock = _clock(*groups[:4], default_meridiem=groups[6])
+        if start_clock is None or end_clock is None or minutes is not None:
+            return None, None, None
+        start = day.replace(hour=start_clock[0], minute=start_clock[1])
+        end = day.replace(hour=end_clock[0], minute=end_clock[1])
+        if end <= start:
+            return None, None, None
+        return start, end, _blank(text, match)
+
+    match, unique = _single(_TIME_AT, text)
+    if not unique or not match:
+        return None, None, None
+    start_clock = _clock(*match.groups())
+    if start_clock is None:
+        return None, None, None
+    start = day.replace(hour=start_clock[0], minute=start_clock[1])
+    end = start + timedelta(minutes=minutes) if minutes is not None else None
+    return start, end, _blank(text, match)
+
+def _title(text: str) -> Optional[str]:
+    """Turn the leftover command text into a task title, or None if it is not one."""
+    text = _LEADING_ARTICLE.sub("", " ".join(text.split()))
+    words = text.lower().split()
+    if not words or len(words) > MAX_TITLE_WORDS:
+        return None
+    if any(char.isdigit() for char in text) or AMBIGUOUS_WORDS & set(words):
+        return None
+    if not re.fullmatch(r"[\w' &/-]+", text):
+        return None
+    return text[0].upper() + text[1:]
+
+def parse_command(message: str, now: Optional[datetime] = None) -> Optional[dict]:
+    """
+    Parse a simple scheduling command into a create_task suggestion.
+
+    Args:
+        message: User message
+        now: Current time (defaults to datetime.now())
+
+    Returns:
+        Optional[dict]: {"action": "create_task", "parameters": {...}} with
+        title, start_date and end_date, or None if the message should go to
+        the LLM
+    """
+    text = message.strip().rstrip(".!")
+    verb = _VERB.match(text)
+    if not verb or "?" in text or len(text) > 200:
+        return None
+    text = text[verb.end():]
+
+    day, text = _parse_day(text, now or datetime.now())
+    if day is None:
+        return None
+    start, end, text = _parse_times(text, day)
+    if start is None:
+        return None
+    title = _title(text)
+    if title is None:
+        return None
+
+    end = end or start + timedelta(minutes=DEFAULT_DURATION_MINUTES)
+    return {
+        "action": "create_task",
+        "parameters": {
+            "title": title,
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat()
+        }
+    }
+
+def _format_time(value: datetime) -> str:
+    return value.strftime("%I:%M %p").lstrip("0")
+
+def confirmation_text(parameters: dict) -> str:
+    """
+    Build the assistant reply for a fast-path suggestion.
+
+    Args:
+        parameters: Parameters of the create_task suggestion
+
+    Returns:
+        str: Reply text such as 'I'll add "Dentist" on Thursday, March 21 from 3:00 PM to 4:00 PM.'
+    """
+    start = datetime.fromisoformat(parameters["start_date"])
+    end = datetime.fromisoformat(parameters["end_date"])
+    return (
+        f'I\'ll add "{parameters["title"]}" on {start.strftime("%A, %B")} {start.day} '
+        f"from {_format_time(start)} to {_format_time(end)}."
+    )
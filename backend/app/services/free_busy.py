@@ -0,0 +1,218 @@
+"""
+Free/Busy Index
+
+Scheduling without conflicts used to mean the model reading every task's
+dates out of the raw `current_tasks` JSON, which costs tokens and still led
+to double-booking. This module works out the user's busy time on the server
+instead.
+
+BusyIndex merges the context tasks' [start, end) intervals into sorted,
+disjoint busy blocks held in two parallel arrays, so:
+- Busy blocks and free slots over a horizon come from a bisect plus a scan
+  of the blocks inside it
+- Checking whether a suggested time overlaps existing tasks is O(log n)
+
+For the prompt, apply_schedule_summary replaces the dated tasks that are only
+in the context because they fall inside the horizon with a compact schedule:
+the busy blocks, and the free slots within working hours. Tasks the message
+mentions by name stay, so the model can still update or reschedule them.
+
+Task intervals run from start_date (or scheduled_time) to end_date, or
+DEFAULT_TASK_MINUTES after the start. Tasks with only a due_date are
+deadlines, not busy time, and completed tasks are ignored. A repeating task
+contributes one interval per occurrence inside the index's horizon
+(schedule_horizon), generated lazily from its recurrence rule and capped at
+MAX_OCCURRENCES per task.
+"""
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .context_compaction import keyword_set, parse_date, task_date_in_window
+from .recurrence import occurrences, recurrence_rule
+
+DEFAULT_TASK_MINUTES = 60
+WORKDAY_START_HOUR = 8
+WORKDAY_END_HOUR = 20
+MIN_FREE_MINUTES = 15
+MAX_SUMMARY_ENTRIES = 40
+HORIZON_DAYS = 92
+MAX_OCCURRENCES = 500
+
+Interval = Tuple[datetime, datetime]
+
+def task_interval(task: dict) -> Optional[Interval]:
+    """Get the [start, end) interval a task occupies, or None if it has none."""
+    if not isinstance(task, dict) or task.get("completed") or task.get("is_completed"):
+        return None
+    start = parse_date(task.get("start_date")) or parse_date(task.get("scheduled_time"))
+    if start is None:
+        return None
+    end = parse_date(task.get("end_date"))
+    if end is None or end <= start:
+        end = start + timedelta(minutes=DEFAULT_TASK_MINUTES)
+    return start, end
+
+def task_intervals(task: dict, horizon: Optional[Interval] = None) -> Iterator[Interval]:
+    """
+    Get the intervals a task occupies.
+
+    Args:
+        task: Task dict
+        horizon: Window to expand a repeating task's occurrences over; without
+            one only its first occurrence is returned
+
+    Yields:
+        Interval: [start, end) intervals in time order
+    """
+    interval = task_interval(task)
+    if interval is None:
+        return
+    rule = recurrence_rule(task)
+    if rule is None or horizon is None:
+        yield interval
+        return
+    start, end = interval
+    duration = end - start
+    # Occurrences starting before the horizon can still run into it
+    for when in islice(occurrences(rule, start, horizon[0] - duration, horizon[1]), MAX_OCCURRENCES):
+        yield when, when + duration
+
+def schedule_horizon(now: datetime) -> Interval:
+    """Window over which repeating tasks are expanded for a request made at `now`."""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=1), today + timedelta(days=HORIZON_DAYS)
+
+class BusyIndex:
+    """Sorted, merged busy blocks supporting O(log n) overlap checks."""
+    def __init__(self, intervals: Iterable[Interval]):
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    @classmethod
+    def from_tasks(cls, tasks: Optional[list], horizon: Optional[Interval] = None) -> "BusyIndex":
+        """Build the index from a context's task list, expanding repeating tasks over `horizon`."""
+        return cls(interval for task in tasks or [] for interval in task_intervals(task, horizon))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        """Check whether [start, end) overlaps any busy block."""
+        # First block ending after `start`; it overlaps if it also begins before `end`
+        index = bisect_right(self.ends, start)
+        return index < len(self.starts) and self.starts[index] < end
+
+    def busy_blocks(self, window_start: datetime, window_end: datetime) -> List[Interval]:
+        """Get the busy blocks inside a window, clipped to it."""
+        blocks = []
+        index = bisect_right(self.ends, window_start)
+        while index < len(self.starts) and self.starts[index] < window_end:
+            blocks.append((max(self.starts[index], window_start), min(self.ends[index], window_end)))
+            index += 1
+        return blocks
+
+    def free_slots(self, window_start: datetime, window_end: datetime,
+                   min_minutes: int = MIN_FREE_MINUTES) -> List[Interval]:
+        """
+        Get free time within working hours inside a window.
+
+        Args:
+            window_start: Start of the horizon
+            window_end: End of the horizon
+            min_minutes: Shortest gap worth reporting
+
+        Returns:
+            List[Interval]: Free [start, end) slots in time order
+        """
+        slots = []
+        day = window_start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < window_end:
+            cursor = max(day.replace(hour=WORKDAY_START_HOUR), window_start)
+            day_end = min(day.replace(hour=WORKDAY_END_HOUR), window_end)
+            for busy_start, busy_end in self.busy_blocks(cursor, day_end) + [(day_end, day_end)]:
+                if busy_start - cursor >= timedelta(minutes=min_minutes):
+                    slots.append((cursor, busy_start))
+                cursor = max(cursor, busy_end)
+            day += timedelta(days=1)
+        return slots
+
+def format_interval(interval: Interval) -> str:
+    """Format an interval compactly, e.g. "2024-03-21 09:00-10:30"."""
+    start, end = interval
+    if end.date() == start.date():
+        return f"{start:%Y-%m-%d %H:%M}-{end:%H:%M}"
+    if end == start.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1):
+        return f"{start:%Y-%m-%d %H:%M}-24:00"
+    return f"{start:%Y-%m-%d %H:%M}-{end:%Y-%m-%d %H:%M}"
+
+def apply_schedule_summary(message: str, context: Optional[dict], index: BusyIndex,
+                           window: Interval, now: datetime) -> Tuple[Optional[dict], int]:
+    """
+    Replace in-window dated tasks in a (compacted) context with a free/busy summary.
+
+    Args:
+        message: User message
+        context: Compacted context
+        index: Busy index built from the full task list
+        window: Horizon the message refers to
+        now: Current time; free slots start no earlier
+
+    Returns:
+        Tuple[Optional[dict], int]: (context with a "schedule" entry, number
+        of tasks the summary replaced)
+    """
+    if not context or not len(index):
+        return context, 0
+    window_start, window_end = window
+    keywords = keyword_set(message)
+    kept, replaced = [], 0
+    for task in context.get("current_tasks") or []:
+        when = task_date_in_window(task, window) if isinstance(task, dict) else None
+        in_window = when is not None and window_start <= when < window_end and task_interval(task)
+        mentioned = keywords & keyword_set(f"{task.get('title', '')} {task.get('description', '')}")
+        if in_window and not mentioned:
+            replaced += 1
+        else:
+            kept.append(task)
+
+    summarized = {key: value for key, value in context.items() if key != "current_tasks"}
+    if "current_tasks" in context:
+        summarized["current_tasks"] = kept
+    summarized["schedule"] = {
+        "window": format_interval(window),
+        "busy": [format_interval(block) for block in index.busy_blocks(*window)][:MAX_SUMMARY_ENTRIES],
+        "free": [
+            format_interval(slot) for slot in index.free_slots(max(window_start, now), window_end)
+        ][:MAX_SUMMARY_ENTRIES]
+    }
+    return summarized, replaced
+
+def find_conflicts(suggestions: List[dict], index: BusyIndex,
+                   horizon: Optional[Interval] = None) -> List[int]:
+    """
+    Find create_task suggestions whose times overlap existing busy blocks.
+
+    Args:
+        suggestions: Suggestions as {"action", "parameters"} dicts
+        index: Busy index of the user's tasks
+        horizon: Window over which repeating suggestions are checked
+
+    Returns:
+        List[int]: Positions of the conflicting suggestions
+    """
+    conflicts = []
+    for position, suggestion in enumerate(suggestions):
+        if suggestion.get("action") != "create_task":
+            continue
+        intervals = task_intervals(suggestion.get("parameters") or {}, horizon)
+        if any(index.overlaps(*interval) for interval in intervals):
+            conflicts.append(position)
+    return conflicts
@@ -0,0 +1,101 @@
+"""
+Model Routing
+
+Chat requests range from "delete my gym task" to "plan a 3-week study
+schedule". This module classifies each request locally and cheaply, then picks
+the model, max_tokens and temperature for it from a routing table, so simple
+requests stop paying for a large completion allowance and complex ones get a
+stronger model.
+
+Classification looks at:
+- Intent keywords: edits to a single task (delete, rename, mark done, ...) are
+  "simple"; multi-day planning and reorganizing are "complex"
+- Message length: long messages are "complex"
+- Context size: many tasks in the context are "complex"
+Everything else is "standard".
+
+The table can be overridden with LLM_ROUTES, a JSON object mapping route name
+to any of {"model", "max_tokens", "temperature"}; missing fields keep their
+defaults. Each decision is returned with the reason it was made so routing
+metrics can be broken down by cause.
+"""
+import json
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+SIMPLE_MAX_WORDS = 15
+COMPLEX_MIN_WORDS = 60
+COMPLEX_MIN_TASKS = 30
+
+SIMPLE_INTENTS = {
+    "delete", "remove", "cancel", "rename", "complete", "done", "finished",
+    "mark", "check", "uncheck", "undo", "show", "list"
+}
+COMPLEX_INTENTS = {
+    "plan", "planning", "organize", "reorganize", "optimize", "prioritize",
+    "balance", "routine", "study", "split", "spread", "break", "weeks", "months",
+    "semester", "project", "roadmap", "every", "recurring"
+}
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+class ModelRoute(BaseModel):
+    """Completion settings for one class of request."""
+    name: str
+    model: str
+    max_tokens: int
+    temperature: float
+
+DEFAULT_ROUTES = {
+    "simple": {"model": "gpt-3.5-turbo", "max_tokens": 250, "temperature": 0.3},
+    "standard": {"model": "gpt-3.5-turbo", "max_tokens": 500, "temperature": 0.7},
+    "complex": {"model": "gpt-4o-mini", "max_tokens": 1200, "temperature": 0.7}
+}
+
+def classify_request(message: str, context: Optional[dict]) -> Tuple[str, str]:
+    """
+    Classify a chat request.
+
+    Args:
+        message: User message
+        context: Request context (after any task snapshot merge)
+
+    Returns:
+        Tuple[str, str]: (route name, reason) where reason is one of
+        "intent", "length", "context" or "default"
+    """
+    words = WORD_PATTERN.findall(message.lower())
+    tasks = (context or {}).get("current_tasks")
+    task_count = len(tasks) if isinstance(tasks, list) else 0
+
+    if len(words) >= COMPLEX_MIN_WORDS:
+        return "complex", "length"
+    if COMPLEX_INTENTS & set(words):
+        return "complex", "intent"
+    if task_count >= COMPLEX_MIN_TASKS:
+        return "complex", "context"
+    if SIMPLE_INTENTS & set(words) and len(words) <= SIMPLE_MAX_WORDS:
+        return "simple", "intent"
+    return "standard", "default"
+
+class ModelRouter:
+    """Picks completion settings for a request from the routing table."""
+    def __init__(self, routes: Optional[Dict[str, dict]] = None):
+        if routes is None:
+            routes = json.loads(os.getenv("LLM_ROUTES", "{}"))
+        table = {name: dict(settings) for name, settings in DEFAULT_ROUTES.items()}
+        for name, settings in routes.items():
+            table.setdefault(name, dict(DEFAULT_ROUTES["standard"])).update(settings)
+        self.routes = {name: ModelRoute(name=name, **settings) for name, settings in table.items()}
+
+    def route(self, message: str, context: Optional[dict]) -> Tuple[ModelRoute, str]:
+        """
+        Choose the route for a request.
+
+        Returns:
+            Tuple[ModelRoute, str]: (route, classification reason)
+        """
+        name, reason = classify_request(message, context)
+        return self.routes[name], reason
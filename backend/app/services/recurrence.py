@@ -0,0 +1,199 @@
+"""
+Task Recurrence
+
+Repeating tasks ("standup every weekday at 9") are stored and suggested as a
+single task with a `recurrence` rule instead of one task per occurrence. Rules
+use the iCalendar RRULE syntax (RFC 5545), for example:
+
+    FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR
+    FREQ=DAILY;INTERVAL=2;COUNT=10
+    FREQ=MONTHLY;BYMONTHDAY=1,-1;UNTIL=20241231
+
+Supported parts are FREQ (DAILY, WEEKLY, MONTHLY, YEARLY), INTERVAL, BYDAY
+(plain weekdays, for DAILY and WEEKLY rules), BYMONTHDAY (for MONTHLY rules,
+negative days count from the month's end), COUNT and UNTIL. Anything else is
+rejected with a ValueError rather than silently expanded wrong.
+
+Occurrences are never materialised up front. occurrences() is a generator that
+jumps straight to the first period that can reach the requested window (for
+rules without COUNT) and stops at the window's end, so a daily rule started
+years ago costs only the occurrences inside the window. The task's own date is
+the rule's DTSTART and its first occurrence.
+"""
+import calendar
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+UNTIL_FORMATS = ("%Y%m%dT%H%M%SZ", "%Y%m%dT%H%M%S", "%Y%m%d")
+
+class RecurrenceRule(BaseModel):
+    """A parsed recurrence rule."""
+    freq: str
+    interval: int = 1
+    by_day: Tuple[int, ...] = ()  # Weekday numbers, Monday = 0
+    by_month_day: Tuple[int, ...] = ()
+    count: Optional[int] = None
+    until: Optional[datetime] = None  # Inclusive
+
+def _parse_until(value: str) -> datetime:
+    for fmt in UNTIL_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt.endswith("Z"):
+            # UTC, converted to naive local time like the rest of the task dates
+            parsed = parsed.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        elif fmt == "%Y%m%d":
+            # A date-only UNTIL includes the whole day
+            parsed += timedelta(days=1, microseconds=-1)
+        return parsed
+    raise ValueError(f"Invalid UNTIL: {value!r}")
+
+@lru_cache(maxsize=1024)
+def parse_rrule(text: str) -> RecurrenceRule:
+    """
+    Parse an RRULE string.
+
+    Args:
+        text: Rule such as "FREQ=WEEKLY;BYDAY=MO,WE", with or without an
+            "RRULE:" prefix
+
+    Returns:
+        RecurrenceRule: The parsed rule
+
+    Raises:
+        ValueError: If the rule is malformed or uses unsupported parts
+    """
+    text = text.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    parts = {}
+    for part in filter(None, text.split(";")):
+        key, separator, value = part.partition("=")
+        if not separator or not value:
+            raise ValueError(f"Malformed RRULE part: {part!r}")
+        parts[key.strip().upper()] = value.strip().upper()
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unsupported FREQ: {freq!r}")
+    parts.pop("WKST", None)  # Weeks always start on Monday here
+    try:
+        interval = int(parts.pop("INTERVAL", "1"))
+        count = int(parts["COUNT"]) if "COUNT" in parts else None
+        by_month_day = tuple(int(day) for day in parts.pop("BYMONTHDAY").split(",")) if "BYMONTHDAY" in parts else ()
+    except ValueError:
+        raise ValueError(f"Invalid number in RRULE: {text!r}")
+    parts.pop("COUNT", None)
+    by_day = ()
+    if "BYDAY" in parts:
+        codes = parts.pop("BYDAY").split(",")
+        if any(code not in WEEKDAY_CODES for code in codes):
+            raise ValueError(f"Unsupported BYDAY: {','.join(codes)!r}")
+        by_day = tuple(sorted({WEEKDAY_CODES.index(code) for code in codes}))
+    until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+
+    if parts:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(parts))}")
+    if interval < 1 or (count is not None and count < 1):
+        raise ValueError("INTERVAL and COUNT must be positive")
+    if count is not None and until is not None:
+        raise ValueError("COUNT and UNTIL cannot both be set")
+    if by_day and freq not in ("DAILY", "WEEKLY"):
+        raise ValueError("BYDAY is only supported for DAILY and WEEKLY rules")
+    if by_month_day and (freq != "MONTHLY" or any(day == 0 or abs(day) > 31 for day in by_month_day)):
+        raise ValueError("BYMONTHDAY must be 1..31 or -31..-1 on a MONTHLY rule")
+    return RecurrenceRule(
+        freq=freq, interval=interval, by_day=by_day, by_month_day=by_month_day, count=count, until=until
+    )
+
+def _period_start(rule: RecurrenceRule, first: date, period: int) -> date:
+    """First day of the rule's period number `period` (0 is DTSTART's)."""
+    if rule.freq == "DAILY":
+        return first + timedelta(days=period * rule.interval)
+    if rule.freq == "WEEKLY":
+        return first - timedelta(days=first.weekday()) + timedelta(weeks=period * rule.interval)
+    if rule.freq == "MONTHLY":
+        year, month = divmod(first.year * 12 + first.month - 1 + period * rule.interval, 12)
+        return date(year, month + 1, 1)
+    return date(first.year + period * rule.interval, 1, 1)
+
+def _period_days(rule: RecurrenceRule, first: date, start: date) -> List[date]:
+    """Candidate days of the period beginning on `start`, in order."""
+    if rule.freq == "DAILY":
+        return [start] if not rule.by_day or start.weekday() in rule.by_day else []
+    if rule.freq == "WEEKLY":
+        return [start + timedelta(days=day) for day in rule.by_day or (first.weekday(),)]
+    if rule.freq == "MONTHLY":
+        last = calendar.monthrange(start.year, start.month)[1]
+        days = sorted({day if day > 0 else last + 1 + day for day in rule.by_month_day or (first.day,)})
+        # Months too short for a day (the 31st in April) have no occurrence
+        return [start.replace(day=day) for day in days if 1 <= day <= last]
+    try:
+        return [first.replace(year=start.year)]
+    except ValueError:
+        return []  # February 29th outside a leap year
+
+def _first_period(rule: RecurrenceRule, first: date, target: date) -> int:
+    """Index of the earliest period that can contain `target`."""
+    if rule.freq == "DAILY":
+        elapsed = (target - first).days
+    elif rule.freq == "WEEKLY":
+        elapsed = ((target - timedelta(days=target.weekday())) - (first - timedelta(days=first.weekday()))).days // 7
+    elif rule.freq == "MONTHLY":
+        elapsed = (target.year - first.year) * 12 + target.month - first.month
+    else:
+        elapsed = target.year - first.year
+    return max(0, elapsed // rule.interval)
+
+def occurrences(rule: RecurrenceRule, dtstart: datetime, window_start: datetime,
+                window_end: datetime) -> Iterator[datetime]:
+    """
+    Lazily generate a rule's occurrences within [window_start, window_end).
+
+    Args:
+        rule: Parsed recurrence rule
+        dtstart: Time of the first occurrence
+        window_start: Start of the window
+        window_end: End of the window (exclusive)
+
+    Yields:
+        datetime: Occurrence start times in order
+    """
+    first = dtstart.date()
+    # COUNT rules must count every earlier occurrence, so only open-ended
+    # rules can skip straight to the window
+    period = 0 if rule.count is not None else _first_period(rule, first, window_start.date())
+    emitted = 0
+    while True:
+        start = _period_start(rule, first, period)
+        if start > window_end.date():
+            return
+        for day in _period_days(rule, first, start):
+            when = datetime.combine(day, dtstart.time())
+            if when < dtstart:
+                continue
+            if when >= window_end or (rule.until is not None and when > rule.until):
+                return
+            emitted += 1
+            if rule.count is not None and emitted > rule.count:
+                return
+            if when >= window_start:
+                yield when
+        period += 1
+
+def recurrence_rule(task: dict) -> Optional[RecurrenceRule]:
+    """Get a task's parsed recurrence rule, or None if it has no valid one."""
+    text = task.get("recurrence") if isinstance(task, dict) else None
+    if not isinstance(text, str) or not text.strip():
+        return None
+    try:
+        return parse_rrule(text)
+    except ValueError:
+        return None
@@ -0,0 +1,91 @@
+"""
+Chat Concurrency Benchmark
+
+Measures how many /api/llm/chat requests a single worker completes per second
+when every completion takes a fixed amount of time upstream.
+
+Two handlers are compared against the same local mock OpenAI server:
+- before: the original handler, which calls the synchronous OpenAI client
+  from inside an async endpoint and so blocks the event loop per completion
+- after: the current /api/llm/chat endpoint using the pooled async client
+
+Both run in-process behind an ASGI transport, which is equivalent to one
+uvicorn worker. Redis rate limiting is patched out so only the OpenAI path
+is measured.
+
+Usage:
+    cd backend
+    python -m benchmarks.bench_chat_concurrency --requests 200 --concurrency 100
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import mock_openai_server, without_usage_tracking
+
+def _legacy_app():
+    """Rebuild the pre-async handler: a blocking client inside an async def."""
+    from fastapi import FastAPI
+    from openai import OpenAI
+    from app.api.llm import LLMRequest, create_chat_prompt
+
+    app = FastAPI()
+    client = OpenAI()
+
+    @app.post("/api/llm/chat")
+    async def legacy_chat(request: LLMRequest) -> dict:
+        response = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=create_chat_prompt(request.message, request.context),
+            max_tokens=500,
+            temperature=0.7
+        )
+        return {"response": response.choices[0].message.content}
+
+    return app
+
+async def _drive(app, total: int, concurrency: int) -> float:
+    """Send `total` chat requests with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    payload = {"message": "add dentist tomorrow at 3pm", "context": {"current_tasks": []}}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one() -> None:
+            async with semaphore:
+                response = await client.post("/api/llm/chat", json=payload)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - started
+
+async def run(total: int, concurrency: int) -> None:
+    from app.main import app
+    from app.api import llm
+
+    with without_usage_tracking():
+        before = await _drive(_legacy_app(), total, concurrency)
+        after = await _drive(app, total, concurrency)
+        await llm.close_openai_client()
+
+    print(f"requests={total} concurrency={concurrency}")
+    print(f"before (sync client): {before:.2f}s  {total / before:.1f} req/s")
+    print(f"after  (async client): {after:.2f}s  {total / after:.1f} req/s")
+    print(f"speedup: {before / after:.1f}x")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    with mock_openai_server(args.port, "--latency", str(args.latency)):
+        asyncio.run(run(args.requests, args.concurrency))
+
+if __name__ == "__main__":
+    main()
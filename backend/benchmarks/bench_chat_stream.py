@@ -0,0 +1,78 @@
+"""
+Chat Streaming Benchmark
+
+Compares time-to-first-byte of /api/llm/chat with /api/llm/chat/stream against
+the local mock OpenAI server. The backend runs under a real uvicorn server in
+this process so the streamed response is observed as the client sees it.
+
+Usage:
+    cd backend
+    python -m benchmarks.bench_chat_stream --latency 3 --first-token-latency 0.15
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.common import mock_openai_server, wait_for_port, without_usage_tracking
+
+PAYLOAD = {"message": "add dentist tomorrow at 3pm", "context": {"current_tasks": []}}
+
+async def _time_chat(client: httpx.AsyncClient) -> float:
+    started = time.perf_counter()
+    async with client.stream("POST", "/api/llm/chat", json=PAYLOAD) as response:
+        async for _ in response.aiter_bytes():
+            return time.perf_counter() - started
+
+async def _time_stream(client: httpx.AsyncClient) -> tuple:
+    started = time.perf_counter()
+    first_byte = first_suggestion = None
+    async with client.stream("POST", "/api/llm/chat/stream", json=PAYLOAD) as response:
+        async for line in response.aiter_lines():
+            now = time.perf_counter() - started
+            if first_byte is None:
+                first_byte = now
+            if line == "event: suggestion" and first_suggestion is None:
+                first_suggestion = now
+    return first_byte, first_suggestion, time.perf_counter() - started
+
+async def run(port: int, rounds: int) -> None:
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    await asyncio.to_thread(wait_for_port, port)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        chat = [await _time_chat(client) for _ in range(rounds)]
+        stream = [await _time_stream(client) for _ in range(rounds)]
+
+    server.should_exit = True
+    await serving
+
+    print(f"/chat         ttfb p50: {statistics.median(chat) * 1000:.0f} ms")
+    print(f"/chat/stream  ttfb p50: {statistics.median(s[0] for s in stream) * 1000:.0f} ms")
+    print(f"/chat/stream  first suggestion p50: {statistics.median(s[1] for s in stream) * 1000:.0f} ms")
+    print(f"/chat/stream  complete p50: {statistics.median(s[2] for s in stream) * 1000:.0f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=3.0)
+    parser.add_argument("--first-token-latency", type=float, default=0.15)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--mock-port", type=int, default=8900)
+    args = parser.parse_args()
+
+    with mock_openai_server(
+        args.mock_port,
+        "--latency", str(args.latency),
+        "--first-token-latency", str(args.first_token_latency)
+    ), without_usage_tracking():
+        asyncio.run(run(args.port, args.rounds))
+
+if __name__ == "__main__":
+    main()
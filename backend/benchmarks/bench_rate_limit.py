@@ -0,0 +1,180 @@
+"""
+Rate Limiter Benchmark
+
+Compares the rate limiter in app.api.usage_tracking with the previous
+read-then-write implementation (reproduced below as legacy_check and
+legacy_update), against a throwaway local redis-server. The current limiter
+runs twice: "exact" with leasing disabled, so every check runs the Lua
+script, and "leased" with --workers simulated workers spending quota leased
+in chunks sized by --lease-error:
+- Round trips per request, counted by redis_round_trips_total: the
+  admission check plus settling the request's usage afterwards
+  (reconcile_usage, or the old update)
+- Latency per request, one request at a time
+- Accuracy under concurrency: --concurrency tasks fire checks for one client
+  whose limit is --limit requests, and the number admitted is compared with
+  what the limits allow. The read-then-write version over-admits because
+  concurrent checks read the same count; the script never does. Leasing may
+  under-admit by up to --lease-error of the limits while leases are unspent.
+
+Requests reserve what /chat reserves for --message (the prompt plus the
+--max-tokens completion allowance) and use the prompt plus 20-100% of the
+allowance, under the real per-window limits, so the token limit and the
+token chunk size matter as they do in production.
+
+Usage:
+    cd backend
+    python -m benchmarks.bench_rate_limit --concurrency 32 --attempts 2000 --limit 100 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from unittest.mock import patch
+
+from benchmarks.common import local_redis
+
+async def legacy_check(client_id: str, estimated_tokens: int, limit: int, token_limit: int) -> bool:
+    """The previous check: one pipeline to read the counters, one to write them."""
+    from app.core.redis_client import get_async_redis_client
+
+    redis_client = get_async_redis_client()
+    pipe = redis_client.pipeline()
+    pipe.get(f"{client_id}:requests")
+    pipe.get(f"{client_id}:tokens")
+    requests, tokens = await pipe.execute()
+    if int(requests or 0) + 1 > limit or int(tokens or 0) + estimated_tokens > token_limit:
+        return False
+    pipe = redis_client.pipeline()
+    pipe.incr(f"{client_id}:requests")
+    pipe.incrby(f"{client_id}:tokens", estimated_tokens)
+    await pipe.execute()
+    return True
+
+async def legacy_update(client_id: str, tokens_used: int) -> None:
+    """The previous usage update: one pipeline writing the counters."""
+    from app.core.redis_client import get_async_redis_client
+
+    pipe = get_async_redis_client().pipeline()
+    pipe.incrby(f"{client_id}:tokens", tokens_used)
+    await pipe.execute()
+
+async def settle(limiter, reservation, tokens_used: int) -> None:
+    """reconcile_usage against the simulated worker that admitted the request."""
+    from app.api import usage_tracking
+
+    with patch.object(usage_tracking, "get_lease_limiter", return_value=limiter):
+        await usage_tracking.reconcile_usage(reservation, tokens_used)
+
+async def _round_trips(request, calls: int) -> tuple:
+    """Average round trips and microseconds per request over `calls` sequential requests."""
+    from app.core.metrics import metrics
+
+    await request(-1)  # Warm up: connect, and load the scripts into Redis
+    before = metrics.get("redis_round_trips_total")
+    started = time.perf_counter()
+    for number in range(calls):
+        await request(number)
+    elapsed = time.perf_counter() - started
+    return (metrics.get("redis_round_trips_total") - before) / calls, elapsed / calls * 1e6
+
+async def _admitted(check, concurrency: int, attempts: int) -> int:
+    remaining = iter(range(attempts))
+
+    async def worker() -> int:
+        return sum([bool(await check(number)) for number in remaining])
+
+    return sum(await asyncio.gather(*(worker() for _ in range(concurrency))))
+
+def _request(check, update):
+    """A request: admit with `check`, then settle its usage with `update`."""
+    async def request(client: str, number: int) -> bool:
+        admitted = await check(client, number)
+        if admitted:
+            await update(admitted, client, number)
+        return bool(admitted)
+    return request
+
+def _limiters(count: int, error: float, workers: int) -> list:
+    from app.api.usage_tracking import LeaseLimiter
+
+    with patch.dict(os.environ, {"RATE_LIMIT_LEASE_ERROR": str(error), "RATE_LIMIT_WORKERS": str(workers)}):
+        return [LeaseLimiter() for _ in range(count)]
+
+async def run(args) -> None:
+    from app.api import usage_tracking
+    from app.api.llm import create_chat_prompt
+    from app.core.metrics import metrics
+    from app.core.redis_client import close_async_redis_client
+    from app.core.tokens import estimate_request_tokens
+
+    token_limit = usage_tracking.MAX_TOKENS_PER_WINDOW
+    exact = _limiters(1, 0, 1)[0]
+    leased = _limiters(args.workers, args.lease_error, args.workers)
+    # Reserve what /chat reserves: the prompt plus the completion allowance
+    cost = estimate_request_tokens(create_chat_prompt(args.message), args.max_tokens)
+    prompt_tokens = cost - args.max_tokens
+
+    def used(number: int) -> int:
+        """Actual usage: the prompt plus 20-100% of the allowance, fixed per request."""
+        return prompt_tokens + random.Random(number).randint(args.max_tokens // 5, args.max_tokens)
+
+    def worker(number: int):
+        # Requests rotate over the simulated workers like a load balancer would
+        return leased[number % len(leased)]
+
+    checks = {
+        "legacy": lambda client, number: legacy_check(client, cost, usage_tracking.MAX_REQUESTS_PER_WINDOW, token_limit),
+        "exact": lambda client, number: exact.check(client, cost),
+        "leased": lambda client, number: worker(number).check(client, cost)
+    }
+    updates = {
+        "legacy": lambda admitted, client, number: legacy_update(client, used(number)),
+        "exact": lambda reservation, client, number: settle(exact, reservation, used(number)),
+        "leased": lambda reservation, client, number: settle(worker(number), reservation, used(number))
+    }
+    expected = min(args.limit, token_limit // cost)
+    print(f"reservation {cost} tokens, usage {prompt_tokens + args.max_tokens // 5}-{cost}")
+    for name, check in checks.items():
+        metrics.reset()
+        request = _request(check, updates[name])
+        # A fresh client every --per-client requests keeps each under the limits
+        trips, micros = await _round_trips(
+            lambda number: request(f"bench:{name}:seq:{number // args.per_client}", number), args.calls
+        )
+        hits = metrics.get("rate_limit_lease_checks_total", result="hit")
+        local = metrics.get("rate_limit_reconcile_total", result="local")
+        with patch.object(usage_tracking, "MAX_REQUESTS_PER_WINDOW", args.limit):
+            admitted = await _admitted(
+                lambda number: check(f"bench:{name}:burst", number), args.concurrency, args.attempts
+            )
+        print(
+            f"{name:<7} {trips:4.2f} round trips/request  {micros:7.1f} us/request  "
+            f"local checks {hits / (args.calls + 1):4.0%}  local settles {local / (args.calls + 1):4.0%}  "
+            f"admitted {admitted}/{expected} ({admitted - expected:+d})"
+        )
+    for limiter in [exact, *leased]:
+        await limiter.reconcile()
+    await close_async_redis_client()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=2000, help="Concurrent checks per implementation")
+    parser.add_argument("--limit", type=int, default=100, help="Requests allowed per window")
+    parser.add_argument("--calls", type=int, default=5000, help="Sequential requests for the latency run")
+    parser.add_argument("--per-client", type=int, default=40, help="Sequential requests per client")
+    parser.add_argument("--message", default="Plan my week around the dentist on Thursday", help="Chat message")
+    parser.add_argument("--max-tokens", type=int, default=500, help="Completion allowance per request")
+    parser.add_argument("--workers", type=int, default=4, help="Simulated workers sharing Redis")
+    parser.add_argument("--lease-error", type=float, default=0.05, help="Error bound as a fraction of the limit")
+    parser.add_argument("--redis-port", type=int, default=6391)
+    parser.add_argument("--redis-server", default="redis-server", help="redis-server executable")
+    args = parser.parse_args()
+
+    with local_redis(args.redis_port, args.redis_server):
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
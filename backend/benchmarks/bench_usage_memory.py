@@ -0,0 +1,83 @@
+"""
+Usage Key Memory Benchmark
+
+Measures the Redis memory one active client's rate-limit counters take in
+each key layout usage_tracking has used, with MEMORY USAGE against a
+throwaway local redis-server:
+- legacy: {client_id}:requests, :tokens and :window_start strings, never
+  expiring
+- per-window strings: {client_id}:requests:{window} and :tokens:{window}
+  for the current and previous window
+- hash: llm_usage:{client_id}:{window} for the current and previous window,
+  as written by check_rate_limit
+
+The legacy layout holds a single set of counters per client, while the
+windowed layouts hold two windows each, so compare them per window as well
+as per client; only the windowed keys expire once a client goes idle.
+
+It then seeds --clients clients in the legacy layout (half of them with a
+recent window_start) and runs scripts.migrate_usage_keys over them, printing
+its before/after report.
+
+Usage:
+    cd backend
+    python -m benchmarks.bench_usage_memory --clients 10000
+"""
+import argparse
+import time
+
+from benchmarks.common import local_redis
+
+def _client_id(number: int) -> str:
+    return f"10.{number // 65536 % 256}.{number // 256 % 256}.{number % 256}"
+
+def _seed(redis_client, layout: str, clients: int, now: float) -> None:
+    from app.api.usage_tracking import RATE_LIMIT_WINDOW, USAGE_KEY_TTL, usage_key
+
+    window = int(now // RATE_LIMIT_WINDOW)
+    pipe = redis_client.pipeline(transaction=False)
+    for number in range(clients):
+        client_id = _client_id(number)
+        requests, tokens = 40 + number % 60, 20000 + number * 7 % 50000
+        if layout == "legacy":
+            pipe.set(f"{client_id}:requests", requests)
+            pipe.set(f"{client_id}:tokens", tokens)
+            if number % 2 == 0:
+                pipe.set(f"{client_id}:window_start", now - number % RATE_LIMIT_WINDOW)
+        elif layout == "per-window strings":
+            for current in (window, window - 1):
+                pipe.set(f"{client_id}:requests:{current}", requests, ex=USAGE_KEY_TTL)
+                pipe.set(f"{client_id}:tokens:{current}", tokens, ex=USAGE_KEY_TTL)
+        else:
+            for current in (window, window - 1):
+                pipe.hset(usage_key(client_id, current), mapping={"requests": requests, "tokens": tokens})
+                pipe.expire(usage_key(client_id, current), USAGE_KEY_TTL)
+        if number % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--redis-port", type=int, default=6392)
+    parser.add_argument("--redis-server", default="redis-server", help="redis-server executable")
+    args = parser.parse_args()
+
+    with local_redis(args.redis_port, args.redis_server):
+        from app.core.redis_client import get_redis_client
+        from scripts.migrate_usage_keys import memory_usage, migrate
+
+        redis_client = get_redis_client()
+        now = time.time()
+        for layout in ("legacy", "per-window strings", "hash"):
+            redis_client.flushdb()
+            _seed(redis_client, layout, args.clients, now)
+            used = memory_usage(redis_client, redis_client.scan_iter(count=1000))
+            print(f"{layout:<20} {used / args.clients:7.1f} bytes/client  ({redis_client.dbsize()} keys)")
+
+        redis_client.flushdb()
+        _seed(redis_client, "legacy", args.clients, now)
+        print("migrate_usage_keys:", migrate(redis_client, now=now))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager, ExitStack
+from unittest.mock import patch
+
+MOCK_HOST = "127.0.0.1"
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    """Block until something accepts TCP connections on `port`."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex((MOCK_HOST, port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f"Nothing started listening on port {port}")
+
+@contextmanager
+def mock_openai_server(port: int, *args: str):
+    """
+    Run benchmarks.mock_openai in a subprocess and point the OpenAI client at it.
+
+    Args:
+        port: Port for the mock server
+        *args: Extra command-line flags passed to the mock server
+    """
+    os.environ["OPENAI_BASE_URL"] = f"http://{MOCK_HOST}:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.mock_openai", "--port", str(port), *args
+    ])
+    try:
+        wait_for_port(port)
+        yield
+    finally:
+        server.terminate()
+        server.wait()
+
+@contextmanager
+def local_redis(port: int, binary: str = "redis-server"):
+    """
+    Run a throwaway, non-persistent redis-server and point the app at it.
+
+    Args:
+        port: Port for the Redis server
+        binary: redis-server executable
+    """
+    if shutil.which(binary) is None:
+        raise RuntimeError(f"{binary} not found; install Redis or pass --no-redis")
+    from app.core.redis_client import get_async_redis_client, get_redis_client
+
+    os.environ["REDIS_HOST"] = MOCK_HOST
+    os.environ["REDIS_PORT"] = str(port)
+    get_redis_client.cache_clear()
+    get_async_redis_client.cache_clear()
+    server = subprocess.Popen(
+        [binary, "--port", str(port), "--bind", MOCK_HOST, "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port)
+        yield
+    finally:
+        server.terminate()
+        server.wait()
+        get_redis_client.cache_clear()
+        get_async_redis_client.cache_clear()
+
+@contextmanager
+def without_usage_tracking():
+    """Patch out Redis-backed rate limiting so only the OpenAI path is measured."""
+    from app.api import llm
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(llm, "check_rate_limit", return_value=True))
+        stack.enter_context(patch.object(llm, "reconcile_usage", return_value=None))
+        yield
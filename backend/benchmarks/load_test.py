@@ -0,0 +1,248 @@
+"""
+Chat Load Test
+
+Drives /api/llm/chat (or /api/llm/chat/stream) at one or more concurrency
+levels and reports what a user would see: p50/p95/p99 latency, requests per
+second, the mix of response statuses, and event-loop lag.
+
+By default everything runs locally and costs nothing:
+- benchmarks.mock_openai stands in for OpenAI, with the latency
+  distribution, token counts and error injection given on the command line
+- a throwaway redis-server backs rate limiting, the response cache and the
+  other Redis stores (--no-redis patches usage tracking out instead)
+- the app runs in-process behind an ASGI transport, which is equivalent to
+  one uvicorn worker. Requests come from --clients distinct client addresses
+  so per-client rate limits behave as they would with real users, and the
+  response cache is bypassed unless --cache is given.
+
+Event-loop lag is sampled by a task that sleeps LAG_INTERVAL and records how
+late it wakes up; with the app in-process this is the server's own loop, so
+it shows handlers that block. With --url the driver targets a running server
+instead (and lag is the driver's own).
+
+Results are printed and, with --output, written as JSON together with the
+commit and configuration, so runs can be compared across commits.
+
+Usage:
+    cd backend
+    python -m benchmarks.load_test --concurrency 10 50 100 --requests 500 \\
+        --latency 0.4 --latency-dist lognormal --latency-spread 0.5 \\
+        --error-rate 0.01 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import local_redis, mock_openai_server, without_usage_tracking
+
+LAG_INTERVAL = 0.01
+MESSAGES = [
+    "add dentist tomorrow at 3pm",
+    "what's on my plate this week?",
+    "move my gym session to friday evening",
+    "plan two hours of thesis writing every day until the deadline",
+    "remind me to call mom on sunday"
+]
+CONTEXT = {"current_tasks": [
+    {"id": str(i), "title": f"Task {i}", "start_date": f"2024-03-{1 + i % 28:02d}T{9 + i % 8:02d}:00:00"}
+    for i in range(20)
+]}
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of `values` (0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 2),
+        "p95": round(percentile(values, 0.95) * 1000, 2),
+        "p99": round(percentile(values, 0.99) * 1000, 2),
+        "max": round(max(values, default=0.0) * 1000, 2),
+        "mean": round(sum(values) / len(values) * 1000, 2) if values else 0.0
+    }
+
+async def _monitor_lag(samples: List[float], stop: asyncio.Event) -> None:
+    """Record how late each LAG_INTERVAL sleep wakes up."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected))
+
+def _clients(app, url: Optional[str], count: int) -> List[httpx.AsyncClient]:
+    """One HTTP client per simulated user, each with its own client address."""
+    timeout = httpx.Timeout(120.0)
+    if url:
+        return [httpx.AsyncClient(base_url=url, timeout=timeout)]
+    return [
+        httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app, client=(f"10.0.{i // 250}.{i % 250 + 1}", 40000)),
+            base_url="http://load",
+            timeout=timeout
+        )
+        for i in range(count)
+    ]
+
+async def _request(client: httpx.AsyncClient, endpoint: str, number: int, cache: bool) -> tuple:
+    """Send one chat request; returns (status, seconds, seconds to first byte)."""
+    payload = {"message": MESSAGES[number % len(MESSAGES)], "context": CONTEXT}
+    headers = {} if cache else {"Cache-Control": "no-cache"}
+    started = time.perf_counter()
+    first_byte = None
+    try:
+        async with client.stream("POST", f"/api/llm/{endpoint}", json=payload, headers=headers) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+            status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    return status, time.perf_counter() - started, first_byte
+
+async def run_level(app, args, concurrency: int) -> dict:
+    """Run one concurrency level and summarize it."""
+    clients = _clients(app, args.url, args.clients or concurrency)
+    endpoint = "chat/stream" if args.endpoint == "stream" else "chat"
+    latencies, first_bytes, statuses = [], [], Counter()
+    lag: List[float] = []
+    stop = asyncio.Event()
+    counter = iter(range(args.warmup + args.requests))
+
+    async def user() -> None:
+        for number in counter:
+            status, seconds, first_byte = await _request(
+                clients[number % len(clients)], endpoint, number, args.cache
+            )
+            if number < args.warmup:
+                continue
+            statuses[str(status)] += 1
+            latencies.append(seconds)
+            if first_byte is not None:
+                first_bytes.append(first_byte)
+
+    monitor = asyncio.create_task(_monitor_lag(lag, stop))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await monitor
+        for client in clients:
+            await client.aclose()
+
+    result = {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "status_counts": dict(sorted(statuses.items())),
+        "loop_lag_ms": summarize(lag)
+    }
+    if args.endpoint == "stream":
+        result["first_byte_ms"] = summarize(first_bytes)
+    return result
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> List[dict]:
+    app = None
+    if not args.url:
+        from app.main import app
+    results = []
+    for concurrency in args.concurrency:
+        result = await run_level(app, args, concurrency)
+        results.append(result)
+        latency = result["latency_ms"]
+        print(
+            f"concurrency={concurrency:<4} {result['throughput_rps']:>8.1f} req/s  "
+            f"p50={latency['p50']:.0f}ms p95={latency['p95']:.0f}ms p99={latency['p99']:.0f}ms  "
+            f"lag p99={result['loop_lag_ms']['p99']:.1f}ms  statuses={result['status_counts']}"
+        )
+    if not args.url:
+        from app.api import llm
+        from app.core.redis_client import close_async_redis_client
+        await llm.close_openai_client()
+        await close_async_redis_client()
+    return results
+
+def _mock_args(args) -> List[str]:
+    flags = [
+        "--latency", str(args.latency),
+        "--latency-dist", args.latency_dist,
+        "--latency-spread", str(args.latency_spread),
+        "--error-rate", str(args.error_rate),
+        "--error-codes", args.error_codes
+    ]
+    if args.completion_tokens is not None:
+        flags += ["--completion-tokens", str(args.completion_tokens)]
+    if args.seed is not None:
+        flags += ["--seed", str(args.seed)]
+    return flags
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--requests", type=int, default=300, help="Measured requests per level")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per level")
+    parser.add_argument("--clients", type=int, default=None, help="Distinct clients (default: concurrency)")
+    parser.add_argument("--endpoint", choices=("chat", "stream"), default="chat")
+    parser.add_argument("--cache", action="store_true", help="Allow response cache hits")
+    parser.add_argument("--url", default=None, help="Target a running server instead of the in-process app")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    mock = parser.add_argument_group("mock OpenAI")
+    mock.add_argument("--port", type=int, default=8900)
+    mock.add_argument("--latency", type=float, default=0.3)
+    mock.add_argument("--latency-dist", default="fixed")
+    mock.add_argument("--latency-spread", type=float, default=0.0)
+    mock.add_argument("--completion-tokens", type=int, default=None)
+    mock.add_argument("--error-rate", type=float, default=0.0)
+    mock.add_argument("--error-codes", default="429,500,503")
+    mock.add_argument("--seed", type=int, default=None)
+    redis = parser.add_argument_group("Redis")
+    redis.add_argument("--redis-port", type=int, default=6390)
+    redis.add_argument("--redis-server", default="redis-server", help="redis-server executable")
+    redis.add_argument("--no-redis", action="store_true", help="Patch out usage tracking instead")
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        if not args.url:
+            stack.enter_context(mock_openai_server(args.port, *_mock_args(args)))
+            if args.no_redis:
+                stack.enter_context(without_usage_tracking())
+            else:
+                stack.enter_context(local_redis(args.redis_port, args.redis_server))
+        results = asyncio.run(run(args))
+
+    if args.output:
+        report = {
+            "commit": _commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": vars(args),
+            "results": results
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Mock OpenAI Server
+
+A minimal OpenAI-compatible stand-in for benchmarking the LLM endpoints without
+paying for real completions. It implements just enough of
+POST /v1/chat/completions (including `stream=True` and function calling) for
+the official client to parse the response.
+
+Upstream behaviour is configurable so load tests can model a real provider:
+- Latency: fixed, or drawn per completion from a uniform, normal, lognormal
+  or exponential distribution around --latency (--latency-dist,
+  --latency-spread)
+- Token counts: reported completion tokens (--completion-tokens); prompt
+  tokens are estimated from the request at four characters per token
+- Errors: a fraction of completions (--error-rate) fail with one of
+  --error-codes, each an HTTP status (429 carries Retry-After) or "timeout",
+  which never answers
+
+Usage:
+    python -m benchmarks.mock_openai --port 8900 --latency 0.5
+    python -m benchmarks.mock_openai --latency 0.4 --latency-dist lognormal \
+        --latency-spread 0.6 --error-rate 0.02 --error-codes 429,500,timeout
+
+Then point the backend at it:
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Optional, Sequence, Union
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_REPLY = (
+    "Sure, I'll add that for you.\n"
+    "SUGGESTION: [{\"action\": \"create_task\", \"parameters\": "
+    "{\"title\": \"Dentist\", \"start_date\": \"2024-03-20T15:00:00\", "
+    "\"end_date\": \"2024-03-20T16:00:00\"}}]"
+)
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+CHARS_PER_TOKEN = 4
+TIMEOUT_HANG_SECONDS = 3600
+ERROR_TYPES = {
+    429: ("rate_limit_exceeded", "Rate limit reached for requests"),
+    500: ("server_error", "The server had an error while processing your request"),
+    503: ("server_error", "The engine is currently overloaded, please try again later")
+}
+
+def sample_latency(rng: random.Random, latency: float, distribution: str, spread: float) -> float:
+    """
+    Draw one completion latency.
+
+    Args:
+        rng: Random source
+        latency: Typical latency in seconds (the mean; the median for lognormal)
+        distribution: One of LATENCY_DISTRIBUTIONS
+        spread: Half-width (uniform), standard deviation in seconds (normal)
+            or sigma of the underlying normal (lognormal)
+
+    Returns:
+        float: Latency in seconds, never negative
+    """
+    if distribution == "uniform":
+        value = rng.uniform(latency - spread, latency + spread)
+    elif distribution == "normal":
+        value = rng.gauss(latency, spread)
+    elif distribution == "lognormal":
+        value = latency * math.exp(rng.gauss(0, spread))
+    elif distribution == "exponential":
+        value = rng.expovariate(1 / latency) if latency > 0 else 0.0
+    else:
+        value = latency
+    return max(0.0, value)
+
+def error_response(status: int, retry_after: float) -> JSONResponse:
+    """Build an OpenAI-shaped error response."""
+    error_type, message = ERROR_TYPES.get(status, ("server_error", "Injected error"))
+    headers = {"retry-after": f"{retry_after:g}"} if status == 429 else None
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": error_type, "param": None, "code": error_type}},
+        headers=headers
+    )
+
+def create_app(
+    latency: float = 0.5,
+    reply: str = DEFAULT_REPLY,
+    first_token_latency: float = 0.15,
+    latency_dist: str = "fixed",
+    latency_spread: float = 0.0,
+    completion_tokens: Optional[int] = None,
+    error_rate: float = 0.0,
+    error_codes: Sequence[Union[int, str]] = (429, 500, 503),
+    retry_after: float = 1.0,
+    seed: Optional[int] = None
+) -> FastAPI:
+    """
+    Build the mock server application.
+
+    Args:
+        latency: Typical seconds until a completion is fully generated
+        reply: Assistant message content returned for every completion
+        first_token_latency: Seconds until the first chunk of a streamed completion
+        latency_dist: Distribution completion latencies are drawn from
+        latency_spread: Spread of the distribution (see sample_latency)
+        completion_tokens: Completion tokens to report (default: words in the reply)
+        error_rate: Fraction of completions that fail
+        error_codes: Failures to choose from: HTTP statuses or "timeout"
+        retry_after: Retry-After seconds sent with injected 429s
+        seed: Seed for latency and error draws, for repeatable runs
+
+    Returns:
+        FastAPI: Application serving the mock completion endpoint
+    """
+    if latency_dist not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution: {latency_dist}")
+    app = FastAPI(title="Mock OpenAI")
+    rng = random.Random(seed)
+
+    def usage_for(prompt_tokens: int, words: int) -> dict:
+        completion = completion_tokens if completion_tokens is not None else words
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion,
+            "total_tokens": prompt_tokens + completion
+        }
+
+    async def stream_reply(model: str, prompt_tokens: int, total_latency: float):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = reply.split(" ")
+        first_token = min(first_token_latency, total_latency)
+        token_delay = max(0.0, total_latency - first_token) / len(words)
+        await asyncio.sleep(first_token)
+        for index, word in enumerate(words):
+            content = word if index == 0 else f" {word}"
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(token_delay)
+        usage = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [],
+            "usage": usage_for(prompt_tokens, len(words))
+        }
+        yield f"data: {json.dumps(usage)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in body.get("messages", []))
+        prompt_tokens = max(1, prompt_chars // CHARS_PER_TOKEN)
+        total_latency = sample_latency(rng, latency, latency_dist, latency_spread)
+
+        if error_rate and rng.random() < error_rate:
+            failure = rng.choice(list(error_codes))
+            if failure == "timeout":
+                # Longer than any client timeout, so the caller gives up first
+                await asyncio.sleep(TIMEOUT_HANG_SECONDS)
+                return error_response(504, retry_after)
+            if failure != 429:
+                # Server errors cost the caller the wait; rate limits fail fast
+                await asyncio.sleep(total_latency)
+            return error_response(failure, retry_after)
+
+        if body.get("stream"):
+            return StreamingResponse(
+                stream_reply(body.get("model", "gpt-3.5-turbo"), prompt_tokens, total_latency),
+                media_type="text/event-stream"
+            )
+        await asyncio.sleep(total_latency)
+        message = {"role": "assistant", "content": reply}
+        if body.get("tools") and "SUGGESTION:" in reply:
+            # Answer through the offered function, as a real model would
+            text, suggestions = reply.split("SUGGESTION:", 1)
+            message = {
+                "role": "assistant",
+                "content": text.strip() or None,
+                "tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {
+                        "name": body["tools"][0]["function"]["name"],
+                        "arguments": json.dumps({"suggestions": json.loads(suggestions)})
+                    }
+                }]
+            }
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if "tool_calls" in message else "stop"
+            }],
+            "usage": usage_for(prompt_tokens, len(reply.split()))
+        }
+
+    return app
+
+def _parse_error_codes(value: str) -> list:
+    return [code if code == "timeout" else int(code) for code in value.split(",") if code]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--first-token-latency", type=float, default=0.15)
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-spread", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-codes", type=_parse_error_codes, default=[429, 500, 503])
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    app = create_app(
+        args.latency,
+        first_token_latency=args.first_token_latency,
+        latency_dist=args.latency_dist,
+        latency_spread=args.latency_spread,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        error_codes=args.error_codes,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Usage Key Migration
+
+Converts rate-limit counters written by older versions of usage_tracking to
+the current layout (one expiring hash per client per window, see
+app.api.usage_tracking) and deletes the old keys:
+- {client_id}:requests, {client_id}:tokens, {client_id}:window_start - the
+  original layout, written without a TTL. Counts whose window_start is still
+  inside the sliding window move to the hash of the window it falls in.
+  Older counts, and counts without a window_start (the original code rarely
+  wrote one, so these are totals since the client first called), are dropped.
+- {client_id}:requests:{window}, {client_id}:tokens:{window} - one string per
+  counter and window. Counts move to llm_usage:{client_id}:{window}.
+
+Moved counts are added to whatever the new hash already holds, and the hash
+expires when the window stops being read. Keys are found with SCAN, so the
+tool can run against a live server; keys of other namespaces (llm_cache,
+llm_session, ...) and values that are not counters are left alone.
+
+With --dry-run nothing is written. The memory used per client (MEMORY USAGE
+summed over a client's keys) is reported before and after.
+
+Usage:
+    cd backend
+    python -m scripts.migrate_usage_keys --dry-run
+"""
+import argparse
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.api.usage_tracking import RATE_LIMIT_WINDOW, usage_key
+
+FIELDS = ("requests", "tokens")
+LEGACY_PATTERNS = ("*:requests", "*:tokens", "*:window_start", "*:requests:*", "*:tokens:*")
+SCAN_COUNT = 1000
+
+def parse_key(key: str) -> Optional[Tuple[str, str, Optional[int]]]:
+    """
+    Parse an old-layout usage key.
+
+    Returns:
+        Optional[Tuple[str, str, Optional[int]]]: (client_id, field, window
+        number or None for the original layout), or None for other keys
+    """
+    if key.startswith("llm_"):
+        return None
+    client_id, _, field = key.rpartition(":")
+    if client_id and field in (*FIELDS, "window_start"):
+        return client_id, field, None
+    client_id, _, window = key.rpartition(":")
+    client_id, _, field = client_id.rpartition(":")
+    if client_id and field in FIELDS and window.isdigit():
+        return client_id, field, int(window)
+    return None
+
+def plan_migration(values: Dict[str, Optional[str]], now: float) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    Work out the new hashes for one client's old keys.
+
+    Args:
+        values: Old key -> value for one client
+        now: Current time as a Unix timestamp
+
+    Returns:
+        Tuple[Dict[str, dict], List[str]]: (new key -> {"requests", "tokens",
+        "ttl"} to add, old keys to delete)
+    """
+    current_window = int(now // RATE_LIMIT_WINDOW)
+    counts: Dict[int, Dict[str, int]] = defaultdict(dict)
+    legacy: Dict[str, float] = {}
+    client_id, deleted = None, []
+    for key, value in values.items():
+        parsed = parse_key(key)
+        if parsed is None or value is None:
+            continue
+        try:
+            number = float(value)
+        except ValueError:
+            continue
+        client_id, field, window = parsed
+        deleted.append(key)
+        if window is None:
+            legacy[field] = number
+        else:
+            counts[window][field] = counts[window].get(field, 0) + int(number)
+    if "window_start" in legacy:
+        window = int(legacy["window_start"] // RATE_LIMIT_WINDOW)
+        for field in FIELDS:
+            if field in legacy:
+                counts[window][field] = counts[window].get(field, 0) + int(legacy[field])
+
+    increments = {}
+    for window, fields in counts.items():
+        # A window is read until the end of the next one
+        ttl = int((window + 2) * RATE_LIMIT_WINDOW - now)
+        if window >= current_window - 1 and ttl > 0:
+            increments[usage_key(client_id, window)] = {
+                "requests": fields.get("requests", 0), "tokens": fields.get("tokens", 0), "ttl": ttl
+            }
+    return increments, deleted
+
+def find_old_keys(redis_client) -> Dict[str, List[str]]:
+    """Find old-layout usage keys that hold strings, grouped by client."""
+    keys_by_client: Dict[str, List[str]] = defaultdict(list)
+    for pattern in LEGACY_PATTERNS:
+        for key in redis_client.scan_iter(match=pattern, count=SCAN_COUNT):
+            parsed = parse_key(key)
+            if parsed is not None and redis_client.type(key) == "string":
+                keys_by_client[parsed[0]].append(key)
+    return keys_by_client
+
+def memory_usage(redis_client, keys: Iterable[str]) -> int:
+    """Total MEMORY USAGE of `keys` in bytes (missing keys count 0)."""
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.memory_usage(key, samples=0)
+    return sum(size or 0 for size in pipe.execute())
+
+def migrate(redis_client, dry_run: bool = False, now: Optional[float] = None) -> dict:
+    """
+    Move every client's old usage keys to the current layout.
+
+    Returns:
+        dict: Counts of clients, keys and hashes, plus bytes per client
+        before and (unless dry_run) after
+    """
+    now = time.time() if now is None else now
+    keys_by_client = find_old_keys(redis_client)
+    report = {"clients": len(keys_by_client), "old_keys": 0, "hashes": 0, "dropped_clients": 0, "bytes_before": 0}
+    new_keys = []
+    for client_id, keys in keys_by_client.items():
+        report["bytes_before"] += memory_usage(redis_client, keys)
+        increments, deleted = plan_migration(dict(zip(keys, redis_client.mget(keys))), now)
+        report["old_keys"] += len(deleted)
+        report["hashes"] += len(increments)
+        report["dropped_clients"] += not increments
+        new_keys += increments
+        if dry_run:
+            continue
+        pipe = redis_client.pipeline()
+        for key, change in increments.items():
+            for field in FIELDS:
+                pipe.hincrby(key, field, change[field])
+            pipe.expire(key, change["ttl"])
+        if deleted:
+            pipe.delete(*deleted)
+        pipe.execute()
+
+    clients = report["clients"] or 1
+    report["bytes_per_client_before"] = round(report.pop("bytes_before") / clients, 1)
+    if not dry_run:
+        report["bytes_per_client_after"] = round(memory_usage(redis_client, new_keys) / clients, 1)
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+
+    from app.core.redis_client import get_redis_client
+
+    report = migrate(get_redis_client(), dry_run=args.dry_run)
+    for name, value in report.items():
+        print(f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ Test configuration and fixtures.
 import os
 import sys
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock, MagicMock
 
 # Add the backend directory to Python path
 backend_dir = Path(__file__).parent.parent
@@ -15,11 +16,18 @@ sys.path.insert(0, str(backend_dir))
 os.environ['SUPABASE_URL'] = 'https://test-project.supabase.co'
 os.environ['SUPABASE_KEY'] = 'test-key-123'
 os.environ['JWT_SECRET'] = 'test-jwt-secret'
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test-key-123')
 
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 
+# Canned assistant reply carrying one suggestion
+SUGGESTION_REPLY = (
+    'Done!\nSUGGESTION: [{"action": "create_task", "parameters": '
+    '{"title": "Dentist", "start_date": "2024-03-20T15:00:00"}}]'
+)
+
 # Mock user data for testing
 TEST_USER = {
     "id": "123e4567-e89b-12d3-a456-426614174000",
@@ -126,4 +134,199 @@ def authenticated_client(client, auth_header):
             headers.update(self.headers)
             return self.client.delete(url, headers=headers, **kwargs)
     
-    return AuthenticatedClient(client, auth_header) 
\ No newline at end of file
+    return AuthenticatedClient(client, auth_header) 
+
+def make_completion(content, total_tokens=42, tool_calls=None):
+    """Build an object shaped like an OpenAI chat completion."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=tool_calls))],
+        usage=SimpleNamespace(
+            prompt_tokens=total_tokens - total_tokens // 4,
+            completion_tokens=total_tokens // 4,
+            total_tokens=total_tokens
+        )
+    )
+
+@pytest.fixture
+def local_cache():
+    """Use a fresh response cache whose Redis tier always misses."""
+    from app.core import response_cache
+    from app.core.response_cache import ResponseCache, get_response_cache
+    
+    redis_client = AsyncMock()
+    redis_client.get.return_value = None
+    with patch.object(response_cache, "get_async_redis_client", return_value=redis_client):
+        cache = ResponseCache()
+        app.dependency_overrides[get_response_cache] = lambda: cache
+        yield cache
+
+class FakeRedis:
+    """Dict-backed stand-in for the Redis commands the LLM stores use."""
+    def __init__(self):
+        self.data = {}
+        self.sorted_sets = {}
+    
+    def get(self, key):
+        return self.data.get(key)
+    
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+    
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+    
+    def zadd(self, key, mapping):
+        self.sorted_sets.setdefault(key, {}).update(mapping)
+    
+    def zremrangebyscore(self, key, low, high):
+        members = self.sorted_sets.get(key, {})
+        for member in [m for m, score in members.items() if low <= score <= high]:
+            del members[member]
+    
+    def zcard(self, key):
+        return len(self.sorted_sets.get(key, {}))
+    
+    def zpopmin(self, key, count=1):
+        members = self.sorted_sets.get(key, {})
+        popped = sorted(members.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del members[member]
+        return popped
+    
+    def pipeline(self):
+        return FakePipeline(self)
+
+class FakePipeline:
+    """Buffers commands until execute(), except reads while watching."""
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+        self.watching = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def watch(self, key):
+        self.watching = True
+    
+    def unwatch(self):
+        self.watching = False
+    
+    def multi(self):
+        self.watching = False
+    
+    def __getattr__(self, name):
+        command = getattr(self.redis_client, name)
+        def call(*args):
+            if self.watching:
+                return command(*args)
+            self.commands.append((command, args))
+            return self
+        return call
+    
+    def execute(self):
+        results = [command(*args) for command, args in self.commands]
+        self.commands = []
+        return results
+
+class FakeAsyncRedis:
+    """Asyncio facade over FakeRedis for stores on the asyncio client."""
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client or FakeRedis()
+    
+    def __getattr__(self, name):
+        command = getattr(self.redis_client, name)
+        async def call(*args):
+            return command(*args)
+        return call
+    
+    def pipeline(self, transaction=True):
+        return FakeAsyncPipeline(self.redis_client)
+
+class FakeAsyncPipeline(FakePipeline):
+    """FakePipeline with redis.asyncio's awaitable watch, reads and execute."""
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    async def watch(self, key):
+        super().watch(key)
+    
+    async def unwatch(self):
+        super().unwatch()
+    
+    def __getattr__(self, name):
+        call = super().__getattr__(name)
+        if not self.watching:
+            return call
+        async def read(*args):
+            return call(*args)
+        return read
+    
+    async def execute(self):
+        return super().execute()
+
+@pytest.fixture
+def task_snapshots():
+    """Use a task snapshot store backed by an in-memory fake Redis."""
+    from app.core import task_snapshot
+    from app.core.task_snapshot import TaskSnapshotStore, get_task_snapshots
+    
+    with patch.object(task_snapshot, "get_async_redis_client", return_value=FakeAsyncRedis()):
+        store = TaskSnapshotStore()
+        app.dependency_overrides[get_task_snapshots] = lambda: store
+        yield store
+
+@pytest.fixture
+def sessions():
+    """Use a conversation session store backed by an in-memory fake Redis."""
+    from app.core import conversations
+    from app.core.conversations import SessionStore, get_session_store
+    
+    with patch.object(conversations, "get_async_redis_client", return_value=FakeAsyncRedis()):
+        store = SessionStore()
+        app.dependency_overrides[get_session_store] = lambda: store
+        yield store
+
+@pytest.fixture
+def mock_openai(local_cache, task_snapshots, sessions):
+    """Override the OpenAI config with an async mock client."""
+    from app.api.llm import get_openai_config
+    from app.core.llm_scheduler import OutboundScheduler
+    from app.core.resilience import ResilientCaller
+    from app.services.model_routing import ModelRouter
+    
+    create = AsyncMock(return_value=make_completion(SUGGESTION_REPLY))
+    config = SimpleNamespace(
+        client=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))),
+        model="gpt-3.5-turbo",
+        max_tokens=500,
+        temperature=0.7,
+        structured_output=True,
+        resilience=ResilientCaller(),
+        router=ModelRouter(),
+        scheduler=OutboundScheduler()
+    )
+    app.dependency_overrides[get_openai_config] = lambda: config
+    yield config
+    app.dependency_overrides.clear()
+
+@pytest.fixture
+def llm_client(mock_openai):
+    """Test client with Redis-backed usage tracking patched out."""
+    from app.api import llm
+    from app.api.usage_tracking import Reservation
+    
+    reservation = Reservation("testclient", 0, 1000)
+    with patch.object(llm, "check_rate_limit", return_value=reservation) as check_rate_limit, \
+            patch.object(llm, "reconcile_usage") as reconcile_usage:
+        client = TestClient(app)
+        client.check_rate_limit = check_rate_limit
+        client.reconcile_usage = reconcile_usage
+        yield client
\ No newline at end of file
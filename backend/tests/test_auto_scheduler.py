@@ -0,0 +1,63 @@
+"""
+Tests for the deterministic auto-scheduler.
+"""
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from app.core.metrics import metrics
+from app.services.auto_scheduler import availability, schedule_work
+from app.services.free_busy import BusyIndex
+from tests.conftest import make_completion
+
+NOW = datetime(2024, 3, 20, 9, 7)  # A Wednesday
+MEETING = {"title": "Meeting", "start_date": "2024-03-20T10:00:00", "end_date": "2024-03-20T12:00:00"}
+
+def test_availability_masks_hours_weekends_and_tasks():
+    """Test that the bitmap is free only in working hours, on weekdays, outside tasks."""
+    index = BusyIndex.from_tasks([MEETING])
+    free = availability(datetime(2024, 3, 20), datetime(2024, 3, 24), index, (9 * 60, 17 * 60), weekdays_only=True)
+    assert free.sum() == 3 * 8 * 60 - 2 * 60
+    assert free[9 * 60] and not free[10 * 60] and not free[8 * 60 + 59]
+    assert not free[3 * 24 * 60 + 12 * 60]  # Saturday
+
+def test_work_is_spread_across_days():
+    """Test that chunks avoid existing tasks and are spread evenly before the deadline."""
+    index = BusyIndex.from_tasks([MEETING])
+    suggestions, unscheduled = schedule_work("Thesis", 360, datetime(2024, 3, 23), index, NOW, chunk_minutes=90)
+    assert unscheduled == 0
+    starts = [datetime.fromisoformat(s["parameters"]["start_date"]) for s in suggestions]
+    ends = [datetime.fromisoformat(s["parameters"]["end_date"]) for s in suggestions]
+    assert sum((end - start).total_seconds() for start, end in zip(starts, ends)) == 360 * 60
+    assert {start.day for start in starts} == {20, 21, 22}
+    assert all(start.minute % 15 == 0 and (end - start).total_seconds() <= 90 * 60 for start, end in zip(starts, ends))
+    assert not any(index.overlaps(start, end) for start, end in zip(starts, ends))
+    assert suggestions[0]["parameters"]["title"] == f"Thesis (1/{len(suggestions)})"
+
+def test_work_that_does_not_fit():
+    """Test that effort beyond the deadline's free time is reported as unscheduled."""
+    suggestions, unscheduled = schedule_work("Thesis", 3000, datetime(2024, 3, 20, 18), BusyIndex([]), NOW)
+    assert unscheduled > 0
+    assert all(s["parameters"]["end_date"] <= "2024-03-20T18:00:00" for s in suggestions)
+
+def test_chat_schedule_work_call(llm_client, mock_openai):
+    """Test that a schedule_work function call is turned into placed suggestions."""
+    metrics.reset()
+    arguments = json.dumps({
+        "title": "Thesis", "total_minutes": 240, "deadline": "2099-01-09",
+        "workday_start": "09:00", "workday_end": "17:00"
+    })
+    call = SimpleNamespace(function=SimpleNamespace(name="schedule_work", arguments=arguments))
+    mock_openai.client.chat.completions.create.return_value = make_completion(None, tool_calls=[call])
+    response = llm_client.post("/api/llm/chat", json={"message": "fit 4 hours of thesis work in"})
+    assert response.status_code == 200
+    actions = response.json()["suggested_actions"]
+    assert sum(
+        (datetime.fromisoformat(a["parameters"]["end_date"]) -
+         datetime.fromisoformat(a["parameters"]["start_date"])).total_seconds()
+        for a in actions
+    ) == 240 * 60
+    assert all("09:00" <= a["parameters"]["start_date"][11:16] < "17:00" for a in actions)
+    assert metrics.get("llm_auto_schedule_total", outcome="ok") == 1
+    tools = mock_openai.client.chat.completions.create.call_args.kwargs["tools"]
+    assert [tool["function"]["name"] for tool in tools] == ["suggest_tasks", "schedule_work"]
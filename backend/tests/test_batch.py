@@ -0,0 +1,92 @@
+"""
+Tests for the batch chat endpoint.
+"""
+
+import json
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api import llm, usage_tracking
+from app.api.usage_tracking import MAX_REQUESTS_PER_WINDOW, LeaseLimiter
+
+def test_batch_returns_results_in_order(llm_client, mock_openai):
+    """Test that results come back in request order."""
+    payload = {"requests": [{"message": f"plan day {i}"} for i in range(5)], "concurrency": 2}
+    response = llm_client.post("/api/llm/chat/batch", json=payload)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == list(range(5))
+    assert all(result["status_code"] == 200 for result in results)
+    assert results[0]["response"]["suggested_actions"][0]["parameters"]["title"] == "Dentist"
+    assert mock_openai.client.chat.completions.create.await_count == 5
+
+def test_batch_reports_per_item_errors(mock_openai):
+    """Test that rate limiting is applied per item."""
+    decisions = iter([True, False, True])
+    with patch.object(llm, "check_rate_limit", side_effect=lambda *args, **kwargs: next(decisions)), \
+            patch.object(llm, "reconcile_usage"):
+        response = TestClient(app).post(
+            "/api/llm/chat/batch",
+            json={"requests": [{"message": "a"}, {"message": "b"}, {"message": "c"}], "concurrency": 1}
+        )
+    statuses = [result["status_code"] for result in response.json()["results"]]
+    assert statuses == [200, 429, 200]
+    assert response.json()["results"][1]["error"].startswith("Rate limit exceeded")
+
+def test_batch_reports_unexpected_item_errors(mock_openai):
+    """Test that an unexpected failure in one item becomes a 500 for that item only."""
+    decisions = iter([True, RuntimeError("boom"), True])
+    
+    def check(*args, **kwargs):
+        decision = next(decisions)
+        if isinstance(decision, Exception):
+            raise decision
+        return decision
+    
+    with patch.object(llm, "check_rate_limit", side_effect=check), \
+            patch.object(llm, "reconcile_usage"):
+        response = TestClient(app).post(
+            "/api/llm/chat/batch",
+            json={"requests": [{"message": "a"}, {"message": "b"}, {"message": "c"}], "concurrency": 1}
+        )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status_code"] for result in results] == [200, 500, 200]
+    assert "boom" in results[1]["error"]
+
+def test_batch_beyond_interactive_limit_completes(mock_openai):
+    """Test that batch items are charged to the batch quota, leaving /chat admitted."""
+    aioredis = pytest.importorskip("fakeredis.aioredis")
+    pytest.importorskip("lupa")
+    
+    items = MAX_REQUESTS_PER_WINDOW + 50
+    redis_client = aioredis.FakeRedis(decode_responses=True)
+    with patch.object(usage_tracking, "get_async_redis_client", return_value=redis_client), \
+            patch.object(usage_tracking, "get_lease_limiter", return_value=LeaseLimiter()), \
+            TestClient(app) as client:
+        # One event loop for every request, as the fake Redis connection is bound to it
+        response = client.post(
+            "/api/llm/chat/batch",
+            json={"requests": [{"message": f"plan day {i}"} for i in range(items)]}
+        )
+        assert response.status_code == 200
+        assert [result["status_code"] for result in response.json()["results"]] == [200] * items
+        assert client.post("/api/llm/chat", json={"message": "plan my week"}).status_code == 200
+
+def test_batch_streams_ndjson(llm_client):
+    """Test that streamed results are NDJSON lines tagged with their index."""
+    payload = {"requests": [{"message": f"plan day {i}"} for i in range(3)], "stream": True}
+    response = llm_client.post("/api/llm/chat/batch", json=payload)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+
+def test_batch_rejects_oversized_batches(llm_client):
+    """Test the maximum batch size."""
+    with patch.dict("os.environ", {"LLM_BATCH_MAX_ITEMS": "2"}):
+        response = llm_client.post(
+            "/api/llm/chat/batch",
+            json={"requests": [{"message": "a"}, {"message": "b"}, {"message": "c"}]}
+        )
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+"""
+Tests for token-budgeted context compaction.
+"""
+
+from datetime import datetime
+from app.services.context_compaction import compact_context, message_window
+
+NOW = datetime(2024, 3, 20, 9, 0)  # A Wednesday
+
+def make_task(title, due_date=None, completed=False, description=None):
+    """Build a task shaped like the mobile client's context entries."""
+    return {"title": title, "description": description, "due_date": due_date, "completed": completed}
+
+def titles(context):
+    """Get the titles of the tasks kept in a compacted context."""
+    return [task["title"] for task in context["current_tasks"]]
+
+def test_completed_tasks_dropped_unless_relevant():
+    """Test that completed tasks are only kept when asked about or named."""
+    context = {"current_tasks": [
+        make_task("Gym", "2024-03-20T18:00:00", completed=True),
+        make_task("Dentist", "2024-03-20T15:00:00")
+    ]}
+    compacted, _ = compact_context("what's on today?", context, now=NOW)
+    assert titles(compacted) == ["Dentist"]
+    
+    compacted, _ = compact_context("what did I finish today?", context, now=NOW)
+    assert titles(compacted) == ["Gym", "Dentist"]
+
+def test_tasks_far_outside_window_dropped():
+    """Test that distant dated tasks without keyword overlap are dropped."""
+    context = {"current_tasks": [
+        make_task("Old report", "2023-01-05T10:00:00"),
+        make_task("Standup", "2024-03-21T09:00:00"),
+        make_task("Taxes", "2023-04-10T10:00:00")
+    ]}
+    compacted, stats = compact_context("what's tomorrow look like", context, now=NOW)
+    assert titles(compacted) == ["Standup"]
+    assert compacted["omitted_tasks"] == 2
+    assert stats["tasks_before"] == 3 and stats["tasks_after"] == 1
+    
+    compacted, _ = compact_context("when did I file my taxes", context, now=NOW)
+    assert "Taxes" in titles(compacted)
+
+def test_null_fields_removed():
+    """Test that empty fields are stripped from kept tasks."""
+    context = {"current_tasks": [make_task("Groceries")], "calendar_events": []}
+    compacted, _ = compact_context("buy groceries", context, now=NOW)
+    assert compacted == {"current_tasks": [{"title": "Groceries", "completed": False}]}
+
+def test_token_budget_keeps_most_relevant():
+    """Test that the budget is filled in relevance order."""
+    tasks = [make_task(f"Filler task {i}", "2024-03-25T10:00:00", description="x" * 200) for i in range(50)]
+    tasks.append(make_task("Call mom", "2024-03-28T10:00:00"))
+    compacted, stats = compact_context("call mom", {"current_tasks": tasks}, token_budget=200, now=NOW)
+    assert titles(compacted)[-1] == "Call mom"
+    assert stats["context_tokens_after"] <= 200 < stats["context_tokens_before"]
+
+def test_message_window_weekday():
+    """Test that weekday names resolve to the next matching day."""
+    start, end = message_window("move that to friday", NOW)
+    assert start == datetime(2024, 3, 22)
+    assert (end - start).days == 1
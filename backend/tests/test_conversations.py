@@ -0,0 +1,88 @@
+"""
+Tests for multi-turn conversation sessions.
+"""
+
+import asyncio
+import json
+from unittest.mock import patch
+from app.core.conversations import fold_history, summarize_turn
+from app.core.metrics import metrics
+from tests.conftest import make_completion
+
+def turn(role, content):
+    return {"role": role, "content": content}
+
+def test_summarize_turn():
+    """Test that turns reduce to their first sentence or suggested actions."""
+    assert summarize_turn(turn("user", "Plan my week. I have a lot going on.")) == "User: Plan my week."
+    reply = 'Sure.\nSUGGESTION: [{"action": "create_task", "parameters": {"title": "Gym", "start_date": "2024-03-22T18:00:00"}}]'
+    assert summarize_turn(turn("assistant", reply)) == "Assistant suggested: create_task Gym 2024-03-22T18:00:00"
+
+def test_fold_history_keeps_budget():
+    """Test that old turns fold into the summary once over budget."""
+    turns = [turn("user" if i % 2 == 0 else "assistant", f"Message number {i}. " + "word " * 50) for i in range(10)]
+    summary, remaining, folded = fold_history("", turns, token_budget=150, summary_budget=1000)
+    assert folded == 8 and remaining == turns[8:]
+    assert summary.splitlines()[0] == "User: Message number 0."
+    
+    # The summary is trimmed from the oldest line
+    summary, _, _ = fold_history("", turns, token_budget=150, summary_budget=20)
+    assert "Message number 0" not in summary and "Message number 7" in summary
+
+def test_session_memory_capped(sessions):
+    """Test that a session never exceeds its byte cap."""
+    async def run():
+        for i in range(10):
+            await sessions.append("client", "s1", "x" * 400, "y" * 400)
+        return await sessions.load("client", "s1")
+    
+    sessions.max_bytes = 2000
+    summary, turns = asyncio.run(run())
+    assert len(json.dumps({"summary": summary, "turns": turns})) <= 2000
+    assert turns[-1] == turn("assistant", "y" * 400)
+
+def test_sessions_evicted_lru(sessions):
+    """Test that the least recently used sessions are evicted past the limit."""
+    async def run():
+        for session_id in ["a", "b", "a", "c"]:
+            await sessions.append("client", session_id, "hi", "hello")
+        return [await sessions.load("client", session_id) for session_id in ["a", "b", "c"]]
+    
+    metrics.reset()
+    sessions.max_sessions = 2
+    with patch("app.core.conversations.time.time", side_effect=[1, 1, 2, 2, 3, 3, 4, 4]):
+        a, b, c = asyncio.run(run())
+    assert b == ("", [])
+    assert a[1] and c[1]
+    assert metrics.get("llm_session_evictions_total") == 1
+
+def test_chat_follow_up_sees_earlier_turns(llm_client, mock_openai):
+    """Test that a session's earlier exchange is sent with the follow-up."""
+    first = llm_client.post("/api/llm/chat", json={"message": "add dentist", "session_id": "s1"})
+    assert first.headers["X-Session-Id"] == "s1"
+    mock_openai.client.chat.completions.create.return_value = make_completion("Moved.")
+    llm_client.post("/api/llm/chat", json={"message": "move that to Friday", "session_id": "s1"})
+    
+    messages = mock_openai.client.chat.completions.create.call_args.kwargs["messages"]
+    assert [message["role"] for message in messages] == ["system", "user", "assistant", "user"]
+    assert messages[1]["content"] == "add dentist"
+    assert '"Dentist"' in messages[2]["content"]
+    assert messages[3]["content"] == "move that to Friday"
+
+def test_chat_without_session_is_stateless(llm_client, mock_openai):
+    """Test that requests without a session id get a fresh two-message prompt."""
+    llm_client.post("/api/llm/chat", json={"message": "add dentist"})
+    llm_client.post("/api/llm/chat", json={"message": "move that to Friday"})
+    messages = mock_openai.client.chat.completions.create.call_args.kwargs["messages"]
+    assert len(messages) == 2
+
+def test_chat_stream_records_session_turn(llm_client, mock_openai, sessions):
+    """Test that a completed stream saves its exchange to the session."""
+    from tests.test_llm import FakeStream
+    
+    mock_openai.client.chat.completions.create.return_value = FakeStream(["Sure, ", "done."])
+    response = llm_client.post("/api/llm/chat/stream", json={"message": "add dentist", "session_id": "s1"})
+    assert response.status_code == 200
+    assert asyncio.run(sessions.load("testclient", "s1"))[1] == [
+        turn("user", "add dentist"), turn("assistant", "Sure, done.")
+    ]
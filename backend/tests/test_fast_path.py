@@ -0,0 +1,64 @@
+"""
+Tests for the local fast-path command parser.
+"""
+
+from datetime import datetime
+from app.services.fast_path import confirmation_text, parse_command
+
+NOW = datetime(2024, 3, 20, 9, 0)  # A Wednesday
+
+def test_simple_command_parsed():
+    """Test that a short create command becomes one create_task suggestion."""
+    action = parse_command("add dentist tomorrow at 3pm for an hour", now=NOW)
+    assert action == {
+        "action": "create_task",
+        "parameters": {
+            "title": "Dentist",
+            "start_date": "2024-03-21T15:00:00",
+            "end_date": "2024-03-21T16:00:00"
+        }
+    }
+
+def test_date_and_time_forms():
+    """Test weekday, month-day, ISO dates, ranges and durations."""
+    params = parse_command("Schedule lunch with Sam on friday from noon to 1:30pm", now=NOW)["parameters"]
+    assert params == {"title": "Lunch with Sam", "start_date": "2024-03-22T12:00:00",
+                      "end_date": "2024-03-22T13:30:00"}
+    
+    params = parse_command("book haircut march 22nd at 10:30am for 45 minutes", now=NOW)["parameters"]
+    assert (params["start_date"], params["end_date"]) == ("2024-03-22T10:30:00", "2024-03-22T11:15:00")
+    
+    params = parse_command("add gym 2024-03-25 6-7pm", now=NOW)["parameters"]
+    assert (params["start_date"], params["end_date"]) == ("2024-03-25T18:00:00", "2024-03-25T19:00:00")
+    
+    params = parse_command("add standup today at 17:45", now=NOW)["parameters"]
+    assert params["end_date"] == "2024-03-20T18:45:00"  # Default one hour
+
+def test_month_day_in_past_rolls_to_next_year():
+    """Test that an already-passed month and day means next year."""
+    params = parse_command("add taxes january 5 at 9am", now=NOW)["parameters"]
+    assert params["start_date"] == "2025-01-05T09:00:00"
+
+def test_ambiguous_commands_fall_through():
+    """Test that anything the parser is not sure about is left to the LLM."""
+    for message in [
+        "plan my week",
+        "add dentist tomorrow at 3",  # am or pm?
+        "add dentist tomorrow",  # No time
+        "add gym every monday at 6pm",
+        "add dentist tomorrow at 3pm and gym at 6pm",
+        "add report tomorrow afternoon",
+        "can you add dentist tomorrow at 3pm?",
+        "move dentist to tomorrow at 3pm",
+        "add study tomorrow at 3pm for 2 hours after lunch",
+        "add dentist february 30 at 3pm",
+        "add gym tomorrow 7-6pm"
+    ]:
+        assert parse_command(message, now=NOW) is None, message
+
+def test_confirmation_text():
+    """Test the reply text for a fast-path suggestion."""
+    action = parse_command("add dentist tomorrow at 3pm", now=NOW)
+    assert confirmation_text(action["parameters"]) == (
+        'I\'ll add "Dentist" on Thursday, March 21 from 3:00 PM to 4:00 PM.'
+    )
@@ -0,0 +1,69 @@
+"""
+Tests for the free/busy index and schedule summaries.
+"""
+
+from datetime import datetime
+from app.core.metrics import metrics
+from app.services.free_busy import BusyIndex, apply_schedule_summary, find_conflicts
+
+NOW = datetime(2024, 3, 20, 9, 0)
+TASKS = [
+    {"title": "Standup", "start_date": "2024-03-20T10:00:00", "end_date": "2024-03-20T10:30:00"},
+    {"title": "Review", "start_date": "2024-03-20T10:15:00", "end_date": "2024-03-20T11:00:00"},
+    {"title": "Lunch", "start_date": "2024-03-20T12:00:00"},
+    {"title": "Taxes", "due_date": "2024-03-20T17:00:00"},
+    {"title": "Done", "start_date": "2024-03-20T15:00:00", "completed": True}
+]
+
+def test_index_merges_and_finds_overlaps():
+    """Test that overlapping tasks merge and overlap checks respect [start, end)."""
+    index = BusyIndex.from_tasks(TASKS)
+    assert len(index) == 2
+    assert index.overlaps(datetime(2024, 3, 20, 10, 45), datetime(2024, 3, 20, 11, 30))
+    assert not index.overlaps(datetime(2024, 3, 20, 11, 0), datetime(2024, 3, 20, 12, 0))
+    assert not index.overlaps(datetime(2024, 3, 20, 15, 0), datetime(2024, 3, 20, 16, 0))
+
+def test_free_slots_within_working_hours():
+    """Test that free slots fill the gaps between busy blocks inside working hours."""
+    index = BusyIndex.from_tasks(TASKS)
+    slots = index.free_slots(NOW, datetime(2024, 3, 21))
+    assert slots == [
+        (NOW, datetime(2024, 3, 20, 10, 0)),
+        (datetime(2024, 3, 20, 11, 0), datetime(2024, 3, 20, 12, 0)),
+        (datetime(2024, 3, 20, 13, 0), datetime(2024, 3, 20, 20, 0))
+    ]
+
+def test_summary_replaces_unmentioned_tasks():
+    """Test that in-window tasks become busy blocks unless the message names them."""
+    index = BusyIndex.from_tasks(TASKS)
+    context = {"current_tasks": TASKS}
+    summarized, replaced = apply_schedule_summary(
+        "move my lunch later", context, index, (datetime(2024, 3, 20), datetime(2024, 3, 21)), NOW
+    )
+    assert replaced == 2
+    assert [task["title"] for task in summarized["current_tasks"]] == ["Lunch", "Taxes", "Done"]
+    assert summarized["schedule"]["busy"] == ["2024-03-20 10:00-11:00", "2024-03-20 12:00-13:00"]
+    assert summarized["schedule"]["free"][0] == "2024-03-20 09:00-10:00"
+    assert context["current_tasks"] is TASKS
+
+def test_find_conflicts():
+    """Test that only timed create_task suggestions are checked."""
+    index = BusyIndex.from_tasks(TASKS)
+    suggestions = [
+        {"action": "create_task", "parameters": {"title": "Gym", "start_date": "2024-03-20T12:30:00"}},
+        {"action": "update_task", "parameters": {"start_date": "2024-03-20T12:30:00"}},
+        {"action": "create_task", "parameters": {"title": "Read", "start_date": "2024-03-20T14:00:00"}},
+        {"action": "create_task", "parameters": {"title": "Call mom"}}
+    ]
+    assert find_conflicts(suggestions, index) == [0]
+
+def test_chat_reports_conflicts(llm_client, mock_openai):
+    """Test that a suggestion overlapping an existing task is listed in metadata."""
+    metrics.reset()
+    context = {"current_tasks": [
+        {"title": "Meeting", "start_date": "2024-03-20T14:30:00", "end_date": "2024-03-20T15:30:00"}
+    ]}
+    response = llm_client.post("/api/llm/chat", json={"message": "add a dentist visit", "context": context})
+    assert response.status_code == 200
+    assert response.json()["metadata"]["conflicts"] == [0]
+    assert metrics.get("llm_suggestion_conflicts_total") == 1
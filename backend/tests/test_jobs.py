@@ -0,0 +1,145 @@
+"""
+Tests for background chat jobs.
+"""
+
+import asyncio
+import json
+import time
+import pytest
+import redis
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api import llm
+from app.core import jobs
+from app.core.jobs import JobQueue, JobStore, get_job_queue
+from app.core.metrics import metrics
+from tests.conftest import FakeAsyncRedis
+
+@pytest.fixture
+def job_queue():
+    """Use a job queue whose store is backed by an in-memory fake Redis."""
+    with patch.object(jobs, "get_async_redis_client", return_value=FakeAsyncRedis()):
+        queue = JobQueue(JobStore())
+        app.dependency_overrides[get_job_queue] = lambda: queue
+        yield queue
+
+@pytest.fixture
+def jobs_client(mock_openai, job_queue):
+    """Test client kept open so background workers share its event loop."""
+    with patch.object(llm, "check_rate_limit", return_value=True), \
+            patch.object(llm, "reconcile_usage"), \
+            TestClient(app) as client:
+        yield client
+        client.portal.call(job_queue.stop)
+
+def wait_for_job(client, job_id, timeout=5):
+    """Poll a job until it finishes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/llm/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("Job did not finish")
+
+def test_job_returns_id_then_result(jobs_client, mock_openai):
+    """Test that a job is accepted immediately and its result can be polled."""
+    metrics.reset()
+    response = jobs_client.post("/api/llm/jobs", json={"message": "spread this project over two weeks"})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert response.headers["Location"] == f"/api/llm/jobs/{job['job_id']}"
+    
+    job = wait_for_job(jobs_client, job["job_id"])
+    assert job["status"] == "succeeded" and job["status_code"] == 200
+    assert job["response"]["suggested_actions"][0]["parameters"]["title"] == "Dentist"
+    assert job["started_at"] >= job["created_at"]
+    assert metrics.get("llm_jobs_total", status="succeeded") == 1
+    assert metrics.get("llm_job_wait_seconds_count") == 1
+    assert metrics.get("llm_job_run_seconds_count") == 1
+
+def test_job_failure_recorded(jobs_client):
+    """Test that pipeline errors end up in the job record."""
+    with patch.object(llm, "check_rate_limit", return_value=False):
+        job_id = jobs_client.post("/api/llm/jobs", json={"message": "plan my week"}).json()["job_id"]
+        job = wait_for_job(jobs_client, job_id)
+    assert job["status"] == "failed" and job["status_code"] == 429
+
+def test_job_events_stream(jobs_client):
+    """Test that the events stream ends with the finished job."""
+    job_id = jobs_client.post("/api/llm/jobs", json={"message": "plan my week"}).json()["job_id"]
+    with jobs_client.stream("GET", f"/api/llm/jobs/{job_id}/events") as response:
+        body = "".join(response.iter_text())
+    frames = [frame for frame in body.split("\n\n") if frame]
+    assert frames[-1].startswith("event: done")
+    assert json.loads(frames[-1].split("data: ", 1)[1])["status"] == "succeeded"
+
+def test_unknown_job_404(jobs_client):
+    """Test that unknown or expired jobs return 404."""
+    assert jobs_client.get("/api/llm/jobs/missing").status_code == 404
+
+def test_queue_full_rejected(job_queue):
+    """Test that submissions beyond the queue size are rejected."""
+    job_queue.workers = 0
+    job_queue.max_queued = 1
+    
+    async def submit_two():
+        async def run():
+            return 200, None, None
+        await job_queue.submit("a", run)
+        with pytest.raises(jobs.QueueFullError):
+            await job_queue.submit("b", run)
+        assert job_queue.depth() == 1
+    asyncio.run(submit_two())
+
+def test_job_events_end_when_record_is_lost(job_queue):
+    """Test that the events stream ends with `lost` once the job record is gone."""
+    from app.api.jobs import _job_events
+    
+    async def collect():
+        return [frame async for frame in _job_events(job_queue, {"job_id": "gone", "status": "queued"})]
+    
+    frames = asyncio.run(collect())
+    assert frames[0].startswith("event: status")
+    assert frames[-1].startswith("event: lost")
+
+def test_stop_fails_unfinished_jobs(job_queue):
+    """Test that shutdown marks queued and running jobs as failed."""
+    job_queue.workers = 1
+    
+    async def scenario():
+        started = asyncio.Event()
+        
+        async def run():
+            started.set()
+            await asyncio.sleep(10)
+            return 200, None, None
+        await job_queue.submit("running", run)
+        await job_queue.submit("queued", run)
+        await started.wait()
+        await job_queue.stop()
+        return [await job_queue.store.get(job_id) for job_id in ("running", "queued")]
+    
+    for job in asyncio.run(scenario()):
+        assert job["status"] == "failed" and job["status_code"] == 503
+    assert job_queue.depth() == 0
+
+def test_local_copies_expire_with_redis_record(job_queue):
+    """Test that the in-process copy is dropped once the record's TTL lapses."""
+    store = job_queue.store
+    
+    async def scenario():
+        with patch.object(jobs.time, "monotonic", return_value=0):
+            await store.save({"job_id": "old", "status": "queued"})
+        with patch.object(jobs.time, "monotonic", return_value=store.ttl):
+            await store.save({"job_id": "new", "status": "queued"})
+            assert list(store._local) == ["new"]
+            
+            await store.save({"job_id": "old", "status": "queued"})
+        with patch.object(jobs.time, "monotonic", return_value=2 * store.ttl), \
+                patch.object(jobs, "get_async_redis_client", side_effect=redis.ConnectionError("down")):
+            assert await store.get("old") is None
+        assert list(store._local) == ["new"]
+    asyncio.run(scenario())
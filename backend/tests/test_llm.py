@@ -0,0 +1,295 @@
+"""
+Tests for the LLM chat endpoints.
+"""
+
+import asyncio
+import json
+import httpx
+import redis
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api import llm
+from app.api.llm import create_chat_prompt
+from app.core.metrics import metrics
+from app.core.singleflight import SingleFlight, get_singleflight
+from tests.conftest import SUGGESTION_REPLY, make_completion
+
+class FakeStream:
+    """Async iterator shaped like an OpenAI chat completion stream."""
+    def __init__(self, pieces, total_tokens=42):
+        self.chunks = [
+            SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+            for piece in pieces
+        ]
+        usage = SimpleNamespace(prompt_tokens=total_tokens - 2, completion_tokens=2, total_tokens=total_tokens)
+        self.chunks.append(SimpleNamespace(usage=usage, choices=[]))
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+class StalledStream(FakeStream):
+    """Stream that sends its pieces and then hangs; closing it takes a round trip."""
+    async def _iterate(self):
+        for chunk in self.chunks[:-1]:
+            yield chunk
+        await asyncio.Event().wait()
+
+    async def close(self):
+        await asyncio.sleep(0)
+        self.closed = True
+
+async def disconnect_during_stream(payload: dict) -> list:
+    """
+    Call /chat/stream over raw ASGI and send http.disconnect once the first
+    body frame arrives; returns the messages the app sent.
+    """
+    sent, first_frame = [], asyncio.Event()
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/llm/chat/stream", "raw_path": b"/api/llm/chat/stream",
+        "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("testclient", 50000), "server": ("testserver", 80)
+    }
+    requested = False
+    
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await first_frame.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        sent.append(message)
+        if message["type"] == "http.response.body" and message.get("body"):
+            first_frame.set()
+    
+    await asyncio.wait_for(app(scope, receive, send), 5)
+    return sent
+
+def make_tool_call(arguments: str):
+    """Build a suggest_tasks tool call with the given JSON arguments."""
+    return SimpleNamespace(function=SimpleNamespace(name="suggest_tasks", arguments=arguments))
+
+def test_create_chat_prompt_includes_context():
+    """Test that context is serialized into the user message."""
+    messages = create_chat_prompt("plan my day", {"current_tasks": [{"title": "Gym"}]})
+    assert messages[0]["role"] == "system"
+    assert messages[1]["content"].startswith("plan my day")
+    assert '"Gym"' in messages[1]["content"]
+
+def test_chat_awaits_async_client(llm_client, mock_openai):
+    """Test that the chat endpoint awaits the async completion call."""
+    response = llm_client.post("/api/llm/chat", json={"message": "add dentist"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["suggested_actions"][0]["parameters"]["title"] == "Dentist"
+    mock_openai.client.chat.completions.create.assert_awaited_once()
+    llm_client.reconcile_usage.assert_called_once_with(llm_client.check_rate_limit.return_value, 42)
+
+def test_chat_serves_repeated_prompt_from_cache(llm_client, mock_openai):
+    """Test that an identical prompt is answered without calling OpenAI again."""
+    first = llm_client.post("/api/llm/chat", json={"message": "plan my week"})
+    second = llm_client.post("/api/llm/chat", json={"message": "plan my  week"})
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+    mock_openai.client.chat.completions.create.assert_awaited_once()
+
+def test_chat_cache_bypass_header(llm_client, mock_openai):
+    """Test that the bypass header forces a fresh completion."""
+    llm_client.post("/api/llm/chat", json={"message": "plan my week"})
+    response = llm_client.post(
+        "/api/llm/chat",
+        json={"message": "plan my week"},
+        headers={"X-Cache-Bypass": "1"}
+    )
+    assert response.headers["X-Cache"] == "BYPASS"
+    assert mock_openai.client.chat.completions.create.await_count == 2
+
+def test_chat_coalesces_identical_concurrent_requests(mock_openai):
+    """Test that concurrent identical prompts share one upstream call."""
+    async def slow_create(**kwargs):
+        await asyncio.sleep(0.05)
+        return make_completion(SUGGESTION_REPLY)
+    
+    mock_openai.client.chat.completions.create.side_effect = slow_create
+    
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/api/llm/chat", json={"message": "plan my week"}) for _ in range(3)
+            ))
+    
+    flight = SingleFlight()
+    app.dependency_overrides[get_singleflight] = lambda: flight
+    with patch.object(llm, "check_rate_limit", return_value=True), \
+            patch.object(llm, "reconcile_usage") as reconcile_usage:
+        responses = asyncio.run(scenario())
+    
+    assert all(response.status_code == 200 for response in responses)
+    assert sorted(r.headers["X-Singleflight"] for r in responses) == ["LEADER", "SHARED", "SHARED"]
+    mock_openai.client.chat.completions.create.assert_awaited_once()
+    # Only the leader is billed; followers get their whole reservation back
+    assert sorted(call.args[1] for call in reconcile_usage.call_args_list) == [0, 0, 42]
+
+def test_chat_reports_prompt_tokens_before_and_after_compaction(llm_client):
+    """Test that compaction savings are reported in the response metadata."""
+    tasks = [{"title": f"Old task {i}", "completed": True, "description": None} for i in range(100)]
+    response = llm_client.post(
+        "/api/llm/chat",
+        json={"message": "plan my week", "context": {"current_tasks": tasks}}
+    )
+    metadata = response.json()["metadata"]
+    assert metadata["context_tasks_before"] == 100
+    assert metadata["context_tasks_after"] == 0
+    assert metadata["prompt_tokens_after"] < metadata["prompt_tokens_before"]
+
+def test_chat_admission_estimate_covers_full_prompt(llm_client):
+    """Test that rate-limit admission counts the prompt and completion allowance."""
+    llm_client.post("/api/llm/chat", json={"message": "hi"})
+    estimated = llm_client.check_rate_limit.call_args.kwargs["estimated_tokens"]
+    system_tokens = llm.count_tokens(create_chat_prompt("hi")[0]["content"])
+    assert estimated > system_tokens + 500
+
+def test_chat_fast_path_skips_openai(llm_client, mock_openai):
+    """Test that simple commands are answered locally without OpenAI or rate limiting."""
+    metrics.reset()
+    response = llm_client.post("/api/llm/chat", json={"message": "add dentist tomorrow at 3pm"})
+    assert response.status_code == 200
+    assert response.headers["X-Fast-Path"] == "HIT"
+    assert float(response.headers["X-Fast-Path-Ms"]) >= 0
+    data = response.json()
+    assert data["suggested_actions"][0]["parameters"]["title"] == "Dentist"
+    assert data["metadata"] == {"fast_path": True}
+    mock_openai.client.chat.completions.create.assert_not_called()
+    llm_client.check_rate_limit.assert_not_called()
+    
+    response = llm_client.post("/api/llm/chat", json={"message": "plan my week"})
+    assert response.headers["X-Fast-Path"] == "MISS"
+    mock_openai.client.chat.completions.create.assert_awaited_once()
+    assert metrics.get("llm_fast_path_total", outcome="hit") == 1
+    assert metrics.get("llm_fast_path_total", outcome="miss") == 1
+
+def test_chat_uses_structured_suggestions(llm_client, mock_openai):
+    """Test that suggest_tasks function calls are parsed against the schema."""
+    arguments = json.dumps({"suggestions": [{
+        "action": "create_task",
+        "parameters": {"title": "Standup", "start_date": "2024-03-21T09:00:00"}
+    }]})
+    mock_openai.client.chat.completions.create.return_value = make_completion(
+        None, tool_calls=[make_tool_call(arguments)]
+    )
+    response = llm_client.post("/api/llm/chat", json={"message": "standup tomorrow 9am"})
+    data = response.json()
+    assert data["suggested_actions"] == [{
+        "action": "create_task",
+        "parameters": {"title": "Standup", "start_date": "2024-03-21T09:00:00"}
+    }]
+    assert "Standup" in data["response"]
+    kwargs = mock_openai.client.chat.completions.create.call_args.kwargs
+    assert kwargs["tools"][0]["function"]["name"] == "suggest_tasks"
+
+def test_parse_suggestions_falls_back_to_text_extraction():
+    """Test that fenced JSON wrapped in prose is still recovered."""
+    content = (
+        'Sure! SUGGESTION:\n```json\n[{"action": "delete_task", "parameters": {"title": "Gym"}}]\n```\n'
+        "Let me know if that works."
+    )
+    suggestions = llm.parse_suggestions(content)
+    assert [s.parameters["title"] for s in suggestions] == ["Gym"]
+
+def test_parse_failures_are_counted():
+    """Test that unusable suggestions are recorded as parse failures."""
+    metrics.reset()
+    llm.parse_suggestions(None, [make_tool_call('{"suggestions": [{"action": "fly"}]}')])
+    llm.parse_suggestions("SUGGESTION: [not json]")
+    assert metrics.get("llm_suggestion_parse_total", method="tool_fallback", outcome="failed") == 1
+    assert metrics.get("llm_suggestion_parse_total", method="text", outcome="failed") == 1
+    assert metrics.get("llm_suggestion_parse_seconds_count", method="text") == 1
+
+def test_chat_rate_limited(mock_openai):
+    """Test that the local rate limiter rejects requests with a 429."""
+    with patch.object(llm, "check_rate_limit", return_value=False):
+        response = TestClient(app).post("/api/llm/chat", json={"message": "hi"})
+    assert response.status_code == 429
+
+def test_openai_connection_endpoint(llm_client, mock_openai):
+    """Test the connectivity check uses the async client."""
+    response = llm_client.get("/api/llm/test")
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+    mock_openai.client.chat.completions.create.assert_awaited_once()
+
+def test_chat_stream_emits_tokens_and_suggestions(llm_client, mock_openai):
+    """Test that the SSE endpoint relays tokens, suggestions and usage."""
+    pieces = [SUGGESTION_REPLY[i:i + 10] for i in range(0, len(SUGGESTION_REPLY), 10)]
+    stream = FakeStream(pieces)
+    mock_openai.client.chat.completions.create.return_value = stream
+    
+    response = llm_client.post("/api/llm/chat/stream", json={"message": "add dentist"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events.count("token") == len(pieces)
+    assert events.count("suggestion") == 1
+    assert events[-1] == "done"
+    assert stream.closed
+    llm_client.reconcile_usage.assert_called_once_with(llm_client.check_rate_limit.return_value, 42)
+
+def test_chat_stream_disconnect_releases_scheduler_slot(llm_client, mock_openai):
+    """Test that a client hanging up mid-stream gives its scheduler slot back."""
+    mock_openai.client.chat.completions.create.return_value = StalledStream(["Sure, ", "let me"])
+    
+    async def scenario():
+        sent = await disconnect_during_stream({"message": "add dentist"})
+        # Checked before asyncio.run finalizes the abandoned generator
+        return sent, mock_openai.scheduler.in_flight
+    
+    sent, in_flight = asyncio.run(scenario())
+    assert sent[0]["status"] == 200
+    assert in_flight == 0
+
+def test_chat_stream_disconnect_still_reconciles_usage(llm_client, mock_openai):
+    """Test that usage is accounted for and the upstream closed when the client hangs up."""
+    stream = StalledStream(["Sure, ", "let me"])
+    mock_openai.client.chat.completions.create.return_value = stream
+    
+    async def scenario():
+        await disconnect_during_stream({"message": "add dentist"})
+        return stream.closed, llm_client.reconcile_usage.await_count
+    
+    closed, reconciled = asyncio.run(scenario())
+    assert closed
+    assert reconciled == 1
+    reservation, tokens_used = llm_client.reconcile_usage.call_args.args
+    assert reservation == llm_client.check_rate_limit.return_value
+    assert tokens_used > 0
+
+def test_chat_stream_refunds_when_scheduler_times_out(llm_client, mock_openai):
+    """Test that a stream that never got a scheduler slot refunds its reservation."""
+    mock_openai.scheduler.acquire = AsyncMock(side_effect=asyncio.TimeoutError)
+    response = llm_client.post("/api/llm/chat/stream", json={"message": "add dentist"})
+    assert response.status_code == 504
+    llm_client.reconcile_usage.assert_called_once_with(llm_client.check_rate_limit.return_value, 0)
+    mock_openai.client.chat.completions.create.assert_not_awaited()
+
+def test_chat_survives_redis_outage_when_reconciling(llm_client, mock_openai):
+    """Test that failing to settle usage in Redis does not fail the request."""
+    llm_client.reconcile_usage.side_effect = redis.ConnectionError("down")
+    response = llm_client.post("/api/llm/chat", json={"message": "add dentist"})
+    assert response.status_code == 200
+    llm_client.reconcile_usage.assert_called_once()
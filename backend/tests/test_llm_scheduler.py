@@ -0,0 +1,99 @@
+"""
+Tests for the global outbound LLM scheduler.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.core.llm_scheduler import BATCH, INTERACTIVE, OutboundScheduler
+
+def make_scheduler(rpm=6000, tpm=1_000_000, concurrency=1, timeout=30):
+    settings = {
+        "LLM_GLOBAL_RPM": str(rpm),
+        "LLM_GLOBAL_TPM": str(tpm),
+        "LLM_GLOBAL_CONCURRENCY": str(concurrency),
+        "LLM_SCHEDULER_TIMEOUT": str(timeout)
+    }
+    with patch.dict("os.environ", settings):
+        return OutboundScheduler()
+
+async def run_calls(scheduler, calls):
+    """Acquire grants for (client_id, priority) calls queued behind a held slot; return grant order."""
+    order = []
+    blocker = await scheduler.acquire("blocker", 0)
+    
+    async def call(client_id, priority):
+        grant = await scheduler.acquire(client_id, 10, priority)
+        order.append(client_id)
+        await asyncio.sleep(0)
+        grant.release(10)
+    
+    tasks = [asyncio.create_task(call(client_id, priority)) for client_id, priority in calls]
+    await asyncio.sleep(0)
+    blocker.release(0)
+    await asyncio.gather(*tasks)
+    return order
+
+def test_round_robin_across_clients():
+    """Test that a heavy client cannot starve others within a priority."""
+    scheduler = make_scheduler()
+    calls = [("heavy", BATCH)] * 3 + [("light", BATCH)]
+    order = asyncio.run(run_calls(scheduler, calls))
+    assert order == ["heavy", "light", "heavy", "heavy"]
+
+def test_interactive_before_batch():
+    """Test that interactive calls are granted before queued batch work."""
+    scheduler = make_scheduler()
+    calls = [("nightly", BATCH)] * 3 + [("user", INTERACTIVE)]
+    order = asyncio.run(run_calls(scheduler, calls))
+    assert order[0] == "user"
+
+def test_token_budget_delays_calls():
+    """Test that calls wait for the token bucket to refill."""
+    async def scenario():
+        scheduler = make_scheduler(tpm=6000, concurrency=10)  # 100 tokens per second
+        first = await scheduler.acquire("a", 6000)
+        second = await scheduler.acquire("b", 20)
+        first.release(6000)
+        second.release(20)
+        return second.wait_seconds
+    assert 0.15 <= asyncio.run(scenario()) < 1
+
+def test_overestimate_refunded():
+    """Test that unused reserved tokens return to the budget on release."""
+    async def scenario():
+        scheduler = make_scheduler(tpm=1000, concurrency=10)
+        grant = await scheduler.acquire("a", 900)
+        grant.release(100)
+        return scheduler.tokens.level
+    assert asyncio.run(scenario()) >= 900
+
+def test_cancelled_waiter_leaves_queue():
+    """Test that a caller giving up is removed from the queue."""
+    async def scenario():
+        scheduler = make_scheduler()
+        held = await scheduler.acquire("a", 0)
+        waiting = asyncio.create_task(scheduler.acquire("b", 0))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        held.release(0)
+        return scheduler.queue_depth(INTERACTIVE), scheduler.in_flight
+    assert asyncio.run(scenario()) == (0, 0)
+
+def test_acquire_times_out():
+    """Test that a call gives up after the timeout and leaves the queue."""
+    async def scenario():
+        scheduler = make_scheduler(timeout=0.01)
+        held = await scheduler.acquire("a", 0)
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.acquire("b", 0)
+        held.release(0)
+        return scheduler.queue_depth(INTERACTIVE), scheduler.in_flight
+    assert asyncio.run(scenario()) == (0, 0)
+
+def test_chat_reports_queue_wait(llm_client, mock_openai):
+    """Test that /chat reports its scheduler wait and releases its slot."""
+    response = llm_client.post("/api/llm/chat", json={"message": "plan my week"})
+    assert float(response.headers["X-Queue-Wait-Ms"]) >= 0
+    assert mock_openai.scheduler.in_flight == 0
@@ -0,0 +1,46 @@
+"""
+Tests for the metrics registry and the Prometheus /metrics endpoint.
+"""
+
+from app.core.metrics import MetricsRegistry, metrics
+
+def test_render_prometheus():
+    """Test counters, gauges and cumulative histogram buckets in the exposition text."""
+    registry = MetricsRegistry()
+    registry.incr("llm_tokens_total", 10, model="gpt-3.5-turbo", direction="in")
+    registry.set("llm_scheduler_in_flight", 3)
+    registry.observe("llm_stage_seconds", 0.003, stage="prompt")
+    registry.observe("llm_stage_seconds", 100, stage="prompt")
+    lines = registry.render_prometheus().splitlines()
+    assert "# TYPE llm_tokens_total counter" in lines
+    assert 'llm_tokens_total{direction="in",model="gpt-3.5-turbo"} 10' in lines
+    assert "# TYPE llm_scheduler_in_flight gauge" in lines
+    assert "# TYPE llm_stage_seconds histogram" in lines
+    assert 'llm_stage_seconds_bucket{stage="prompt",le="0.0025"} 0' in lines
+    assert 'llm_stage_seconds_bucket{stage="prompt",le="0.005"} 1' in lines
+    assert 'llm_stage_seconds_bucket{stage="prompt",le="+Inf"} 2' in lines
+    assert 'llm_stage_seconds_count{stage="prompt"} 2' in lines
+    assert not any(line.startswith("# TYPE llm_stage_seconds_count") for line in lines)
+
+def test_label_values_are_escaped():
+    """Test that quotes, backslashes and newlines in label values are escaped."""
+    registry = MetricsRegistry()
+    registry.incr("events_total", reason='bad "value"\\\n')
+    assert 'events_total{reason="bad \\"value\\"\\\\\\n"} 1' in registry.render_prometheus()
+
+def test_metrics_endpoint_after_chat(llm_client, mock_openai):
+    """Test that a chat records every stage, tokens per model and local 429s."""
+    metrics.reset()
+    assert llm_client.post("/api/llm/chat", json={"message": "what should I do today?"}).status_code == 200
+    llm_client.check_rate_limit.return_value = False
+    assert llm_client.post("/api/llm/chat", json={"message": "what else?"}).status_code == 429
+
+    response = llm_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for stage in ("rate_limit", "prompt", "openai", "parse", "usage"):
+        assert f'llm_stage_seconds_count{{stage="{stage}"}}' in response.text
+    model = mock_openai.router.routes["standard"].model
+    assert metrics.get("llm_tokens_total", model=model, direction="in") == 32
+    assert metrics.get("llm_tokens_total", model=model, direction="out") == 10
+    assert metrics.get("llm_rate_limited_total", cause="local") == 1
@@ -0,0 +1,43 @@
+"""
+Tests for complexity-based model routing.
+"""
+
+from unittest.mock import patch
+from app.core.metrics import metrics
+from app.services.model_routing import ModelRouter, classify_request
+
+def test_classify_by_intent():
+    """Test that single-task edits are simple and planning is complex."""
+    assert classify_request("delete my gym task", None) == ("simple", "intent")
+    assert classify_request("plan a 3-week study schedule", None) == ("complex", "intent")
+    assert classify_request("what's on tomorrow", None) == ("standard", "default")
+
+def test_classify_by_length_and_context():
+    """Test that long messages and large contexts route to the complex tier."""
+    assert classify_request("word " * 80, None) == ("complex", "length")
+    tasks = [{"title": f"Task {i}"} for i in range(40)]
+    assert classify_request("delete my gym task", {"current_tasks": tasks}) == ("complex", "context")
+
+def test_routing_table_override():
+    """Test that LLM_ROUTES overrides individual fields of the table."""
+    with patch.dict("os.environ", {"LLM_ROUTES": '{"complex": {"model": "gpt-4o"}, "simple": {"max_tokens": 100}}'}):
+        router = ModelRouter()
+    assert router.routes["complex"].model == "gpt-4o"
+    assert router.routes["complex"].max_tokens == 1200
+    route, reason = router.route("delete my gym task", None)
+    assert (route.name, route.max_tokens, reason) == ("simple", 100, "intent")
+
+def test_chat_uses_routed_settings(llm_client, mock_openai):
+    """Test that the chat call uses the route's model and limits and records metrics."""
+    metrics.reset()
+    response = llm_client.post("/api/llm/chat", json={"message": "delete my gym task"})
+    assert response.headers["X-LLM-Route"] == "simple"
+    assert response.json()["metadata"]["route"] == "simple"
+    kwargs = mock_openai.client.chat.completions.create.call_args.kwargs
+    simple = mock_openai.router.routes["simple"]
+    assert (kwargs["model"], kwargs["max_tokens"], kwargs["temperature"]) == (
+        simple.model, simple.max_tokens, simple.temperature
+    )
+    assert metrics.get("llm_route_decisions_total", route="simple", reason="intent") == 1
+    assert metrics.get("llm_route_tokens_total", route="simple", model=simple.model) == 42
+    assert metrics.get("llm_route_latency_seconds_count", route="simple") == 1
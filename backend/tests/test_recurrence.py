@@ -0,0 +1,63 @@
+"""
+Tests for recurrence rules and their lazy expansion.
+"""
+
+from datetime import datetime
+import pytest
+from app.services.context_compaction import compact_context
+from app.services.free_busy import BusyIndex, find_conflicts
+from app.services.recurrence import occurrences, parse_rrule
+
+STANDUP = {
+    "title": "Standup", "start_date": "2020-01-06T09:00:00", "end_date": "2020-01-06T09:15:00",
+    "recurrence": "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"
+}
+WEEK = (datetime(2024, 3, 18), datetime(2024, 3, 25))
+
+def test_parse_rrule():
+    """Test that supported parts are parsed and unsupported ones rejected."""
+    rule = parse_rrule("RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=FR,MO;COUNT=4")
+    assert (rule.freq, rule.interval, rule.by_day, rule.count) == ("WEEKLY", 2, (0, 4), 4)
+    assert parse_rrule("FREQ=DAILY;UNTIL=20240320").until == datetime(2024, 3, 20, 23, 59, 59, 999999)
+    for text in ("FREQ=HOURLY", "FREQ=DAILY;BYHOUR=9", "FREQ=MONTHLY;BYDAY=1MO", "FREQ=DAILY;COUNT=2;UNTIL=20240320"):
+        with pytest.raises(ValueError):
+            parse_rrule(text)
+
+def test_occurrences_within_window():
+    """Test weekday, month-end and COUNT rules over a window."""
+    weekdays = list(occurrences(parse_rrule(STANDUP["recurrence"]), datetime(2020, 1, 6, 9), *WEEK))
+    assert [when.day for when in weekdays] == [18, 19, 20, 21, 22]
+    assert all(when.hour == 9 for when in weekdays)
+
+    month_ends = occurrences(parse_rrule("FREQ=MONTHLY;BYMONTHDAY=-1"), datetime(2024, 1, 31, 8),
+                             datetime(2024, 1, 1), datetime(2024, 5, 1))
+    assert [when.date().isoformat() for when in month_ends] == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"]
+
+    counted = occurrences(parse_rrule("FREQ=DAILY;INTERVAL=2;COUNT=5"), datetime(2024, 3, 1, 8),
+                          datetime(2024, 3, 6), datetime(2024, 4, 1))
+    assert [when.day for when in counted] == [7, 9]
+
+def test_expansion_is_lazy():
+    """Test that an old daily rule only produces the occurrences inside the window."""
+    generated = occurrences(parse_rrule("FREQ=DAILY"), datetime(1990, 1, 1, 7), *WEEK)
+    assert next(generated) == datetime(2024, 3, 18, 7)
+    assert len(list(generated)) == 6
+
+def test_free_busy_expands_repeating_tasks():
+    """Test that repeating tasks occupy every occurrence within the horizon."""
+    index = BusyIndex.from_tasks([STANDUP], WEEK)
+    assert len(index) == 5
+    assert index.overlaps(datetime(2024, 3, 20, 9, 10), datetime(2024, 3, 20, 10))
+    assert not index.overlaps(datetime(2024, 3, 23, 9), datetime(2024, 3, 23, 10))
+    suggestions = [{"action": "create_task", "parameters": {
+        "title": "Sync", "start_date": "2024-03-16T09:00:00", "recurrence": "FREQ=DAILY"
+    }}]
+    assert find_conflicts(suggestions, index, WEEK) == [0]
+    assert find_conflicts(suggestions, index) == []
+
+def test_compaction_keeps_repeating_tasks_in_window():
+    """Test that a repeating task started long ago is dated by its next occurrence."""
+    old = {"title": "Old", "start_date": "2020-01-06T09:00:00"}
+    compacted, _ = compact_context("what's on this week", {"current_tasks": [STANDUP, old]},
+                                   now=datetime(2024, 3, 18, 8))
+    assert [task["title"] for task in compacted["current_tasks"]] == ["Standup"]
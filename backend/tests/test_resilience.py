@@ -0,0 +1,125 @@
+"""
+Tests for upstream deadlines, retries, circuit breaking and fallback.
+"""
+
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+from openai import AuthenticationError, RateLimitError
+from app.core.metrics import metrics
+from app.core.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, ResilientCaller
+
+def rate_limit_error(retry_after=None):
+    """Build an OpenAI RateLimitError with an optional Retry-After header."""
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://api.openai.com"))
+    return RateLimitError("rate limited", response=response, body=None)
+
+def make_caller(**settings):
+    caller = ResilientCaller()
+    caller.base_delay = 0.001
+    for name, value in settings.items():
+        setattr(caller, name, value)
+    return caller
+
+def test_retries_then_succeeds():
+    """Test that retryable errors are retried and counted."""
+    metrics.reset()
+    fn = AsyncMock(side_effect=[rate_limit_error(), asyncio.TimeoutError(), "ok"])
+    result = asyncio.run(make_caller().call(fn, "primary"))
+    assert result == ("ok", "primary")
+    assert fn.await_count == 3
+    assert metrics.get("llm_retries_total", model="primary", reason="rate_limit") == 1
+    assert metrics.get("llm_retries_total", model="primary", reason="timeout") == 1
+
+def test_retry_after_honoured():
+    """Test that a Retry-After header sets the retry delay."""
+    fn = AsyncMock(side_effect=[rate_limit_error("0.25"), "ok"])
+    with patch("app.core.resilience.asyncio.sleep", new=AsyncMock()) as sleep:
+        asyncio.run(make_caller().call(fn, "primary"))
+    sleep.assert_awaited_once_with(0.25)
+
+def test_client_errors_not_retried():
+    """Test that non-retryable errors are raised immediately."""
+    response = httpx.Response(401, request=httpx.Request("POST", "https://api.openai.com"))
+    fn = AsyncMock(side_effect=AuthenticationError("bad key", response=response, body=None))
+    caller = make_caller()
+    with pytest.raises(AuthenticationError):
+        asyncio.run(caller.call(fn, "primary"))
+    assert fn.await_count == 1
+    assert caller.breaker("primary").state == CLOSED
+
+def test_per_call_timeout():
+    """Test that a hung call is cut off by the per-attempt timeout."""
+    async def hang(model):
+        await asyncio.sleep(10)
+    caller = make_caller(call_timeout=0.01, max_retries=0)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(caller.call(hang, "primary"))
+
+def test_fallback_model_used_after_failures():
+    """Test that the fallback model answers once the primary is exhausted."""
+    metrics.reset()
+    async def fn(model):
+        if model == "primary":
+            raise rate_limit_error()
+        return "ok"
+    caller = make_caller(fallback_model="fallback", max_retries=1)
+    assert asyncio.run(caller.call(fn, "primary")) == ("ok", "fallback")
+    assert metrics.get("llm_fallbacks_total", model="fallback") == 1
+
+def test_circuit_breaker_opens_and_recovers():
+    """Test that the breaker fails fast when open and closes after a good probe."""
+    metrics.reset()
+    caller = make_caller(failure_threshold=2, max_retries=0, reset_timeout=60)
+    fn = AsyncMock(side_effect=rate_limit_error())
+    for _ in range(2):
+        with pytest.raises(RateLimitError):
+            asyncio.run(caller.call(fn, "primary"))
+    assert caller.breaker("primary").state == OPEN
+    assert metrics.get("llm_circuit_state", model="primary") == 1
+    
+    with pytest.raises(CircuitOpenError) as excinfo:
+        asyncio.run(caller.call(fn, "primary"))
+    assert fn.await_count == 2 and excinfo.value.retry_after > 0
+    
+    caller.breaker("primary").opened_at -= 60
+    assert asyncio.run(caller.call(AsyncMock(return_value="ok"), "primary")) == ("ok", "primary")
+    assert caller.breaker("primary").state == CLOSED
+    assert metrics.get("llm_circuit_state", model="primary") == 0
+
+def test_half_open_admits_one_probe():
+    """Test that only one probe goes through while half-open."""
+    breaker = CircuitBreaker("primary", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+def test_deadline_does_not_strand_fallback_probe():
+    """Test that running out of time before the fallback leaves its half-open breaker usable."""
+    async def hang(model):
+        await asyncio.sleep(10)
+    caller = make_caller(
+        call_timeout=0.01, deadline=0.01, max_retries=0, fallback_model="fallback",
+        failure_threshold=1, reset_timeout=0
+    )
+    fallback = caller.breaker("fallback")
+    fallback.record_failure()
+    assert fallback.state == OPEN
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(caller.call(hang, "primary"))
+    assert fallback.allow()
+
+def test_chat_returns_503_when_circuit_open(llm_client, mock_openai):
+    """Test that an open breaker fails fast with 503 and Retry-After."""
+    breaker = mock_openai.resilience.breaker(mock_openai.router.routes["complex"].model)
+    breaker.reset_timeout = 30
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    response = llm_client.post("/api/llm/chat", json={"message": "plan my week"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
+    mock_openai.client.chat.completions.create.assert_not_called()
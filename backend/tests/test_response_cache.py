@@ -0,0 +1,95 @@
+"""
+Tests for the two-tier LLM response cache.
+"""
+
+import asyncio
+import json
+import pytest
+import redis
+from unittest.mock import AsyncMock, patch
+from app.core import response_cache
+from app.core.metrics import metrics
+from app.core.response_cache import LocalLRUCache, ResponseCache, make_cache_key
+
+MESSAGES = [
+    {"role": "system", "content": "You are Velo."},
+    {"role": "user", "content": "What's on   today?"}
+]
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start every test with empty counters."""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+@pytest.fixture
+def mock_redis():
+    """Patch the cache's Redis client with an in-memory mock."""
+    store = {}
+    client = AsyncMock()
+    client.get.side_effect = store.get
+    client.setex.side_effect = lambda key, ttl, value: store.__setitem__(key, value)
+    with patch.object(response_cache, "get_async_redis_client", return_value=client):
+        yield store
+
+def test_cache_key_normalizes_whitespace():
+    """Test that prompts differing only in spacing share a key."""
+    variant = [dict(MESSAGES[0]), {"role": "user", "content": "  What's on today? "}]
+    assert make_cache_key(MESSAGES, "gpt-3.5-turbo", 0.7) == make_cache_key(variant, "gpt-3.5-turbo", 0.7)
+
+def test_cache_key_keeps_case():
+    """Test that prompts differing in case (e.g. task titles "US" and "us") do not share a key."""
+    upper = [dict(MESSAGES[0]), {"role": "user", "content": 'Move {"title": "US"}'}]
+    lower = [dict(MESSAGES[0]), {"role": "user", "content": 'Move {"title": "us"}'}]
+    assert make_cache_key(upper, "gpt-3.5-turbo", 0.7) != make_cache_key(lower, "gpt-3.5-turbo", 0.7)
+
+def test_cache_key_includes_model_and_temperature():
+    """Test that model and temperature change the key."""
+    key = make_cache_key(MESSAGES, "gpt-3.5-turbo", 0.7)
+    assert key != make_cache_key(MESSAGES, "gpt-4o-mini", 0.7)
+    assert key != make_cache_key(MESSAGES, "gpt-3.5-turbo", 0.2)
+
+def test_local_lru_evicts_by_size():
+    """Test that the least recently used entry is evicted first."""
+    cache = LocalLRUCache(max_entries=2, ttl=60)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.get("a")
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert metrics.get("llm_cache_evictions_total", reason="size") == 1
+
+def test_local_lru_evicts_by_ttl():
+    """Test that expired entries are dropped on read."""
+    cache = LocalLRUCache(max_entries=2, ttl=-1)
+    cache.set("a", {"v": 1})
+    assert cache.get("a") is None
+    assert metrics.get("llm_cache_evictions_total", reason="ttl") == 1
+
+def test_redis_tier_serves_other_workers(mock_redis):
+    """Test that a Redis hit populates the local tier."""
+    asyncio.run(ResponseCache().set("k", {"response": "hi"}))
+    assert json.loads(mock_redis["llm_cache:k"]) == {"response": "hi"}
+    
+    other_worker = ResponseCache()
+    assert asyncio.run(other_worker.get("k")) == {"response": "hi"}
+    assert asyncio.run(other_worker.get("k")) == {"response": "hi"}
+    assert metrics.get("llm_cache_hits_total", tier="redis") == 1
+    assert metrics.get("llm_cache_hits_total", tier="local") == 1
+
+def test_miss_is_counted(mock_redis):
+    """Test that misses on both tiers are counted."""
+    assert asyncio.run(ResponseCache().get("missing")) is None
+    assert metrics.get("llm_cache_misses_total") == 1
+
+def test_redis_outage_falls_back_to_local_tier():
+    """Test that Redis errors neither fail lookups nor stores."""
+    client = AsyncMock()
+    client.get.side_effect = client.setex.side_effect = redis.ConnectionError("down")
+    cache = ResponseCache()
+    with patch.object(response_cache, "get_async_redis_client", return_value=client):
+        asyncio.run(cache.set("k", {"response": "hi"}))
+        assert asyncio.run(cache.get("k")) == {"response": "hi"}
+        assert asyncio.run(cache.get("missing")) is None
@@ -0,0 +1,187 @@
+"""
+Tests for single-flight coalescing of identical LLM calls.
+"""
+
+import asyncio
+import json
+import pytest
+import redis
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core import singleflight
+from app.core.metrics import metrics
+from app.core.singleflight import SingleFlight
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start every test with empty counters."""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+def redis_mock() -> AsyncMock:
+    """Asyncio Redis client mock with script registration."""
+    redis_client = AsyncMock()
+    redis_client.register_script = MagicMock(return_value=AsyncMock())
+    return redis_client
+
+def make_call(counter, result="ok", delay=0.01):
+    """Build a slow coroutine function that counts its executions."""
+    async def call():
+        counter.append(1)
+        await asyncio.sleep(delay)
+        return result
+    return call
+
+def test_concurrent_calls_share_one_execution():
+    """Test that callers with the same key await a single call."""
+    calls = []
+    flight = SingleFlight()
+    
+    async def scenario():
+        call = make_call(calls)
+        return await asyncio.gather(*(flight.do("key", call) for _ in range(5)))
+    
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["ok"] * 5
+    assert sum(shared for _, shared in results) == 4
+    assert metrics.get("llm_singleflight_saved_total", scope="local") == 4
+
+def test_different_keys_run_separately():
+    """Test that different fingerprints are not coalesced."""
+    calls = []
+    flight = SingleFlight()
+    
+    async def scenario():
+        call = make_call(calls)
+        await asyncio.gather(flight.do("a", call), flight.do("b", call))
+    
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+def test_errors_propagate_to_all_waiters_and_clear_key():
+    """Test that a failed call fails every waiter and is not cached."""
+    flight = SingleFlight()
+    
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+    
+    async def scenario():
+        return await asyncio.gather(
+            flight.do("key", failing), flight.do("key", failing), return_exceptions=True
+        )
+    
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight._inflight == {}
+
+def test_cancelled_leader_does_not_cancel_followers():
+    """Test that a disconnecting first caller leaves the shared call running."""
+    calls = []
+    flight = SingleFlight()
+    
+    async def scenario():
+        call = make_call(calls, delay=0.05)
+        leader = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+    
+    assert asyncio.run(scenario()) == ("ok", True)
+    assert len(calls) == 1
+
+def test_redis_mode_follower_reads_published_result():
+    """Test that a worker losing the lock race reuses the holder's result."""
+    redis_client = redis_mock()
+    redis_client.set.return_value = False
+    redis_client.exists.return_value = True
+    redis_client.get.return_value = json.dumps({"response": "shared"})
+    calls = []
+    
+    with patch.dict("os.environ", {"LLM_SINGLEFLIGHT_REDIS": "true"}), \
+            patch.object(singleflight, "get_async_redis_client", return_value=redis_client):
+        flight = SingleFlight()
+        result = asyncio.run(flight.do("key", make_call(calls)))
+    
+    assert result == ({"response": "shared"}, True)
+    assert calls == []
+    assert metrics.get("llm_singleflight_saved_total", scope="redis") == 1
+
+def test_redis_mode_falls_back_when_lock_holder_fails():
+    """Test that followers make the call themselves if no result appears."""
+    redis_client = redis_mock()
+    redis_client.set.return_value = False
+    redis_client.exists.return_value = False
+    redis_client.get.return_value = None
+    calls = []
+    
+    with patch.dict("os.environ", {"LLM_SINGLEFLIGHT_REDIS": "true"}), \
+            patch.object(singleflight, "get_async_redis_client", return_value=redis_client):
+        flight = SingleFlight()
+        result = asyncio.run(flight.do("key", make_call(calls)))
+    
+    assert result == ("ok", False)
+    assert len(calls) == 1
+
+def test_redis_mode_keeps_result_when_publishing_fails():
+    """Test that the lock holder still returns its result if Redis rejects the write."""
+    redis_client = redis_mock()
+    redis_client.set.return_value = True
+    redis_client.setex.side_effect = redis.ConnectionError("down")
+    calls = []
+    
+    with patch.dict("os.environ", {"LLM_SINGLEFLIGHT_REDIS": "true"}), \
+            patch.object(singleflight, "get_async_redis_client", return_value=redis_client):
+        flight = SingleFlight()
+        result = asyncio.run(flight.do("key", make_call(calls)))
+    
+    assert result == ("ok", False)
+    assert len(calls) == 1
+
+def test_redis_mode_holder_errors_propagate():
+    """Test that a failing call is raised, not masked, when the lock is held."""
+    redis_client = redis_mock()
+    redis_client.set.return_value = True
+    
+    async def failing():
+        raise ValueError("upstream failed")
+    
+    with patch.dict("os.environ", {"LLM_SINGLEFLIGHT_REDIS": "true"}), \
+            patch.object(singleflight, "get_async_redis_client", return_value=redis_client):
+        flight = SingleFlight()
+        with pytest.raises(ValueError):
+            asyncio.run(flight.do("key", failing))
+    redis_client.setex.assert_not_awaited()
+
+def test_redis_mode_lock_release_keeps_other_workers_lock():
+    """Test that releasing checks and deletes the lock atomically, against real Lua."""
+    aioredis = pytest.importorskip("fakeredis.aioredis")
+    pytest.importorskip("lupa")
+    
+    async def scenario():
+        redis_client = aioredis.FakeRedis(decode_responses=True)
+        flight = SingleFlight()
+        
+        async def call():
+            return "ok"
+        
+        async def stolen_call():
+            # The lock expired mid-call and another worker took it
+            await redis_client.set("llm_singleflight:stolen:lock", "other")
+            return "ok"
+        
+        with patch.object(singleflight, "get_async_redis_client", return_value=redis_client):
+            await flight.do("key", call)
+            await flight.do("stolen", stolen_call)
+        return await redis_client.get("llm_singleflight:key:lock"), await redis_client.get("llm_singleflight:stolen:lock")
+    
+    with patch.dict("os.environ", {"LLM_SINGLEFLIGHT_REDIS": "true"}):
+        assert asyncio.run(scenario()) == (None, "other")
+
+def test_lock_ttl_outlives_the_call():
+    """Test that the default lock TTL covers the scheduler wait and the client timeout."""
+    with patch.dict("os.environ", {"LLM_SCHEDULER_TIMEOUT": "30", "OPENAI_TIMEOUT": "60"}):
+        assert SingleFlight().lock_ttl == 90
@@ -0,0 +1,62 @@
+"""
+Tests for suggestion parsing.
+"""
+
+import pytest
+from app.core.suggestions import SuggestionStreamParser, extract_suggestions, parse_tool_arguments
+
+STREAMED_REPLY = (
+    'Here you go.\nSUGGESTION: [\n'
+    '  {"action": "create_task", "parameters": {"title": "Study {ch. 1}", "description": "say \\"hi\\""}},\n'
+    '  {"action": "create_task", "parameters": {"title": "Study ch. 2"}}\n'
+    ']'
+)
+
+def feed_in_chunks(parser, text, size):
+    """Feed text to the parser in fixed-size chunks and collect results."""
+    results = []
+    for start in range(0, len(text), size):
+        results.append(parser.feed(text[start:start + size]))
+    return results
+
+def test_parser_emits_each_object_when_it_closes():
+    """Test that objects are emitted as soon as their closing brace arrives."""
+    parser = SuggestionStreamParser()
+    first_end = STREAMED_REPLY.index("}},") + 2
+    assert parser.feed(STREAMED_REPLY[:first_end - 1]) == []
+    emitted = parser.feed(STREAMED_REPLY[first_end - 1:first_end + 1])
+    assert [action["parameters"]["title"] for action in emitted] == ["Study {ch. 1}"]
+
+def test_parser_handles_any_chunking():
+    """Test that results are identical regardless of chunk boundaries."""
+    for size in (1, 3, 7, len(STREAMED_REPLY)):
+        chunks = feed_in_chunks(SuggestionStreamParser(), STREAMED_REPLY, size)
+        actions = [action for chunk in chunks for action in chunk]
+        assert [a["parameters"]["title"] for a in actions] == ["Study {ch. 1}", "Study ch. 2"]
+        assert actions[0]["parameters"]["description"] == 'say "hi"'
+
+def test_parser_ignores_text_without_marker():
+    """Test that JSON-looking prose before the marker is not parsed."""
+    parser = SuggestionStreamParser()
+    assert parser.feed('I think {"action": "nope"} is wrong.') == []
+
+def test_parser_accepts_single_object():
+    """Test a bare object after the marker instead of an array."""
+    parser = SuggestionStreamParser()
+    actions = parser.feed('SUGGESTION: {"action": "delete_task", "parameters": {"title": "Gym"}}')
+    assert actions == [{"action": "delete_task", "parameters": {"title": "Gym"}}]
+
+def test_extract_suggestions_without_marker():
+    """Test that fenced suggestion objects are found even without the marker."""
+    text = 'Here you go:\n```json\n{"action": "create_task", "parameters": {"title": "Run"}}\n```\n{not json}'
+    assert extract_suggestions(text) == [{"action": "create_task", "parameters": {"title": "Run"}}]
+
+def test_extract_suggestions_unwraps_container_object():
+    """Test that a {"suggestions": [...]} wrapper is unwrapped."""
+    text = 'SUGGESTION: {"suggestions": [{"action": "delete_task", "parameters": {}}]}'
+    assert extract_suggestions(text) == [{"action": "delete_task", "parameters": {}}]
+
+def test_parse_tool_arguments_rejects_unknown_action():
+    """Test that function arguments are validated against the typed schema."""
+    with pytest.raises(ValueError):
+        parse_tool_arguments('{"suggestions": [{"action": "fly", "parameters": {}}]}')
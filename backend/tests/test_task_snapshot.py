@@ -0,0 +1,75 @@
+"""
+Tests for server-side task snapshots and delta context uploads.
+"""
+
+import asyncio
+
+import pytest
+from app.core.task_snapshot import SnapshotVersionMismatch, merge_tasks
+
+def test_merge_tasks_keeps_order():
+    """Test that upserts replace in place or append, and deletes remove by id."""
+    tasks = [{"id": 1, "title": "Gym"}, {"id": 2, "title": "Dentist"}, {"title": "No id"}]
+    merged = merge_tasks(tasks, [{"id": "2", "title": "Dentist 4pm"}, {"id": 3, "title": "Call mom"}], ["1"])
+    assert merged == [{"id": "2", "title": "Dentist 4pm"}, {"title": "No id"}, {"id": 3, "title": "Call mom"}]
+
+def test_merge_tasks_requires_ids():
+    """Test that upserts without an id are rejected."""
+    with pytest.raises(ValueError):
+        merge_tasks([], [{"title": "Gym"}], [])
+
+def test_store_versions(task_snapshots):
+    """Test that full uploads and deltas bump the version and stale deltas fail."""
+    async def run():
+        assert await task_snapshots.replace("client", [{"id": 1, "title": "Gym"}]) == 1
+        tasks, version = await task_snapshots.apply_delta("client", 1, [{"id": 2, "title": "Dentist"}], [])
+        assert version == 2 and [task["title"] for task in tasks] == ["Gym", "Dentist"]
+        
+        # An empty delta reads the snapshot without bumping the version
+        assert await task_snapshots.apply_delta("client", 2, [], []) == (tasks, 2)
+        
+        with pytest.raises(SnapshotVersionMismatch) as excinfo:
+            await task_snapshots.apply_delta("client", 1, [], ["1"])
+        assert excinfo.value.current_version == 2
+        with pytest.raises(SnapshotVersionMismatch):
+            await task_snapshots.apply_delta("other-client", 1, [], [])
+    
+    asyncio.run(run())
+
+def test_store_key_is_namespaced(task_snapshots):
+    """Test that snapshots live under task_snapshot:, apart from client-prefixed keys."""
+    from app.core import task_snapshot
+    
+    asyncio.run(task_snapshots.replace("client", []))
+    redis_client = task_snapshot.get_async_redis_client().redis_client
+    assert list(redis_client.data) == ["task_snapshot:client"]
+
+def test_chat_with_task_delta(llm_client, mock_openai):
+    """Test that a delta is merged into the prompt context."""
+    response = llm_client.post("/api/llm/chat", json={
+        "message": "plan my week",
+        "context": {"current_tasks": [{"id": 1, "title": "Gym"}]}
+    })
+    assert response.headers["X-Task-Version"] == "1"
+    assert response.json()["metadata"]["task_version"] == 1
+    
+    response = llm_client.post("/api/llm/chat", json={
+        "message": "plan my week again",
+        "task_delta": {"base_version": 1, "upserts": [{"id": 2, "title": "Dentist"}]}
+    })
+    assert response.status_code == 200
+    assert response.headers["X-Task-Version"] == "2"
+    prompt = mock_openai.client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+    assert '"Gym"' in prompt and '"Dentist"' in prompt
+
+def test_chat_stale_delta_asks_for_full_list(llm_client, mock_openai):
+    """Test that a version mismatch returns 409 without calling OpenAI."""
+    response = llm_client.post("/api/llm/chat", json={
+        "message": "plan my week",
+        "task_delta": {"base_version": 5, "deletes": ["1"]}
+    })
+    assert response.status_code == 409
+    assert response.headers["X-Task-Version"] == "0"
+    assert "resend full" in response.json()["detail"]
+    mock_openai.client.chat.completions.create.assert_not_called()
+    llm_client.check_rate_limit.assert_not_called()
@@ -0,0 +1,35 @@
+"""
+Tests for local token counting.
+"""
+
+import json
+from app.api.llm import create_chat_prompt
+from app.core import tokens
+from app.core.tokens import count_message_tokens, count_tokens, estimate_request_tokens
+
+CONTEXT = {"current_tasks": [
+    {"title": f"Task {i}", "description": "Quarterly review prep", "completed": False}
+    for i in range(200)
+]}
+
+def test_long_text_count_close_to_single_pass():
+    """Test that fragment counting stays within one token per boundary."""
+    text = json.dumps(CONTEXT)
+    boundaries = text.count(tokens.FRAGMENT_BOUNDARY)
+    assert abs(count_tokens(text) - tokens._encode_length(text)) <= boundaries
+
+def test_repeated_fragments_served_from_cache():
+    """Test that a second prompt with the same tasks hits the fragment cache."""
+    count_tokens(json.dumps(CONTEXT))
+    before = tokens._count_fragment.cache_info()
+    count_tokens(json.dumps(CONTEXT))
+    after = tokens._count_fragment.cache_info()
+    assert after.misses == before.misses
+    assert after.hits > before.hits
+
+def test_estimate_includes_system_prompt_context_and_completion():
+    """Test that admission estimates cover the whole request."""
+    messages = create_chat_prompt("plan my week", CONTEXT)
+    prompt_tokens = count_message_tokens(messages)
+    assert prompt_tokens > count_tokens(messages[0]["content"]) + count_tokens(json.dumps(CONTEXT)) - 10
+    assert estimate_request_tokens(messages, 500) == prompt_tokens + 500
@@ -0,0 +1,259 @@
+"""
+Tests for sliding-window rate limiting.
+"""
+
+import asyncio
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.api import usage_tracking
+from app.api.usage_tracking import (
+    MAX_REQUESTS_PER_WINDOW,
+    RATE_LIMIT_WINDOW,
+    USAGE_KEY_TTL,
+    LeaseLimiter,
+    Reservation,
+    _window_position,
+    usage_key
+)
+from app.core.metrics import metrics
+from scripts.migrate_usage_keys import parse_key, plan_migration
+
+def fake_redis(granted=(5, 5000)) -> MagicMock:
+    """Asyncio Redis client mock whose rate limit script leases `granted`."""
+    redis_client = MagicMock()
+    redis_client.register_script.return_value = AsyncMock(return_value=list(granted))
+    redis_client.pipeline.return_value.__aenter__.return_value = MagicMock(execute=AsyncMock())
+    return redis_client
+
+def run_with_scripts(scenario):
+    """
+    Run `scenario(redis_client)` against an in-memory Redis that executes the
+    Lua scripts (fakeredis with lupa), in window 7 with the previous window
+    weighted 0.5.
+    """
+    aioredis = pytest.importorskip("fakeredis.aioredis")
+    pytest.importorskip("lupa")
+    
+    async def run():
+        redis_client = aioredis.FakeRedis(decode_responses=True)
+        with patch.object(usage_tracking, "get_async_redis_client", return_value=redis_client), \
+                patch.object(usage_tracking, "_window_position", return_value=(7, 0.5)):
+            return await scenario(redis_client)
+    return asyncio.run(run())
+
+def test_window_position():
+    """Test the window number and the weight left on the previous window."""
+    assert _window_position(10 * RATE_LIMIT_WINDOW) == (10, 1.0)
+    window, weight = _window_position(10 * RATE_LIMIT_WINDOW + RATE_LIMIT_WINDOW / 4)
+    assert window == 10
+    assert weight == 0.75
+
+def test_lease_serves_checks_locally():
+    """Test that one script call leases a chunk the next checks spend without Redis."""
+    redis_client = fake_redis(granted=(5, 5000))
+    script = redis_client.register_script.return_value
+    limiter = LeaseLimiter()
+    
+    async def scenario():
+        return [await limiter.check("client", 120) for _ in range(5)]
+    
+    with patch.object(usage_tracking, "get_async_redis_client", return_value=redis_client), \
+            patch.object(usage_tracking, "_window_position", return_value=(7, 0.5)):
+        reservations = asyncio.run(scenario())
+    
+    assert reservations == [Reservation("client", 7, 120)] * 5
+    script.assert_awaited_once()
+    assert script.call_args.kwargs["keys"] == ["llm_usage:client:7", "llm_usage:client:6", "llm_usage:client:7"]
+    assert script.call_args.kwargs["args"][2:] == [120, 0.5, 2 * RATE_LIMIT_WINDOW, 5, 5000, 0, 0]
+    assert (limiter.held_requests, limiter.held_tokens) == (0, 5000 - 5 * 120)
+
+def test_drained_lease_is_returned_with_the_next_lease():
+    """Test that a bucket that cannot cover a request hands back its rest when re-leasing."""
+    redis_client = fake_redis(granted=(2, 200))
+    script = redis_client.register_script.return_value
+    limiter = LeaseLimiter()
+    
+    async def scenario():
+        return [await limiter.check("client", 150), await limiter.check("client", 150)]
+    
+    with patch.object(usage_tracking, "get_async_redis_client", return_value=redis_client):
+        assert all(asyncio.run(scenario()))
+    assert script.await_count == 2
+    assert script.call_args.kwargs["args"][-2:] == [1, 50]
+
+def test_error_bound_sets_chunk_size():
+    """Test that chunks split the error bound between workers, and 0 disables leasing."""
+    with patch.dict(os.environ, {"RATE_LIMIT_LEASE_ERROR": "0.1", "RATE_LIMIT_WORKERS": "2"}):
+        assert LeaseLimiter().chunk() == (5, 5000)
+    with patch.dict(os.environ, {"RATE_LIMIT_LEASE_ERROR": "0"}):
+        assert LeaseLimiter().chunk() == (1, 0)
+
+def test_check_rate_limit_refused():
+    """Test that a refusal from the script is reported as over the limit."""
+    with patch.object(usage_tracking, "get_async_redis_client", return_value=fake_redis(granted=(0, 0))):
+        assert asyncio.run(LeaseLimiter().check("client", 10)) is None
+
+def test_reconcile_returns_expired_leases():
+    """Test that unspent quota of expired leases goes back to Redis."""
+    redis_client = fake_redis(granted=(5, 5000))
+    limiter = LeaseLimiter()
+    with patch.object(usage_tracking, "get_async_redis_client", return_value=redis_client), \
+            patch.object(usage_tracking, "_window_position", return_value=(7, 0.5)):
+        asyncio.run(limiter.check("client", 100))
+        asyncio.run(limiter.reconcile())
+    
+    returned = redis_client.register_script.return_value.call_args.kwargs
+    assert list(returned["keys"]) == ["llm_usage:client:7"]
+    assert returned["args"] == [4, 4900]
+    assert returned["client"] is redis_client.pipeline.return_value.__aenter__.return_value
+    assert limiter.leases == {}
+    assert (limiter.held_requests, limiter.held_tokens) == (0, 0)
+
+def test_reconcile_refunds_to_the_reserved_window():
+    """Test that unused reserved tokens go back to the window they were charged to."""
+    redis_client = fake_redis()
+    script = redis_client.register_script.return_value
+    with patch.object(usage_tracking, "get_async_redis_client", return_value=redis_client), \
+            patch.object(usage_tracking, "_window_position", return_value=(8, 0.5)):
+        asyncio.run(usage_tracking.reconcile_usage(Reservation("client", 7, 1500), 400))
+    assert script.call_args.kwargs["keys"] == ["llm_usage:client:7", "llm_usage:client:8"]
+    assert script.call_args.kwargs["args"] == [-1100, 2 * RATE_LIMIT_WINDOW]
+
+def test_reconcile_skips_redis_when_the_estimate_was_exact():
+    """Test that a reservation matching actual usage needs no Redis call."""
+    redis_client = fake_redis()
+    with patch.object(usage_tracking, "get_async_redis_client", return_value=redis_client):
+        asyncio.run(usage_tracking.reconcile_usage(Reservation("client", 7, 400), 400))
+    redis_client.register_script.return_value.assert_not_awaited()
+
+def test_usage_stats_weight_previous_window():
+    """Test that stats count the previous window by its remaining overlap."""
+    redis_client = fake_redis()
+    pipe = redis_client.pipeline.return_value.__aenter__.return_value
+    pipe.execute.return_value = [["4", "400"], ["10", None]]
+    with patch.object(usage_tracking, "get_async_redis_client", return_value=redis_client), \
+            patch.object(usage_tracking, "_window_position", return_value=(7, 0.5)):
+        stats = asyncio.run(usage_tracking.get_usage_stats("client"))
+    assert stats["requests"]["used"] == 9
+    assert stats["tokens"]["used"] == 400
+
+def test_script_caps_concurrent_admission_across_workers():
+    """Test that two workers leasing concurrently admit exactly the request limit."""
+    with patch.dict(os.environ, {"RATE_LIMIT_LEASE_ERROR": "0.05", "RATE_LIMIT_WORKERS": "2"}):
+        limiters = [LeaseLimiter(), LeaseLimiter()]
+    
+    async def scenario(redis_client):
+        admitted = await asyncio.gather(*(limiters[number % 2].check("client", 10) for number in range(150)))
+        return sum(1 for reservation in admitted if reservation), await redis_client.hgetall(usage_key("client", 7))
+    
+    admitted, usage = run_with_scripts(scenario)
+    assert admitted == MAX_REQUESTS_PER_WINDOW
+    assert int(usage["requests"]) == MAX_REQUESTS_PER_WINDOW
+    assert all(limiter.held_requests == 0 for limiter in limiters)
+
+def test_script_charges_what_concurrent_mixed_checks_spend():
+    """Test that checks served while a re-lease is in flight are not refunded with its remainder."""
+    with patch.dict(os.environ, {"RATE_LIMIT_LEASE_ERROR": "0.5", "RATE_LIMIT_WORKERS": "1"}):
+        limiter = LeaseLimiter()
+    
+    async def scenario(redis_client):
+        await limiter.check("client", 100)
+        # The 450-token check re-leases; the 100-token checks fit the old lease meanwhile
+        admitted = await asyncio.gather(*(limiter.check("client", cost) for cost in (450, 100, 100)))
+        await limiter.reconcile()
+        return [100] + [reservation.tokens for reservation in admitted if reservation], \
+            await redis_client.hgetall(usage_key("client", 7))
+    
+    with patch.object(usage_tracking, "MAX_REQUESTS_PER_WINDOW", 4), \
+            patch.object(usage_tracking, "MAX_TOKENS_PER_WINDOW", 1000):
+        spent, usage = run_with_scripts(scenario)
+    assert int(usage["requests"]) == len(spent)
+    assert int(usage["tokens"]) == sum(spent)
+
+def test_script_takes_back_returned_lease():
+    """Test that returning a lease leaves only the spent quota charged."""
+    limiter = LeaseLimiter()
+    
+    async def scenario(redis_client):
+        await limiter.check("client", 10)
+        charged = await redis_client.hgetall(usage_key("client", 7))
+        await limiter.reconcile()
+        return charged, await redis_client.hgetall(usage_key("client", 7))
+    
+    charged, usage = run_with_scripts(scenario)
+    assert (int(charged["requests"]), int(charged["tokens"])) == limiter.chunk()
+    assert usage == {"requests": "1", "tokens": "10"}
+
+def test_script_reconcile_clamps_refund_at_zero():
+    """Test that a refund never takes a window's tokens below zero, and overruns hit the current window."""
+    async def scenario(redis_client):
+        await redis_client.hset(usage_key("client", 6), "tokens", 100)
+        await usage_tracking.reconcile_usage(Reservation("client", 6, 500), 0)
+        await usage_tracking.reconcile_usage(Reservation("client", 6, 500), 800)
+        return (
+            await redis_client.hget(usage_key("client", 6), "tokens"),
+            await redis_client.hget(usage_key("client", 7), "tokens")
+        )
+    
+    assert run_with_scripts(scenario) == ("0", "300")
+
+def test_script_settles_reservations_against_the_lease():
+    """Test that reservations settle locally and Redis ends up charged with actual usage."""
+    limiter = LeaseLimiter()
+    metrics.reset()
+    
+    async def scenario(redis_client):
+        first = await limiter.check("client", 1100)
+        second = await limiter.check("client", 1100)
+        await usage_tracking.reconcile_usage(first, 600)
+        await usage_tracking.reconcile_usage(second, 1300)
+        await limiter.reconcile()
+        return await redis_client.hgetall(usage_key("client", 7))
+    
+    with patch.object(usage_tracking, "get_lease_limiter", return_value=limiter):
+        usage = run_with_scripts(scenario)
+    assert usage == {"requests": "2", "tokens": "1900"}
+    assert metrics.get("rate_limit_reconcile_total", result="local") == 2
+    assert metrics.get("rate_limit_reconcile_total", result="redis") == 0
+
+def test_script_usage_keys_expire():
+    """Test that the scripts give usage hashes a TTL of two windows."""
+    async def scenario(redis_client):
+        await LeaseLimiter().check("client", 10)
+        await usage_tracking.reconcile_usage(Reservation("other", 6, 0), 50)
+        return await redis_client.ttl(usage_key("client", 7)), await redis_client.ttl(usage_key("other", 7))
+    
+    assert run_with_scripts(scenario) == (USAGE_KEY_TTL, USAGE_KEY_TTL)
+    assert USAGE_KEY_TTL == 7200
+
+def test_parse_old_usage_keys():
+    """Test parsing both old key layouts, including IPv6 client ids, and skipping other keys."""
+    assert parse_key("10.0.0.1:requests") == ("10.0.0.1", "requests", None)
+    assert parse_key("10.0.0.1:window_start") == ("10.0.0.1", "window_start", None)
+    assert parse_key("::1:tokens:497838") == ("::1", "tokens", 497838)
+    assert parse_key("llm_session:10.0.0.1:requests") is None
+    assert parse_key("10.0.0.1:other:5") is None
+
+def test_plan_migration():
+    """Test that recent counts move to expiring hashes and stale or undated ones are dropped."""
+    now = 100 * RATE_LIMIT_WINDOW + 60
+    increments, deleted = plan_migration({
+        "10.0.0.1:requests:100": "3",
+        "10.0.0.1:tokens:100": "300",
+        "10.0.0.1:requests:90": "8",
+        "10.0.0.1:requests": "4",
+        "10.0.0.1:tokens": "40",
+        "10.0.0.1:window_start": str(99 * RATE_LIMIT_WINDOW + 5)
+    }, now)
+    assert increments == {
+        "llm_usage:10.0.0.1:100": {"requests": 3, "tokens": 300, "ttl": 2 * RATE_LIMIT_WINDOW - 60},
+        "llm_usage:10.0.0.1:99": {"requests": 4, "tokens": 40, "ttl": RATE_LIMIT_WINDOW - 60}
+    }
+    assert len(deleted) == 6
+    
+    increments, deleted = plan_migration({"10.0.0.2:requests": "50", "10.0.0.2:tokens": "9000"}, now)
+    assert increments == {}
+    assert deleted == ["10.0.0.2:requests", "10.0.0.2:tokens"]